@@ -3,9 +3,9 @@ from web3 import Web3
 from datetime import datetime
 from functools import wraps
 from threading import Thread, Lock
-import json, os, secrets, time, hashlib, uuid, re, base64
+import json, os, secrets, time, hashlib, uuid, re, base64, itertools
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from collections import deque
+from collections import defaultdict, deque
 from zoneinfo import ZoneInfo
 from werkzeug.utils import secure_filename
 import secrets as _sec
@@ -62,6 +62,8 @@ from services.attendance_email_templates import (
     send_student_attendance_receipt as _send_student_attendance_receipt_template,
     send_student_attendance_receipt_initial_tap as _send_student_attendance_receipt_initial_tap_template,
     send_teacher_session_summary as _send_teacher_session_summary_template,
+    student_receipt_bulk_template as _student_receipt_bulk_template,
+    student_receipt_substitutions as _student_receipt_substitutions,
 )
 from services.attendance_view_routes_service import (
     attendance_report_impl as _attendance_report_impl,
@@ -83,9 +85,14 @@ from services.admin_schedule_routes_service import (
 from services.attendance_stats_service import attendance_stats_impl as _attendance_stats_impl
 from services.email_service import (
     get_email_config as _get_email_config_service,
+    email_config_cache_status as _email_config_cache_status,
     save_email_config as _save_email_config_service,
     send_email_async as _send_email_async_service,
+    send_email_bulk as _send_email_bulk_service,
+    send_email_sync as _send_email_sync_service,
+    email_dispatcher_metrics as _email_dispatcher_metrics,
 )
+from services.email_rendering import init_email_templates as _init_email_templates
 from services.excuse_email_templates import (
     send_excuse_received_email as _send_excuse_received_email_template,
     send_excuse_resolved_email as _send_excuse_resolved_email_template,
@@ -127,6 +134,35 @@ from services.teacher_portal_routes_service import (
     teacher_sessions_students_page_impl as _teacher_sessions_students_page_impl,
 )
 from services.ops.migrate_db import migrate as _auto_migrate
+from services.chain_reads import (
+    iter_attendance_history as _iter_attendance_history,
+    iter_session_attendance_records as _iter_session_attendance_records,
+)
+from services.attendance_finalize import (
+    bulk_mark_absent as _bulk_mark_absent,
+    recompute_session_totals as _recompute_session_totals,
+)
+from services.attendance_rollup import (
+    ROLLUP_DIMENSIONS as _STATS_ROLLUP_DIMENSIONS,
+    ROLLUP_SCHEMA as _STATS_ROLLUP_SCHEMA,
+    ROLLUP_TABLES as _STATS_ROLLUP_TABLES,
+    rebuild_rollup as _rebuild_stats_rollup,
+    refresh_session_rollup as _refresh_stats_rollup,
+)
+from services.automation_leader import AutomationLeader as _AutomationLeader
+from services.post_finalize_jobs import PostFinalizeQueue as _PostFinalizeQueue
+from services.finalize_pool import FinalizePool as _FinalizePool
+from services.schedule_plan_cache import TodayPlanCache as _TodayPlanCache
+from services.session_scheduler import SessionScheduler as _SessionScheduler
+from services.smtp_pool import smtp_pool_metrics as _smtp_pool_metrics
+from services.http_email_api import (
+    http_email_metrics as _http_email_metrics,
+    substitution_token as _email_substitution_token,
+)
+from services.rpc_provider import (
+    FailoverHTTPProvider as _FailoverHTTPProvider,
+    rpc_urls_from_env as _rpc_urls_from_env,
+)
 
 AUTO_THREAD = None
 AUTO_THREAD_LOCK = Lock()
@@ -137,7 +173,7 @@ PASSWORD_OTP_MAX_ATTEMPTS = 5
 
 # ── Email config helpers ──────────────────────────────────────────────────
 def get_email_config():
-    """Load SMTP config from DB. Returns dict with all keys."""
+    """SMTP config (dict with all keys), cached in-process; see EmailConfigCache."""
     return _get_email_config_service(get_db)
  
 def save_email_config(cfg: dict):
@@ -146,11 +182,24 @@ def save_email_config(cfg: dict):
  
 def _send_email(to_addrs: list, subject: str, html_body: str):
     """
-    Send an HTML email via Gmail SMTP in a background thread.
-    Silently logs errors — never crashes the main request.
+    Queue an HTML email on the shared email dispatcher (bounded queue, fixed
+    sender threads). Silently logs errors — never crashes the main request.
     """
     cfg = get_email_config()
     _send_email_async_service(to_addrs, subject, html_body, cfg)
+
+def _send_email_sync(to_addrs: list, subject: str, html_body: str):
+    """Send an HTML email on the calling thread; raises on failure (for background jobs)."""
+    cfg = get_email_config()
+    _send_email_sync_service(to_addrs, subject, html_body, cfg)
+
+def _send_email_bulk(subject: str, html_template: str, recipients: list):
+    """
+    Send one templated email to [(email, substitutions), ...] via the SendGrid/Brevo
+    bulk API. Returns per-recipient errors, or None if the provider is plain SMTP.
+    """
+    cfg = get_email_config()
+    return _send_email_bulk_service(subject, html_template, recipients, cfg)
  
 def send_student_attendance_receipt(
         student_name, student_email, student_id,
@@ -220,8 +269,13 @@ def send_teacher_session_summary(
         present_count, late_count, absent_count, excused_count,
         student_rows, session_tx_hash=None, session_block_number=None,
         course_code=None, semester=None, class_type='lecture',
-        event_description=None, teachers_involved=None, programs_involved=None):
-        """Send session summary email to teacher when session ends."""
+        event_description=None, teachers_involved=None, programs_involved=None,
+        send_email_fn=_send_email):
+        """Send session summary email to teacher when session ends.
+
+        Queued on the email dispatcher by default; background jobs pass
+        ``_send_email_sync`` so a failed send raises and is retried.
+        """
         _send_teacher_session_summary_template(
                 teacher_email=teacher_email,
                 teacher_name=teacher_name,
@@ -237,7 +291,7 @@ def send_teacher_session_summary(
                 student_rows=student_rows,
                 session_tx_hash=session_tx_hash,
                 session_block_number=session_block_number,
-                send_email_fn=_send_email,
+                send_email_fn=send_email_fn,
                 semester=semester,
                 class_type=class_type,
                 event_description=event_description,
@@ -427,13 +481,14 @@ def inject_globals():
         fmt_time_short= fmt_time_short,
     )
 
-BLOCKCHAIN_RPC_URL = (
-    os.getenv('SEPOLIA_RPC_URL', '').strip()
-    or os.getenv('BLOCKCHAIN_RPC_URL', '').strip()
-    or os.getenv('WEB3_PROVIDER_URI', '').strip()
-    or "http://127.0.0.1:8545"
+BLOCKCHAIN_RPC_URLS = _rpc_urls_from_env()
+BLOCKCHAIN_RPC_URL = BLOCKCHAIN_RPC_URLS[0]
+RPC_PROVIDER = _FailoverHTTPProvider(
+    BLOCKCHAIN_RPC_URLS,
+    timeout=float(os.getenv('BLOCKCHAIN_RPC_TIMEOUT', '10') or 10),
+    pool_size=int(os.getenv('BLOCKCHAIN_RPC_POOL_SIZE', '10') or 10),
 )
-web3 = Web3(Web3.HTTPProvider(BLOCKCHAIN_RPC_URL))
+web3 = Web3(RPC_PROVIDER)
 
 BLOCKCHAIN_ONLINE = web3.is_connected()
 if BLOCKCHAIN_ONLINE:
@@ -505,6 +560,22 @@ except Exception as _ce:
     print("[INFO] Offline mode active: contract/RPC unavailable.")
 
 BLOCKCHAIN_LOCK = Lock()
+
+
+def _on_rpc_health(ok):
+    # Keep BLOCKCHAIN_ONLINE current instead of trusting the import-time probe.
+    # Only flip it when a contract is loaded; offline mode stays offline.
+    global BLOCKCHAIN_ONLINE
+    if contract is not None:
+        BLOCKCHAIN_ONLINE = bool(ok)
+
+
+if os.getenv('BLOCKCHAIN_RPC_HEALTH_SECONDS', '30').strip() != '0':
+    RPC_PROVIDER.start_health_monitor(
+        interval_seconds=int(os.getenv('BLOCKCHAIN_RPC_HEALTH_SECONDS', '30') or 30),
+        on_result=_on_rpc_health,
+    )
+
 BASE_DIR      = os.path.dirname(__file__)
 DATABASE_URL = os.getenv('DATABASE_URL', '').strip()
 
@@ -741,6 +812,12 @@ def normalize_section_key(key):
         
     return key.strip()
 
+def split_section_key(key):
+    """'Course|Year|Section' -> (program, year_level, section_letter); missing parts are ''."""
+    parts = (key or '').split('|')[:3]
+    parts += [''] * (3 - len(parts))
+    return tuple(parts)
+
 def build_student_section_key(student):
     # Use 'course' (from _student_row) or original 'program' column
     course = (student.get('course') or student.get('program') or '').strip()
@@ -1064,6 +1141,21 @@ def get_db():
         def description(self):
             return self._cursor.description
 
+        @property
+        def itersize(self):
+            return self._cursor.itersize
+
+        @itersize.setter
+        def itersize(self, value):
+            self._cursor.itersize = value
+
+        def __iter__(self):
+            # Named cursors only report a description once the first batch is fetched.
+            for r in self._cursor:
+                if not self._keys:
+                    self._keys = [d[0] for d in self._cursor.description]
+                yield _CompatRow(self._keys, r)
+
         def close(self):
             self._cursor.close()
 
@@ -1084,8 +1176,9 @@ def get_db():
             finally:
                 self._conn.close()
 
-        def cursor(self):
-            return _CompatCursor(self._conn.cursor())
+        def cursor(self, name=None):
+            # A name makes it a server-side cursor: iterate it to fetch `itersize` rows at a time.
+            return _CompatCursor(self._conn.cursor(name) if name else self._conn.cursor())
 
         def execute(self, sql, params=None):
             cur = self.cursor()
@@ -1166,6 +1259,9 @@ def init_db():
             units           INTEGER NOT NULL DEFAULT 3,
             time_slot       TEXT NOT NULL DEFAULT '',
             section_key     TEXT NOT NULL DEFAULT '',
+            program         TEXT NOT NULL DEFAULT '',
+            year_level      TEXT NOT NULL DEFAULT '',
+            section_letter  TEXT NOT NULL DEFAULT '',
             teacher_username TEXT NOT NULL DEFAULT '',
             teacher_name    TEXT NOT NULL DEFAULT '',
             started_at      TEXT NOT NULL DEFAULT '',
@@ -1328,12 +1424,47 @@ def init_db():
     );
     CREATE INDEX IF NOT EXISTS idx_excuse_sess   ON excuse_requests(sess_id);
     CREATE INDEX IF NOT EXISTS idx_excuse_status ON excuse_requests(status);
+    CREATE TABLE IF NOT EXISTS session_roster (
+        sess_id           TEXT NOT NULL,
+        nfc_id            TEXT NOT NULL,
+        student_name      TEXT NOT NULL DEFAULT '',
+        student_id        TEXT NOT NULL DEFAULT '',
+        program           TEXT NOT NULL DEFAULT '',
+        year_level        TEXT NOT NULL DEFAULT '',
+        section           TEXT NOT NULL DEFAULT '',
+        section_key       TEXT NOT NULL DEFAULT '',
+        semester          TEXT NOT NULL DEFAULT '',
+        enrollment_status TEXT NOT NULL DEFAULT 'Regular',
+        student_status    TEXT NOT NULL DEFAULT 'active',
+        email             TEXT NOT NULL DEFAULT '',
+        captured_at       TEXT NOT NULL DEFAULT '',
+        PRIMARY KEY (sess_id, nfc_id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_roster_nfc ON session_roster(nfc_id);
+    CREATE TABLE IF NOT EXISTS post_finalize_jobs (
+        id           INTEGER PRIMARY KEY AUTOINCREMENT,
+        sess_id      TEXT NOT NULL DEFAULT '',
+        nfc_id       TEXT NOT NULL DEFAULT '',
+        kind         TEXT NOT NULL DEFAULT '',
+        payload_json TEXT NOT NULL DEFAULT '{}',
+        status       TEXT NOT NULL DEFAULT 'pending',
+        attempts     INTEGER NOT NULL DEFAULT 0,
+        last_error   TEXT NOT NULL DEFAULT '',
+        run_after    TEXT NOT NULL DEFAULT '',
+        locked_by    TEXT NOT NULL DEFAULT '',
+        locked_at    TEXT NOT NULL DEFAULT '',
+        created_at   TEXT NOT NULL DEFAULT '',
+        updated_at   TEXT NOT NULL DEFAULT '',
+        UNIQUE (sess_id, nfc_id, kind)
+    );
+    CREATE INDEX IF NOT EXISTS idx_pfj_pending ON post_finalize_jobs(status, run_after);
     """
     with get_db() as conn:
         conn.executescript(sql)
     _migrate_add_missing_columns()
     _migrate_users_to_accounts()
     _migrate_nfc_registration()
+    _migrate_stats_rollup()
     print('[DB] Schema ready -> PostgreSQL')
 
 
@@ -1346,6 +1477,7 @@ def _migrate_add_missing_columns():
         ('students', 'photo_file', "TEXT NOT NULL DEFAULT ''"),
         ('students', 'updated_at', "TEXT NOT NULL DEFAULT ''"),
         ('students', 'student_status', "TEXT NOT NULL DEFAULT 'active'"),  # active, graduated, alumni
+        ('students', 'section_key', "TEXT NOT NULL DEFAULT ''"),  # normalized build_student_section_key()
         ('sessions', 'teacher_username', "TEXT NOT NULL DEFAULT ''"),
         ('sessions', 'class_type', "TEXT NOT NULL DEFAULT 'lecture'"),
         ('sessions', 'total_enrolled', 'INTEGER NOT NULL DEFAULT 0'),
@@ -1360,6 +1492,16 @@ def _migrate_add_missing_columns():
         ('sessions', 'schedule_id', 'TEXT DEFAULT NULL'),
         ('sessions', 'session_tx_hash', "TEXT NOT NULL DEFAULT ''"),
         ('sessions', 'session_block_number', 'INTEGER NOT NULL DEFAULT 0'),
+        ('sessions', 'program', "TEXT NOT NULL DEFAULT ''"),  # split_section_key(section_key)
+        ('sessions', 'year_level', "TEXT NOT NULL DEFAULT ''"),
+        ('sessions', 'section_letter', "TEXT NOT NULL DEFAULT ''"),
+        # Native timestamp mirrors of the TEXT time columns, for range filters.
+        # Generated, so every writer keeps them in sync while the text columns remain.
+        ('sessions', 'started_ts', 'TIMESTAMP GENERATED ALWAYS AS (davs_text_ts(started_at)) STORED'),
+        ('sessions', 'ended_ts', 'TIMESTAMP GENERATED ALWAYS AS (davs_text_ts(ended_at)) STORED'),
+        ('sessions', 'auto_end_ts', 'TIMESTAMP GENERATED ALWAYS AS (davs_text_ts(auto_end_at)) STORED'),
+        ('attendance_logs', 'tap_ts', 'TIMESTAMP GENERATED ALWAYS AS (davs_text_ts(tap_time)) STORED'),
+        ('attendance_logs', 'created_ts', 'TIMESTAMP GENERATED ALWAYS AS (davs_text_ts(created_at)) STORED'),
         ('accounts', 'updated_at', "TEXT NOT NULL DEFAULT ''"),
         ('photos', 'uploaded_at', "TEXT NOT NULL DEFAULT ''"),
         ('attendance_logs', 'excuse_request_id', 'INTEGER DEFAULT NULL'),
@@ -1515,6 +1657,19 @@ def _migrate_add_missing_columns():
                 conn.execute('RELEASE SAVEPOINT mig_step')
                 return False, err
 
+        # 'YYYY-MM-DD HH:MM[:SS]' text -> timestamp; NULL for empty or unparseable values.
+        ok, e = _run_migration_step(
+            "CREATE OR REPLACE FUNCTION davs_text_ts(t TEXT) RETURNS TIMESTAMP "
+            "LANGUAGE plpgsql IMMUTABLE AS $$ "
+            "BEGIN "
+            "  IF t IS NULL OR t !~ '^[0-9]{4}-[0-9]{2}-[0-9]{2}[ T][0-9]{2}:[0-9]{2}' THEN RETURN NULL; END IF; "
+            "  RETURN t::timestamp; "
+            "EXCEPTION WHEN others THEN RETURN NULL; "
+            "END $$"
+        )
+        if not ok:
+            print(f'[MIGRATION] davs_text_ts function: {e}')
+
         for table, col, col_def in migrations:
             ok, _ = _run_migration_step(f'ALTER TABLE {table} ADD COLUMN {col} {col_def}')
             if ok:
@@ -1578,6 +1733,58 @@ def _migrate_add_missing_columns():
         ok, e = _run_migration_step('CREATE INDEX IF NOT EXISTS idx_sess_teacher ON sessions(teacher_username)')
         if not ok:
             print(f'[MIGRATION] Index creation: {e}')
+        ok, e = _run_migration_step(
+            'CREATE INDEX IF NOT EXISTS idx_stu_section_key ON students(section_key, semester, student_status)'
+        )
+        if not ok:
+            print(f'[MIGRATION] Index creation: {e}')
+        for idx_sql in (
+            'CREATE INDEX IF NOT EXISTS idx_sess_program ON sessions(program)',
+            'CREATE INDEX IF NOT EXISTS idx_sess_year_level ON sessions(year_level)',
+            'CREATE INDEX IF NOT EXISTS idx_sess_section_letter ON sessions(section_letter)',
+            'CREATE INDEX IF NOT EXISTS idx_sess_started_ts ON sessions(started_ts)',
+            'CREATE INDEX IF NOT EXISTS idx_sess_ended_ts ON sessions(ended_ts)',
+            'CREATE INDEX IF NOT EXISTS idx_att_sess_created_ts ON attendance_logs(sess_id, created_ts)',
+        ):
+            ok, e = _run_migration_step(idx_sql)
+            if not ok:
+                print(f'[MIGRATION] Index creation: {e}')
+        try:
+            _backfill_student_section_keys(conn)
+        except Exception as e:
+            print(f'[MIGRATION] section_key backfill: {e}')
+        try:
+            _backfill_session_section_parts(conn)
+        except Exception as e:
+            print(f'[MIGRATION] session section parts backfill: {e}')
+
+
+def _backfill_student_section_keys(conn):
+    """One-time fill of students.section_key for rows written before the column existed."""
+    rows = conn.execute(
+        "SELECT nfc_id, program, year_level, section FROM students "
+        "WHERE section_key = '' AND program != '' AND year_level != '' AND section != ''"
+    ).fetchall()
+    updates = []
+    for r in rows:
+        key = build_student_section_key(dict(r))
+        if key:
+            updates.append((key, r['nfc_id']))
+    if updates:
+        conn.executemany("UPDATE students SET section_key=? WHERE nfc_id=?", updates)
+        print(f'[MIGRATION] Backfilled students.section_key for {len(updates)} students')
+
+
+def _backfill_session_section_parts(conn):
+    """One-time fill of sessions.program / year_level / section_letter from section_key."""
+    cur = conn.execute(
+        "UPDATE sessions SET program = SPLIT_PART(section_key, '|', 1), "
+        "year_level = SPLIT_PART(section_key, '|', 2), "
+        "section_letter = SPLIT_PART(section_key, '|', 3) "
+        "WHERE section_key != '' AND program = '' AND year_level = '' AND section_letter = ''"
+    )
+    if cur.rowcount:
+        print(f'[MIGRATION] Backfilled sessions.program/year_level/section_letter for {cur.rowcount} sessions')
 
 
 def _migrate_users_to_accounts():
@@ -1616,6 +1823,27 @@ def _migrate_nfc_registration():
             )
 
 
+def _migrate_stats_rollup():
+    # The rollup tables are derived data: if their dimensions changed, drop and
+    # recreate them. Then (also on first run) seed them from the existing logs.
+    with get_db() as conn:
+        cols = {r[1] for r in conn.execute('PRAGMA table_info(stats_attendance_rollup)').fetchall()}
+        if cols and not set(_STATS_ROLLUP_DIMENSIONS) <= cols:
+            conn.execute(f"DROP TABLE IF EXISTS {', '.join(_STATS_ROLLUP_TABLES)}")
+            print('[MIGRATION] Stats rollup dimensions changed - recreating rollup tables')
+        conn.executescript(_STATS_ROLLUP_SCHEMA)
+        seeded = conn.execute('SELECT 1 FROM stats_rollup_sources LIMIT 1').fetchone()
+        has_sessions = conn.execute('SELECT 1 FROM sessions LIMIT 1').fetchone()
+    if has_sessions and not seeded:
+        n = db_rebuild_stats_rollup()
+        print(f'[DB] Built attendance stats rollup ({n} rows)')
+
+
+def db_rebuild_stats_rollup():
+    with get_db() as conn:
+        return _rebuild_stats_rollup(conn)
+
+
 def _row_to_dict(row):
     if row is None:
         return None
@@ -1660,8 +1888,14 @@ def load_session(sess_id):
         return _session_row_with_logs(conn, row)
 
 
+# SQL-only timestamp mirrors; session/log dicts keep using the text columns.
+_TS_MIRROR_COLUMNS = ('started_ts', 'ended_ts', 'auto_end_ts', 'tap_ts', 'created_ts')
+
+
 def _session_row_with_logs(conn, row):
     d = dict(row)
+    for col in _TS_MIRROR_COLUMNS:
+        d.pop(col, None)
     if d.get('section_key'):
         d['section_key'] = normalize_section_key(d['section_key'])
     logs = conn.execute(
@@ -1719,6 +1953,7 @@ def _session_row_with_logs(conn, row):
 
 def save_session(sess_id, s):
     sk = normalize_section_key(s.get('section_key', ''))
+    program, year_level, section_letter = split_section_key(sk)
     teacher_uname = s.get('teacher_username') or s.get('teacher') or ''
     teacher_name  = s.get('teacher_name', '')
     schedule_id   = s.get('schedule_id')
@@ -1729,15 +1964,17 @@ def save_session(sess_id, s):
         conn.execute(
             "INSERT INTO sessions "
             "(sess_id,subject_id,subject_name,course_code,class_type,units,time_slot,"
-            " section_key,teacher_username,teacher_name,started_at,late_cutoff,"
-            " auto_end_at,ended_at,grace_period,schedule_id,"
+            " section_key,program,year_level,section_letter,teacher_username,teacher_name,"
+            " started_at,late_cutoff,auto_end_at,ended_at,grace_period,schedule_id,"
             " warn_log_json,invalid_log_json,semester,session_tx_hash,session_block_number) "
-            "VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?) "
+            "VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?) "
             "ON CONFLICT(sess_id) DO UPDATE SET "
             "subject_id=excluded.subject_id, subject_name=excluded.subject_name, "
             "course_code=excluded.course_code, class_type=excluded.class_type, "
             "units=excluded.units, "
             "time_slot=excluded.time_slot, section_key=excluded.section_key, "
+            "program=excluded.program, year_level=excluded.year_level, "
+            "section_letter=excluded.section_letter, "
             "teacher_username=excluded.teacher_username, "
             "teacher_name=excluded.teacher_name, "
             "started_at=excluded.started_at, late_cutoff=excluded.late_cutoff, "
@@ -1752,7 +1989,7 @@ def save_session(sess_id, s):
             "session_block_number=excluded.session_block_number",
             (sess_id, s.get('subject_id', ''), s.get('subject_name', ''),
              s.get('course_code', ''), class_type, s.get('units', 3), s.get('time_slot', ''),
-             sk, teacher_uname, teacher_name,
+             sk, program, year_level, section_letter, teacher_uname, teacher_name,
              s.get('started_at', ''), s.get('late_cutoff', ''),
              s.get('auto_end_at'), s.get('ended_at'),
              s.get('grace_period', 15), schedule_id,
@@ -1772,6 +2009,7 @@ def save_session(sess_id, s):
              totals.get('late', 0), totals.get('absent', 0),
              totals.get('excused', 0), sess_id)
         )
+        _refresh_stats_rollup(conn, sess_id)
 
 def save_sessions(sessions_dict):
     for sid, s in sessions_dict.items():
@@ -1907,15 +2145,20 @@ def _student_row(row):
 
 def db_save_student(s):
     now = _now_local().strftime('%Y-%m-%d %H:%M:%S')
+    nfc_id = s.get('nfcId', s.get('nfc_id',''))
+    enrollment_status = s.get('enrollment_status', 'Regular')
     with get_db() as conn:
+        prev = conn.execute(
+            "SELECT enrollment_status FROM students WHERE nfc_id=?", (nfc_id,)
+        ).fetchone()
         conn.execute(
             "INSERT INTO students "
             "(nfc_id, full_name, first_name, middle_initial, last_name, "
             "student_id, program, year_level, section, "
             "adviser, email, contact, major, semester, school_year, "
             "date_registered, eth_address, reg_tx_hash, reg_block, "
-            "photo_file, enrollment_status, created_at, updated_at) "
-            "VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?) "
+            "photo_file, enrollment_status, section_key, created_at, updated_at) "
+            "VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?) "
             "ON CONFLICT(nfc_id) DO UPDATE SET "
             "full_name=EXCLUDED.full_name, "
             "first_name=EXCLUDED.first_name, "
@@ -1929,9 +2172,10 @@ def db_save_student(s):
             "date_registered=EXCLUDED.date_registered, "
             "eth_address=EXCLUDED.eth_address, reg_tx_hash=EXCLUDED.reg_tx_hash, "
             "reg_block=EXCLUDED.reg_block, photo_file=EXCLUDED.photo_file, "
-            "enrollment_status=EXCLUDED.enrollment_status, updated_at=EXCLUDED.updated_at",
+            "enrollment_status=EXCLUDED.enrollment_status, section_key=EXCLUDED.section_key, "
+            "updated_at=EXCLUDED.updated_at",
             (
-                s.get('nfcId', s.get('nfc_id','')),
+                nfc_id,
                 s.get('name',  s.get('full_name','')),
                 s.get('first_name', ''),
                 s.get('middle_initial', ''),
@@ -1947,10 +2191,14 @@ def db_save_student(s):
                 '',
                 0,
                 s.get('photo_file',''),
-                s.get('enrollment_status', 'Regular'),
+                enrollment_status,
+                build_student_section_key(s) or '',
                 s.get('created_at', now), now
             )
         )
+        # stats_attendance_rollup keeps the enrollment type as of its last refresh.
+        if prev and (prev['enrollment_status'] or '').lower() != (enrollment_status or '').lower():
+            _refresh_student_rollups(conn, nfc_id)
 
 def db_get_all_students():
     with get_db() as conn:
@@ -1962,6 +2210,86 @@ def db_get_student(nfc_id):
         row = conn.execute("SELECT * FROM students WHERE nfc_id=?", (nfc_id,)).fetchone()
     return _student_row(row)
 
+def db_get_students_in_sections(section_keys):
+    """Students whose persisted section_key is one of ``section_keys`` (indexed lookup)."""
+    keys = sorted({normalize_section_key(k) for k in (section_keys or []) if k})
+    if not keys:
+        return []
+    with get_db() as conn:
+        rows = conn.execute(
+            "SELECT * FROM students WHERE section_key = ANY(?) ORDER BY full_name",
+            (keys,)
+        ).fetchall()
+    return [_student_row(r) for r in rows]
+
+def db_get_students_by_nfc_ids(nfc_ids):
+    ids = sorted({str(n) for n in (nfc_ids or []) if n})
+    if not ids:
+        return []
+    with get_db() as conn:
+        rows = conn.execute(
+            "SELECT * FROM students WHERE nfc_id = ANY(?) ORDER BY full_name",
+            (ids,)
+        ).fetchall()
+    return [_student_row(r) for r in rows]
+
+# ── Session roster snapshot ────────────────────────────────────────────────
+# Captured once when a session starts so finalization, exports and analytics
+# read who was enrolled *then* — unaffected by later move-ups or new
+# registrations — from a small table keyed by sess_id.
+
+def db_capture_session_roster(sess_id, section_keys):
+    keys = sorted({normalize_section_key(k) for k in (section_keys or []) if k})
+    if not sess_id or not keys:
+        return 0
+    now = _now_local().strftime('%Y-%m-%d %H:%M:%S')
+    with get_db() as conn:
+        cur = conn.execute(
+            "INSERT INTO session_roster "
+            "(sess_id,nfc_id,student_name,student_id,program,year_level,section,section_key,"
+            " semester,enrollment_status,student_status,email,captured_at) "
+            "SELECT ?, nfc_id, full_name, student_id, program, year_level, section, section_key, "
+            "semester, enrollment_status, student_status, email, ? "
+            "FROM students WHERE section_key = ANY(?) "
+            "ON CONFLICT(sess_id,nfc_id) DO NOTHING",
+            (sess_id, now, keys)
+        )
+        return cur.rowcount
+
+def _roster_row(row):
+    d = dict(row)
+    d['nfcId']   = d.get('nfc_id', '')
+    d['name']    = d.get('student_name', '')
+    d['course']  = d.get('program', '')
+    d['section'] = (d.get('section') or '').strip().upper()
+    return d
+
+def db_get_session_rosters(sess_ids):
+    """sess_id -> roster list for every session that has a snapshot (one query)."""
+    ids = sorted({str(sid) for sid in (sess_ids or []) if sid})
+    if not ids:
+        return {}
+    with get_db() as conn:
+        rows = conn.execute(
+            "SELECT * FROM session_roster WHERE sess_id = ANY(?) ORDER BY student_name",
+            (ids,)
+        ).fetchall()
+    out = {}
+    for r in rows:
+        out.setdefault(r['sess_id'], []).append(_roster_row(r))
+    return out
+
+def db_get_session_roster(sess_id):
+    """Roster snapshot for one session, or None for sessions started before snapshots existed."""
+    return db_get_session_rosters([sess_id]).get(str(sess_id))
+
+def _capture_session_roster(sess_id, section_keys):
+    try:
+        n = db_capture_session_roster(sess_id, section_keys)
+        print(f"[ROSTER] Captured {n} students for session {sess_id}")
+    except Exception as e:
+        print(f"[ROSTER] Could not capture roster for session {sess_id}: {e}")
+
 def db_delete_student(nfc_id):
     with get_db() as conn:
         conn.execute("DELETE FROM students WHERE nfc_id=?", (nfc_id,))
@@ -2007,21 +2335,21 @@ def db_get_session_attendance(sess_id):
         ).fetchall()
     return [dict(r) for r in rows]
 
+def _student_log_sessions(conn, nfc_id):
+    rows = conn.execute(
+        "SELECT DISTINCT sess_id FROM attendance_logs WHERE nfc_id=?", (nfc_id,)
+    ).fetchall()
+    return [r['sess_id'] for r in rows]
+
+def _refresh_student_rollups(conn, nfc_id):
+    """Re-roll every session a student has logs in (e.g. after an enrollment change)."""
+    for sid in _student_log_sessions(conn, nfc_id):
+        _refresh_stats_rollup(conn, sid)
+
 def db_update_session_totals(sess_id):
     with get_db() as conn:
-        counts = conn.execute(
-            "SELECT status, COUNT(*) as cnt FROM attendance_logs "
-            "WHERE sess_id=? GROUP BY status", (sess_id,)
-        ).fetchall()
-        totals = {r['status']: r['cnt'] for r in counts}
-        conn.execute(
-            "UPDATE sessions SET "
-            "total_present=?, total_late=?, total_absent=?, total_excused=? "
-            "WHERE sess_id=?",
-            (totals.get('present',0) + totals.get('late',0),
-             totals.get('late',0), totals.get('absent',0),
-             totals.get('excused',0), sess_id)
-        )
+        _recompute_session_totals(conn, sess_id)
+        _refresh_stats_rollup(conn, sess_id)
 
 def nfc_is_waiting():
     with get_db() as conn:
@@ -2120,6 +2448,12 @@ def db_get_override(nfc_id):
         row = conn.execute("SELECT * FROM student_overrides WHERE nfc_id=?", (nfc_id,)).fetchone()
     return dict(row) if row else {}
 
+def db_get_overrides():
+    """nfc_id -> override for every student that has one (one query)."""
+    with get_db() as conn:
+        rows = conn.execute("SELECT * FROM student_overrides").fetchall()
+    return {r['nfc_id']: dict(r) for r in rows}
+
 def db_save_override(nfc_id, fields):
     with get_db() as conn:
         conn.execute(
@@ -2145,8 +2479,12 @@ def db_save_override(nfc_id, fields):
 
 # ── Schedule DB helpers ────────────────────────────────────────────────────
 
-def _event_schedule_to_rows(ev):
-    """Expand one event_schedules row into calendar-like schedule rows (teacher x section)."""
+def _event_schedule_to_rows(ev, users=None):
+    """Expand one event_schedules row into calendar-like schedule rows (teacher x section).
+
+    ``users`` is an optional username -> account map (from db_get_all_users) so
+    callers expanding many events resolve teacher names without a query each.
+    """
     title = str(ev.get('title', 'School Event') or 'School Event').strip()
     desc = str(ev.get('description', '') or '').strip()
     event_id = str(ev.get('event_id', '') or '').strip()
@@ -2177,9 +2515,14 @@ def _event_schedule_to_rows(ev):
     if not teacher_usernames:
         teacher_usernames = ['']
 
+    accounts = {}
+    for u in teacher_usernames:
+        if u and u not in accounts:
+            accounts[u] = (users.get(u) if users is not None else db_get_user(u)) or {}
+
     teachers_involved = []
     for u in teacher_usernames:
-        tu = (db_get_user(u) if u else {}) or {}
+        tu = accounts.get(u, {}) if u else {}
         teachers_involved.append(str(tu.get('full_name', u) or u).strip())
     teachers_involved = sorted({t for t in teachers_involved if t})
 
@@ -2197,7 +2540,7 @@ def _event_schedule_to_rows(ev):
     # Actually, to make it show up for EACH teacher, we should return one row per teacher,
     # but they all share the SAME schedule_id.
     for teacher_username in teacher_usernames:
-        teacher = (db_get_user(teacher_username) if teacher_username else {}) or {}
+        teacher = accounts.get(teacher_username, {}) if teacher_username else {}
         teacher_name = teacher.get('full_name', teacher_username or 'Event Monitor')
         # We don't loop sections here for the schedule_id anymore, 
         # but we include all section keys in the metadata.
@@ -2237,14 +2580,18 @@ def _event_schedule_to_rows(ev):
 
 def _event_schedule_rows_for_all():
     rows = []
-    for ev in db_get_all_event_schedules():
-        rows.extend(_event_schedule_to_rows(ev))
+    events = db_get_all_event_schedules()
+    users = db_get_all_users() if events else {}
+    for ev in events:
+        rows.extend(_event_schedule_to_rows(ev, users))
     return rows
 
 
 def _event_schedule_rows_for_teacher(username):
     username_norm = str(username or '').strip().lower()
     rows = []
+    users = None
+    all_students = None
     for ev in db_get_all_event_schedules():
         teacher_usernames = [str(u or '').strip() for u in list(ev.get('teacher_usernames', []) or []) if str(u or '').strip()]
         if username_norm not in {u.lower() for u in teacher_usernames}:
@@ -2267,12 +2614,14 @@ def _event_schedule_rows_for_teacher(username):
         # Unified schedule_id for all teachers in this event
         schedule_id = f"event:{ev.get('event_id', '')}"
 
-        teacher = db_get_user(username_norm) or {}
+        if users is None:
+            users = db_get_all_users()
+        teacher = users.get(username_norm) or db_get_user(username_norm) or {}
         teacher_name = teacher.get('full_name', username_norm)
 
         teachers_involved = []
         for u in teacher_usernames:
-            tu = db_get_user(u) or {}
+            tu = users.get(u) or {}
             t_full = str(tu.get('full_name', '') or '').strip()
             # If full name is missing, use username as fallback
             teachers_involved.append(t_full if t_full else u)
@@ -2303,7 +2652,9 @@ def _event_schedule_rows_for_teacher(username):
 
         section_key_set = set(section_keys)
         students_count = 0
-        for st in db_get_all_students():
+        if all_students is None:
+            all_students = db_get_all_students()
+        for st in all_students:
             if build_student_section_key(st) in section_key_set:
                 students_count += 1
 
@@ -2407,13 +2758,16 @@ def db_save_schedule(s: dict) -> str:
              int(s.get('grace_minutes', 15)),
              s.get('created_by', ''), now, now)
         )
+    _notify_schedule_changed(f'schedule saved {sid}')
     return sid
 
 def db_delete_session(sess_id):
     with get_db() as conn:
         conn.execute("DELETE FROM attendance_logs WHERE sess_id=?", (sess_id,))
         conn.execute("DELETE FROM excuse_requests WHERE sess_id=?", (sess_id,))
+        conn.execute("DELETE FROM session_roster WHERE sess_id=?", (sess_id,))
         conn.execute("DELETE FROM sessions WHERE sess_id=?", (sess_id,))
+        _refresh_stats_rollup(conn, sess_id)
     if sess_id in sessions_db:
         del sessions_db[sess_id]
 
@@ -2444,6 +2798,7 @@ def db_delete_schedule(schedule_id):
                     print(f"[AUTO] Ended {len(sids)} active session(s) for event {event_id}")
             except Exception as e:
                 print(f"[AUTO] Error checking sessions for event {event_id}: {e}")
+            _notify_schedule_changed(f'event deleted {event_id}')
         return
 
     with get_db() as conn:
@@ -2451,6 +2806,7 @@ def db_delete_schedule(schedule_id):
             "UPDATE schedules SET is_active=0, updated_at=? WHERE schedule_id=?",
             (now, schedule_id)
         )
+    _notify_schedule_changed(f'schedule deleted {schedule_id}')
 
 
 def db_get_all_event_schedules():
@@ -2555,14 +2911,23 @@ def db_save_event_schedule(e: dict) -> str:
         ).fetchone()
         if not saved:
             raise RuntimeError('Event schedule insert did not persist.')
+    _notify_schedule_changed(f'event saved {event_id}')
     return event_id
 
 
-def db_get_all_no_class_days():
+def db_get_all_no_class_days(date_ymd=None):
+    """Active no-class rows; with ``date_ymd`` only the rows covering that date."""
     with get_db() as conn:
-        rows = conn.execute(
-            "SELECT * FROM no_class_days WHERE is_active=1 ORDER BY from_date, to_date"
-        ).fetchall()
+        if date_ymd:
+            rows = conn.execute(
+                "SELECT * FROM no_class_days WHERE is_active=1 AND from_date <= ? AND to_date >= ? "
+                "ORDER BY from_date, to_date",
+                (date_ymd, date_ymd),
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT * FROM no_class_days WHERE is_active=1 ORDER BY from_date, to_date"
+            ).fetchall()
     out = []
     for r in rows:
         d = dict(r)
@@ -2589,7 +2954,7 @@ def db_get_no_class_days_for_date(date_ymd, teacher_username=''):
     d = str(date_ymd or '').strip()
     if not d:
         return []
-    base_items = db_get_all_no_class_days()
+    base_items = db_get_all_no_class_days(d)
     return [
         item for item in base_items
         if str(item.get('from_date', '')).strip() <= d <= str(item.get('to_date', '')).strip()
@@ -2618,7 +2983,9 @@ def db_save_no_class_day(item: dict) -> int:
                 now,
             ),
         )
-        return int(cur.lastrowid or 0)
+        new_id = int(cur.lastrowid or 0)
+    _notify_schedule_changed('no-class day added')
+    return new_id
 
 
 def db_delete_no_class_day(no_class_day_id: int) -> None:
@@ -2628,16 +2995,126 @@ def db_delete_no_class_day(no_class_day_id: int) -> None:
             "UPDATE no_class_days SET is_active=0, updated_at=? WHERE id=?",
             (now, int(no_class_day_id)),
         )
+    _notify_schedule_changed('no-class day removed')
 
 def get_todays_schedules(username=None):
-    """Return schedules that fall on today's weekday (0=Mon). If username provided, filter by it."""
-    today_dow = _now_local().weekday()
+    """Return schedules that fall on today's weekday (0=Mon). If username provided, filter by it.
+
+    Served from TODAY_PLAN, so repeated calls within the day hit no tables.
+    """
     if username:
-        return [s for s in db_get_schedules_for_teacher(username)
-                if int(s['day_of_week']) == today_dow]
-    return [s for s in db_get_all_schedules()
+        return TODAY_PLAN.teacher_rows(username, _load_todays_teacher_schedules)
+    return TODAY_PLAN.get()['rows']
+
+
+def _load_todays_teacher_schedules(username):
+    today_dow = _now_local().weekday()
+    return [s for s in db_get_schedules_for_teacher(username)
             if int(s['day_of_week']) == today_dow]
 
+
+def _build_today_plan(now_dt):
+    """Build today's plan: schedule rows plus pre-parsed slot/event windows.
+
+    ``slots``   regular schedules with normalized HH:MM, minutes and datetimes
+    ``events``  event_schedules whose window overlaps today, teacher names resolved
+    ``no_class`` active no-class rows covering today
+    """
+    today_ymd = now_dt.strftime('%Y-%m-%d')
+    today_dow = now_dt.weekday()
+    day_start = now_dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    day_end = day_start + timedelta(days=1)
+
+    rows = [s for s in db_get_all_schedules() if int(s['day_of_week']) == today_dow]
+
+    slots = []
+    for s in rows:
+        if str(s.get('schedule_id', '')).startswith('event:'):
+            continue
+        start_hhmm = _normalize_hhmm(s.get('start_time'))
+        end_hhmm = _normalize_hhmm(s.get('end_time'))
+        if not start_hhmm or not end_hhmm:
+            print(f"[AUTO WARN] Invalid schedule time format for schedule_id={s.get('schedule_id')} start={s.get('start_time')} end={s.get('end_time')}")
+            continue
+        start_dt = datetime.strptime(f"{today_ymd} {start_hhmm}:00", '%Y-%m-%d %H:%M:%S')
+        end_dt = datetime.strptime(f"{today_ymd} {end_hhmm}:00", '%Y-%m-%d %H:%M:%S')
+        if end_dt <= start_dt:
+            print(f"[AUTO WARN] Invalid schedule window schedule_id={s.get('schedule_id')} start={start_hhmm} end={end_hhmm}")
+            continue
+        slots.append({
+            'row': s,
+            'schedule_id': s.get('schedule_id'),
+            'teacher_username': s.get('teacher_username', ''),
+            'section_key': normalize_section_key(s.get('section_key', '')),
+            'start_hhmm': start_hhmm,
+            'end_hhmm': end_hhmm,
+            'start_mins': _time_mins(start_hhmm),
+            'end_mins': _time_mins(end_hhmm),
+            'start_dt': start_dt,
+            'end_dt': end_dt,
+        })
+
+    no_class_all = db_get_all_no_class_days()
+    no_class = [
+        nc for nc in no_class_all
+        if str(nc.get('from_date', '')).strip() <= today_ymd <= str(nc.get('to_date', '')).strip()
+    ]
+
+    events = []
+    event_rows = db_get_all_event_schedules()
+    users = db_get_all_users() if event_rows else {}
+    for ev in event_rows:
+        try:
+            start_dt = datetime.strptime(str(ev.get('start_at', '')).strip(), '%Y-%m-%d %H:%M:%S')
+            end_dt = datetime.strptime(str(ev.get('end_at', '')).strip(), '%Y-%m-%d %H:%M:%S')
+        except Exception:
+            continue
+        if not (start_dt < day_end and end_dt > day_start):
+            continue
+        teacher_usernames = ev.get('teacher_usernames', []) or []
+        # No-class days are matched against the event's own start date.
+        start_ymd = start_dt.strftime('%Y-%m-%d')
+        blocking = [
+            nc for nc in no_class_all
+            if str(nc.get('from_date', '')).strip() <= start_ymd <= str(nc.get('to_date', '')).strip()
+        ]
+        blocked = any(
+            _no_class_applies_to_teacher(nc, tu)
+            for tu in (teacher_usernames or [''])
+            for nc in blocking
+        )
+        primary = teacher_usernames[0] if teacher_usernames else ''
+        primary_account = users.get(primary) or {}
+        events.append({
+            'event': ev,
+            'event_id': ev.get('event_id'),
+            'start_dt': start_dt,
+            'end_dt': end_dt,
+            'blocked': blocked,
+            'teacher_usernames': teacher_usernames,
+            'section_keys': _get_section_keys_from_event(ev),
+            'primary_teacher_username': primary,
+            'primary_teacher_name': primary_account.get('full_name', primary or 'Event Monitor'),
+        })
+
+    return {
+        'date': today_ymd,
+        'weekday': today_dow,
+        'built_at': _now_local().strftime('%Y-%m-%d %H:%M:%S'),
+        'rows': rows,
+        'slots': slots,
+        'events': events,
+        'no_class': no_class,
+        'teacher_rows': {},
+    }
+
+
+TODAY_PLAN = _TodayPlanCache(
+    build_fn=_build_today_plan,
+    now_fn=_now_local,
+    max_age_seconds=int(os.getenv('SCHEDULE_PLAN_MAX_AGE_SECONDS', '0') or 0) or None,
+)
+
 def db_get_teacher_sessions(username):
     with get_db() as conn:
         rows = conn.execute(
@@ -2725,76 +3202,66 @@ def check_and_start_scheduled_sessions():
     2. Check for active sessions that should have ended.
     """
     now_dt = _now_local()
-    today_dow = now_dt.weekday()
-    current_time_str = now_dt.strftime('%H:%M')
     today_ymd = now_dt.strftime('%Y-%m-%d')
+    today_start = now_dt.replace(hour=0, minute=0, second=0, microsecond=0)
     
     with app.app_context():
-        no_class_today = db_get_no_class_days_for_date(today_ymd)
-        if no_class_today:
+        plan = TODAY_PLAN.get(now_dt)
+        if plan['no_class']:
             print(f"[AUTO] No-class day active on {today_ymd}; skipping automatic schedule starts.")
 
-        # Get all active schedules for today
-        schedules = [s for s in db_get_all_schedules() if int(s['day_of_week']) == today_dow]
+        # Today's schedules, already filtered by weekday and time-parsed
+        slots = plan['slots']
         active_sessions = get_active_sessions()
         
-        if schedules:
-            print(f"[AUTO] Checking {len(schedules)} schedule(s) for today ({now_dt.strftime('%A %Y-%m-%d %H:%M:%S')})")
+        if slots:
+            print(f"[AUTO] Checking {len(slots)} schedule(s) for today ({now_dt.strftime('%A %Y-%m-%d %H:%M:%S')})")
         
-        for s in schedules:
-            start_time = s['start_time']
-            end_time   = s['end_time']
-            start_hhmm = _normalize_hhmm(start_time)
-            end_hhmm = _normalize_hhmm(end_time)
-            if not start_hhmm or not end_hhmm:
-                print(f"[AUTO WARN] Invalid schedule time format for schedule_id={s.get('schedule_id')} start={start_time} end={end_time}")
-                continue
-            
+        # Resolve "already ran / skipped / no-class" for every schedule up front
+        # with three set queries, then test membership in memory.
+        started_ids, started_legacy = set(), set()
+        with get_db() as conn:
+            for r in conn.execute(
+                "SELECT schedule_id, teacher_username, subject_id, section_key "
+                "FROM sessions WHERE started_ts >= ? AND started_ts < ?",
+                (today_start, today_start + timedelta(days=1))
+            ).fetchall():
+                if r['schedule_id']:
+                    started_ids.add(str(r['schedule_id']))
+                started_legacy.add((r['teacher_username'] or '', r['subject_id'] or '', r['section_key'] or ''))
+            skipped_ids = {
+                str(r['schedule_id']) for r in conn.execute(
+                    "SELECT schedule_id FROM skipped_sessions WHERE skip_date=?",
+                    (today_ymd,)
+                ).fetchall()
+            }
+        no_class_rows = plan['no_class']
+
+        for slot in slots:
+            s = slot['row']
+            start_hhmm = slot['start_hhmm']
+            end_hhmm = slot['end_hhmm']
+            start_dt = slot['start_dt']
+            end_dt = slot['end_dt']
+
             # Start at schedule trigger time if this specific schedule has not run yet today.
             # Using schedule_id avoids false blocks from other sessions with same subject/section.
-            today_prefix = now_dt.strftime('%Y-%m-%d') + '%'
-            with get_db() as conn:
-                schedule_id = s.get('schedule_id')
-                if schedule_id:
-                    already_ran = conn.execute(
-                        "SELECT 1 FROM sessions WHERE schedule_id=? AND started_at LIKE ?",
-                        (str(schedule_id), today_prefix)
-                    ).fetchone()
-                else:
-                    # Legacy fallback for rows without schedule_id.
-                    already_ran = conn.execute(
-                        "SELECT 1 FROM sessions "
-                        "WHERE teacher_username=? AND subject_id=? AND section_key=? AND started_at LIKE ?",
-                        (
-                            s.get('teacher_username', ''),
-                            s['subject_id'],
-                            normalize_section_key(s['section_key']),
-                            today_prefix,
-                        )
-                    ).fetchone()
-            
-            start_dt = datetime.strptime(
-                f"{now_dt.strftime('%Y-%m-%d')} {start_hhmm}:00",
-                '%Y-%m-%d %H:%M:%S'
-            )
-            end_dt = datetime.strptime(
-                f"{now_dt.strftime('%Y-%m-%d')} {end_hhmm}:00",
-                '%Y-%m-%d %H:%M:%S'
-            )
-            if end_dt <= start_dt:
-                print(f"[AUTO WARN] Invalid schedule window schedule_id={s.get('schedule_id')} start={start_hhmm} end={end_hhmm}")
-                continue
-
-            if db_get_no_class_days_for_date(today_ymd, s.get('teacher_username', '')):
+            schedule_id = s.get('schedule_id')
+            if schedule_id:
+                already_ran = str(schedule_id) in started_ids
+            else:
+                # Legacy fallback for rows without schedule_id.
+                already_ran = (
+                    s.get('teacher_username', ''),
+                    s['subject_id'],
+                    slot['section_key'],
+                ) in started_legacy
+
+            if any(_no_class_applies_to_teacher(nc, s.get('teacher_username', '')) for nc in no_class_rows):
                 continue
 
             # Check if this automated session was manually skipped today
-            with get_db() as conn:
-                was_skipped = conn.execute(
-                    "SELECT 1 FROM skipped_sessions WHERE schedule_id=? AND skip_date=?",
-                    (str(s.get('schedule_id','')), today_ymd)
-                ).fetchone()
-            if was_skipped:
+            if str(s.get('schedule_id', '')) in skipped_ids:
                 continue
 
             if not already_ran and start_dt <= now_dt < end_dt:
@@ -2823,34 +3290,33 @@ def check_and_start_scheduled_sessions():
                     'schedule_id': s['schedule_id']
                 }
                 save_session(sess_id, new_sess)
+                _capture_session_roster(sess_id, [new_sess['section_key']])
                 print(f"[AUTO] Started session {sess_id} for {s['subject_name']} ({s['teacher_username']}) - Section: {new_sess['section_key']}")
             elif already_ran and start_dt <= now_dt < end_dt:
                 print(f"[AUTO] Skipped schedule_id={s.get('schedule_id')} (already ran today)")
 
         # One-time school events: create event sessions for selected teacher/section pairs.
-        event_schedules = db_get_all_event_schedules()
-        for ev in event_schedules:
-            start_raw = str(ev.get('start_at', '')).strip()
-            end_raw = str(ev.get('end_at', '')).strip()
-            if not start_raw or not end_raw:
-                continue
-            try:
-                start_dt = datetime.strptime(start_raw, '%Y-%m-%d %H:%M:%S')
-                end_dt = datetime.strptime(end_raw, '%Y-%m-%d %H:%M:%S')
-            except Exception:
-                continue
-            event_blocked = False
-            for teacher_username in (ev.get('teacher_usernames', []) or ['']):
-                if db_get_no_class_days_for_date(start_dt.strftime('%Y-%m-%d'), teacher_username):
-                    event_blocked = True
-                    break
-            if event_blocked:
+        event_keys = [f"event:{pe['event_id']}" for pe in plan['events']]
+        started_event_keys = set()
+        if event_keys:
+            with get_db() as conn:
+                started_event_keys = {
+                    str(r['schedule_id']) for r in conn.execute(
+                        "SELECT DISTINCT schedule_id FROM sessions WHERE schedule_id = ANY(?)",
+                        (event_keys,)
+                    ).fetchall()
+                }
+        for pe in plan['events']:
+            ev = pe['event']
+            start_dt = pe['start_dt']
+            end_dt = pe['end_dt']
+            if pe['blocked']:
                 continue
             if not (start_dt <= now_dt < end_dt):
                 continue
 
-            teacher_usernames = ev.get('teacher_usernames', []) or []
-            section_keys = _get_section_keys_from_event(ev)
+            teacher_usernames = list(pe['teacher_usernames'])
+            section_keys = list(pe['section_keys'])
             if not teacher_usernames:
                 teacher_usernames = ['']
             if not section_keys:
@@ -2858,20 +3324,13 @@ def check_and_start_scheduled_sessions():
 
             # Unified session for all teachers/sections of this event
             schedule_key = f"event:{ev.get('event_id')}"
-            with get_db() as conn:
-                already_ran = conn.execute(
-                    "SELECT 1 FROM sessions WHERE schedule_id=?",
-                    (schedule_key,),
-                ).fetchone()
-            
-            if already_ran:
+            if schedule_key in started_event_keys:
                 continue
 
             # First teacher/section in the list will be the primary one for the sessions table record,
             # but others will share ownership via _is_my_session.
-            primary_teacher_username = teacher_usernames[0] if teacher_usernames else ''
-            teacher = db_get_user(primary_teacher_username) if primary_teacher_username else {}
-            teacher_name = teacher.get('full_name', primary_teacher_username or 'Event Monitor')
+            primary_teacher_username = pe['primary_teacher_username']
+            teacher_name = pe['primary_teacher_name']
             
             primary_section_key = section_keys[0] if section_keys else ''
 
@@ -2896,6 +3355,7 @@ def check_and_start_scheduled_sessions():
                 'event_description': ev.get('description', '')
             }
             save_session(sess_id, new_sess)
+            _capture_session_roster(sess_id, [sk for sk in section_keys if sk])
             print(f"[AUTO EVENT] Started unified session {sess_id} for event {ev.get('event_id')}")
             # (Previously archived here on start) — archiving moved to finalization step
 
@@ -2906,13 +3366,12 @@ def check_and_start_scheduled_sessions():
                 try:
                     end_dt = datetime.strptime(auto_end, '%Y-%m-%d %H:%M:%S')
                     if now_dt >= end_dt:
-                        result = _finalize_session(
+                        if FINALIZE_POOL.submit(
                             sid,
                             ended_time=now_dt.strftime('%Y-%m-%d %H:%M:%S'),
                             async_chain_and_email=True,
-                        )
-                        if result and not result.get('already_ended'):
-                            print(f"[AUTO] Ended session {sid} automatically.")
+                        ):
+                            print(f"[AUTO] Queued automatic end for session {sid}.")
                 except:
                     pass
 
@@ -2943,9 +3402,8 @@ def _check_and_end_expired_sessions_impl():
                 end_dt = datetime.strptime(auto_end_at, '%Y-%m-%d %H:%M:%S')
                 # now_dt and end_dt are both naive, safe to compare
                 if now_dt >= end_dt:
-                    result = _finalize_session(sess_id, ended_time=now_str, async_chain_and_email=True)
-                    if result and not result.get('already_ended'):
-                        print(f"[AUTO] Ended session {sess_id} (Auto End Reached)")
+                    if FINALIZE_POOL.submit(sess_id, ended_time=now_str, async_chain_and_email=True):
+                        print(f"[AUTO] Queued end for session {sess_id} (Auto End Reached)")
                 continue
             except Exception as e:
                 # If stored timestamp is malformed, fall back to schedule lookup below.
@@ -2976,35 +3434,106 @@ def _check_and_end_expired_sessions_impl():
         if end_mins is None or current_time_mins is None:
             continue
         if current_time_mins >= end_mins:
-            result = _finalize_session(sess_id, ended_time=now_str, async_chain_and_email=True)
-            if result and not result.get('already_ended'):
-                print(f"[AUTO] Ended session {sess_id} (Schedule End Time Reached)")
+            if FINALIZE_POOL.submit(sess_id, ended_time=now_str, async_chain_and_email=True):
+                print(f"[AUTO] Queued end for session {sess_id} (Schedule End Time Reached)")
+
+def _build_automation_plan(now_dt):
+    """Upcoming start/end instants for today, as (datetime, label) pairs.
+
+    Feeds the automation scheduler's priority queue; the scheduler sleeps until
+    the earliest instant instead of polling.
+    """
+    today_ymd = now_dt.strftime('%Y-%m-%d')
+    plan = []
+
+    with app.app_context():
+        today = TODAY_PLAN.get(now_dt)
+        with get_db() as conn:
+            skipped_ids = {
+                str(r['schedule_id']) for r in conn.execute(
+                    "SELECT schedule_id FROM skipped_sessions WHERE skip_date=?", (today_ymd,)
+                ).fetchall()
+            }
+            active_rows = conn.execute(
+                "SELECT sess_id, auto_end_at FROM sessions WHERE ended_at IS NULL"
+            ).fetchall()
+
+        for slot in today['slots']:
+            if str(slot['schedule_id'] or '') in skipped_ids:
+                continue
+            if any(_no_class_applies_to_teacher(nc, slot['teacher_username']) for nc in today['no_class']):
+                continue
+            label = slot['row'].get('subject_name') or slot['schedule_id']
+            plan.append((slot['start_dt'], f"start {label}"))
+            plan.append((slot['end_dt'], f"end {label}"))
+
+        for pe in today['events']:
+            if pe['blocked']:
+                continue
+            label = pe['event'].get('title', pe['event_id'])
+            plan.append((pe['start_dt'], f"start event {label}"))
+            plan.append((pe['end_dt'], f"end event {label}"))
+
+        for r in active_rows:
+            try:
+                plan.append((datetime.strptime((r['auto_end_at'] or '').strip(), '%Y-%m-%d %H:%M:%S'),
+                             f"auto-end {r['sess_id']}"))
+            except Exception:
+                continue
+
+    tomorrow = (now_dt + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return [(at, label) for at, label in plan if now_dt < at < tomorrow]
+
+
+def _automation_tick():
+    check_and_start_scheduled_sessions()
+    check_and_end_expired_sessions()
+
+
+AUTOMATION_SCHEDULER = _SessionScheduler(
+    tick_fn=_automation_tick,
+    plan_fn=_build_automation_plan,
+    now_fn=_now_local,
+    get_db_fn=get_db,
+    dsn=DATABASE_URL,
+    max_idle_seconds=int(os.getenv('AUTOMATION_MAX_IDLE_SECONDS', '300') or 300),
+    on_change_fn=TODAY_PLAN.invalidate,
+    should_run_fn=lambda: AUTOMATION_LEADER.is_leader(),
+)
+
+# Exactly one process (across gunicorn workers and replicas) runs the
+# scheduler; the others campaign for the advisory lock and stay on standby.
+AUTOMATION_LEADER = _AutomationLeader(
+    dsn=DATABASE_URL,
+    retry_seconds=int(os.getenv('AUTOMATION_LEADER_RETRY_SECONDS', '15') or 15),
+    on_elected=lambda: AUTOMATION_SCHEDULER.request_replan('elected leader'),
+)
+
+
+def _notify_schedule_changed(reason='', plan_changed=True):
+    """Wake the automation scheduler (in this and other processes) to re-plan.
+
+    ``plan_changed`` also drops the cached TODAY_PLAN; session start/end/skip
+    only move the schedule's timeline, not the plan itself.
+    """
+    if plan_changed:
+        TODAY_PLAN.invalidate(reason)
+    try:
+        AUTOMATION_SCHEDULER.notify_changed(reason, plan_changed=plan_changed)
+    except Exception as e:
+        print(f"[AUTO] Schedule change notification failed: {e}")
+
 
 def automation_loop():
     """Single master loop for DAVS automation/synchronization.
-    
-    Runs every few seconds so scheduled sessions start almost immediately
-    after the trigger time while still being lightweight.
+
+    Event-driven: sleeps until the next scheduled start/end instant (or a
+    schedule/session change notification) instead of polling every few
+    seconds. AUTOMATION_MAX_IDLE_SECONDS bounds the sleep as a safety net.
+    Only the elected leader process actually ticks.
     """
-    poll_seconds = 5
-    last_log_time = 0
-    while True:
-        try:
-            current_time = time.time()
-            # Log status every 60 seconds
-            if current_time - last_log_time > 60:
-                now_dt = _now_local()
-                active_count = len(get_active_sessions())
-                print(f"[AUTO] Heartbeat: {now_dt.strftime('%Y-%m-%d %H:%M:%S')} | Active sessions: {active_count}")
-                last_log_time = current_time
-            
-            check_and_start_scheduled_sessions()
-            check_and_end_expired_sessions()
-        except Exception as e:
-            import traceback
-            print(f"[AUTO ERROR] {e}")
-            print(f"[AUTO ERROR] Traceback: {traceback.format_exc()}")
-        time.sleep(poll_seconds)
+    AUTOMATION_LEADER.start()
+    AUTOMATION_SCHEDULER.run_forever()
 
 def ensure_automation_thread_running():
     """Start automation loop once per process even under flask/wsgi launch modes."""
@@ -3121,6 +3650,22 @@ def db_get_all_excuse_requests(status_filter=None):
         print(f'[DB] db_get_all_excuse_requests error: {e}')
         return []
 
+def db_get_approved_excuses(sess_ids):
+    """sess_id -> {nfc_id: approved excuse} for ``sess_ids`` (one query)."""
+    ids = sorted({str(sid) for sid in (sess_ids or []) if sid})
+    if not ids:
+        return {}
+    with get_db() as conn:
+        rows = conn.execute(
+            "SELECT sess_id, nfc_id, reason_type, reason_detail, attachment_file FROM excuse_requests "
+            "WHERE sess_id = ANY(?) AND status='approved'",
+            (ids,)
+        ).fetchall()
+    out = {}
+    for r in rows:
+        out.setdefault(r['sess_id'], {})[r['nfc_id']] = dict(r)
+    return out
+
 def db_get_excuse_request(excuse_id):
     with get_db() as conn:
         pk_col = _excuse_pk_column(conn)
@@ -3172,6 +3717,7 @@ def db_resolve_excuse(excuse_id: int, resolution: str, reviewed_by: str) -> dict
                  (row_dict['sess_id'], row_dict['nfc_id'], row_dict['student_name'], row_dict['student_id'],
                   row_dict['sess_id'], now, note, resolved_excuse_id, now)
             )
+            _refresh_stats_rollup(conn, row_dict['sess_id'])
             # Defer session save_session sync until after this DB transaction closes.
             session_sync = {
                 'sess_id': row_dict['sess_id'],
@@ -3295,6 +3841,9 @@ app.jinja_env.filters['fmt_timeslot'] = fmt_timeslot
 app.jinja_env.filters['fmt_time'] = fmt_time
 app.jinja_env.filters['fmt_time_short'] = fmt_time_short
 
+# Compile the email templates (templates/emails/) once, on the app's environment.
+_init_email_templates(app.jinja_env)
+
 # ── Role constants ────────────────────────────────────────────────────────
 SUPER_ADMIN_ROLE = 'super_admin'
 ADMIN_ROLES  = {'admin', 'super_admin'}
@@ -3406,9 +3955,8 @@ def get_all_students():
 
 def get_attendance_records(nfc_id):
     try:
-        ts, statuses = contract.functions.getAttendance(nfc_id).call()
         out = []
-        for t, code in zip(ts, statuses):
+        for t, code in _iter_attendance_history(contract, nfc_id):
             # Legacy contract returns bool; upgraded contract returns uint8.
             if isinstance(code, bool):
                 status = 'present' if code else 'absent'
@@ -3420,20 +3968,44 @@ def get_attendance_records(nfc_id):
         return []
 
 
-def get_student_session_rows_for_export(nfc_id):
-    reason_labels = {
-        'sickness': 'Sickness / Illness',
-        'lbm': 'LBM',
-        'emergency': 'Family Emergency',
-        'bereavement': 'Bereavement',
-        'medical': 'Medical Appointment',
-        'accident': 'Accident / Injury',
-        'official': 'Official School Business',
-        'weather': 'Extreme Weather / Calamity',
-        'transport': 'Transportation Problem',
-        'others': 'Others',
+_EXPORT_REASON_LABELS = {
+    'sickness': 'Sickness / Illness',
+    'lbm': 'LBM',
+    'emergency': 'Family Emergency',
+    'bereavement': 'Bereavement',
+    'medical': 'Medical Appointment',
+    'accident': 'Accident / Injury',
+    'official': 'Official School Business',
+    'weather': 'Extreme Weather / Calamity',
+    'transport': 'Transportation Problem',
+    'others': 'Others',
+}
+
+def _export_session_row(lg, ex):
+    """One session line of a student's CSV export from its log/session columns and approved excuse (or {})."""
+    excuse_reason = ''
+    if ex.get('reason_type'):
+        excuse_reason = _EXPORT_REASON_LABELS.get(ex['reason_type'], ex['reason_type'])
+        if ex.get('reason_detail'):
+            excuse_reason += f" ({ex['reason_detail']})"
+    elif lg['excuse_note']:
+        excuse_reason = lg['excuse_note']
+
+    return {
+        'code': lg['course_code'] or '',
+        'subject': lg['subject_name'] or '',
+        'class_type': (lg['class_type'] or 'lecture').capitalize(),
+        'teacher': lg['teacher_name'] or '',
+        'date': lg['started_at'] or '',
+        'time_slot': lg['time_slot'] or '',
+        'tx_hash': lg['tx_hash'] or '—',
+        'block': str(lg['block_number']) if lg['block_number'] else '—',
+        'status': (lg['status'] or '').capitalize(),
+        'excuse': excuse_reason or '—',
+        'document': ex.get('attachment_file') or '—',
     }
 
+def get_student_session_rows_for_export(nfc_id):
     with get_db() as conn:
         log_rows = conn.execute(
             "SELECT al.status, al.tx_hash, al.block_number, al.tap_time, al.excuse_note, "
@@ -3459,34 +4031,58 @@ def get_student_session_rows_for_export(nfc_id):
             'attachment_file': ex['attachment_file'] or '',
         }
 
-    rows = []
-    for lg in log_rows:
-        ex = exc_map.get(lg['sess_id'], {})
-        excuse_reason = ''
-        if ex.get('reason_type'):
-            excuse_reason = reason_labels.get(ex['reason_type'], ex['reason_type'])
-            if ex.get('reason_detail'):
-                excuse_reason += f" ({ex['reason_detail']})"
-        elif lg['excuse_note']:
-            excuse_reason = lg['excuse_note']
+    return [_export_session_row(lg, exc_map.get(lg['sess_id'], {})) for lg in log_rows]
 
-        rows.append(
-            {
-                'code': lg['course_code'] or '',
-                'subject': lg['subject_name'] or '',
-                'class_type': (lg['class_type'] or 'lecture').capitalize(),
-                'teacher': lg['teacher_name'] or '',
-                'date': lg['started_at'] or '',
-                'time_slot': lg['time_slot'] or '',
-                'tx_hash': lg['tx_hash'] or '—',
-                'block': str(lg['block_number']) if lg['block_number'] else '—',
-                'status': (lg['status'] or '').capitalize(),
-                'excuse': excuse_reason or '—',
-                'document': ex.get('attachment_file') or '—',
-            }
-        )
+_EXPORT_LOG_COLUMNS = (
+    'al.status', 'al.tx_hash', 'al.block_number', 'al.excuse_note', 'al.sess_id', 's.subject_name',
+    's.course_code', 's.class_type', 's.teacher_name', 's.time_slot', 's.started_at',
+)
+_EXPORT_EXCUSE_COLUMNS = ('reason_type', 'reason_detail', 'attachment_file')
 
-    return rows
+def iter_student_session_rows_for_export(adviser=None, section_key=None):
+    """
+    (student, session row) for every student, ordered by name and then newest
+    session first, from one join of students, attendance_logs, sessions and
+    approved excuses read through a server-side cursor. A student with no
+    logs comes through once with a None row.
+
+    ``adviser`` limits it to one teacher's advisees (matched like
+    teacher_students) and ``section_key`` to one stored section key.
+    """
+    where, params = [], []
+    if adviser is not None:
+        where.append("lower(trim(COALESCE(st.adviser, ''))) = ?")
+        params.append(str(adviser).strip().lower())
+    if section_key:
+        where.append("st.section_key = ?")
+        params.append(normalize_section_key(section_key))
+    with get_db() as conn:
+        cur = conn.cursor('export_student_sessions')
+        cur.itersize = 2000
+        cur.execute(
+            "SELECT st.*, "
+            + ', '.join(f"{c} AS lg_{c.split('.')[1]}" for c in _EXPORT_LOG_COLUMNS) + ', '
+            + ', '.join(f"ex.{c} AS ex_{c}" for c in _EXPORT_EXCUSE_COLUMNS) + ' '
+            "FROM students st "
+            "LEFT JOIN (attendance_logs al JOIN sessions s ON s.sess_id = al.sess_id) ON al.nfc_id = st.nfc_id "
+            "LEFT JOIN ("
+            " SELECT DISTINCT ON (sess_id, nfc_id) sess_id, nfc_id, reason_type, reason_detail, attachment_file"
+            " FROM excuse_requests WHERE status='approved' ORDER BY sess_id, nfc_id, reviewed_at DESC"
+            ") ex ON ex.sess_id = al.sess_id AND ex.nfc_id = al.nfc_id "
+            + (f"WHERE {' AND '.join(where)} " if where else '')
+            + "ORDER BY st.full_name, st.nfc_id, s.started_at DESC, al.id",
+            params,
+        )
+        student = None
+        for r in cur:
+            if student is None or student['nfcId'] != r['nfc_id']:
+                student = _student_row({k: v for k, v in r.items() if not k.startswith(('lg_', 'ex_'))})
+            if r['lg_sess_id'] is None:
+                yield student, None
+                continue
+            lg = {k[3:]: v for k, v in r.items() if k.startswith('lg_')}
+            ex = {k[3:]: v for k, v in r.items() if k.startswith('ex_')}
+            yield student, _export_session_row(lg, ex)
 
 def chain_status_code(status: str) -> int:
     return {
@@ -4061,7 +4657,18 @@ def _prepare_session_blockchain_data(sess_id, sess):
 
 
 def _finalize_session(sess_id, ended_time=None, async_chain_and_email=True):
-    """Finalize a live session and keep DB/UI/blockchain/email in sync."""
+    """Finalize a live session and keep DB/UI/blockchain/email in sync.
+
+    The session is claimed in the database (``ended_at IS NULL`` -> set) in
+    the same transaction that writes absentees, so only one finalizer across
+    all workers and replicas gets past Step 1. The in-process session lock
+    just keeps a pool worker and a local End Session from racing to the claim.
+    """
+    with FINALIZE_POOL.session_lock(sess_id):
+        return _finalize_session_locked(sess_id, ended_time, async_chain_and_email)
+
+
+def _finalize_session_locked(sess_id, ended_time=None, async_chain_and_email=True):
     sess = load_session(sess_id)
     if not sess:
         return None
@@ -4084,7 +4691,6 @@ def _finalize_session(sess_id, ended_time=None, async_chain_and_email=True):
     if sess.get('ended_at'):
         return {'already_ended': True, 'ended_at': sess.get('ended_at', '')}
 
-    all_students_list = get_all_students()
     section_key = normalize_section_key(sess.get('section_key', ''))
     sess_semester = normalize_semester(sess.get('semester') or '')
     is_school_event = str(sess.get('class_type', 'lecture')).strip().lower() == 'school_event'
@@ -4117,29 +4723,25 @@ def _finalize_session(sess_id, ended_time=None, async_chain_and_email=True):
 
     # Filter students belonging to involved sections & semester
     section_students = []
-    for s in all_students_list:
-        sk = build_student_section_key(s)
-        if sk in involved_sections:
-            if not is_school_event:
-                # Classroom session: must match semester if specified
-                if sess_semester and normalize_semester(s.get('semester')) and normalize_semester(s.get('semester')) != sess_semester:
-                    continue
-            section_students.append(s)
+    roster = db_get_session_roster(sess_id)
+    if roster is None:
+        roster = db_get_students_in_sections(involved_sections)
+    for s in roster:
+        if not is_school_event:
+            # Classroom session: must match semester if specified
+            if sess_semester and normalize_semester(s.get('semester')) and normalize_semester(s.get('semester')) != sess_semester:
+                continue
+        section_students.append(s)
     
     # Add irregular students who tapped in but aren't in the official section list
     tapped_nfc_ids = set(sess.get('present', [])) | set(sess.get('late', [])) | set(sess.get('excused', []))
     existing_nfc_ids = {s['nfcId'] for s in section_students}
-    for s in all_students_list:
-        if s['nfcId'] in tapped_nfc_ids and s['nfcId'] not in existing_nfc_ids:
-            section_students.append(s)
-            existing_nfc_ids.add(s['nfcId'])
+    for s in db_get_students_by_nfc_ids(tapped_nfc_ids - existing_nfc_ids):
+        section_students.append(s)
+        existing_nfc_ids.add(s['nfcId'])
     
     if not section_students:
         print(f"[DEBUG] _finalize_session {sess_id}: NO STUDENTS FOUND for section='{section_key}', sem='{sess_semester}'")
-        # Log a sample student to see why it doesn't match
-        if all_students_list:
-            s0 = all_students_list[0]
-            print(f"[DEBUG] Sample Student Key: '{build_student_section_key(s0)}', Sem: '{str(s0.get('semester') or '').strip().lower()}'")
 
     present_set = set(sess.get('present', []))
     late_set = set(sess.get('late', []))
@@ -4158,31 +4760,40 @@ def _finalize_session(sess_id, ended_time=None, async_chain_and_email=True):
     excused_set.update([row['nfc_id'] for row in approved_excuse_requests])
 
     ended_at = ended_time or _now_local().strftime('%Y-%m-%d %H:%M:%S')
-    absent_ids = []
-    for st in section_students:
-        nid = st['nfcId']
-        if nid in present_set or nid in excused_set:
-            continue
-        db_save_attendance_log(
-            sess_id=sess_id,
-            nfc_id=nid,
-            student_name=st.get('name', ''),
-            student_id=st.get('student_id', ''),
-            status='absent',
-            tap_time=ended_at,
-            tx_hash='',
-            block_number=0,
-        )
-        absent_ids.append(nid)
+    absent_students = [
+        st for st in section_students
+        if st['nfcId'] not in present_set and st['nfcId'] not in excused_set
+    ]
+    absent_ids = [st['nfcId'] for st in absent_students]
+    class_type_norm = str(sess.get('class_type') or 'lecture').strip().lower()
+    if class_type_norm not in ('lecture', 'laboratory', 'school_event'):
+        class_type_norm = 'lecture'
 
-    # ── Step 1: Mark session as ended in DB immediately ─────────────────────
+    # ── Step 1: Mark absentees and the session as ended in one transaction ──
     # IMPORTANT: This MUST run before the blockchain call so that sessions are
     # always marked as ended even if the blockchain call fails or times out.
     with get_db() as conn:
-        conn.execute(
-            "UPDATE sessions SET total_enrolled=?, ended_at=? WHERE sess_id=?",
+        # Claim the session first: the row lock holds off any other finalizer
+        # until we commit, after which its ended_at IS NULL check fails.
+        claimed = conn.execute(
+            "UPDATE sessions SET total_enrolled=?, ended_at=? "
+            "WHERE sess_id=? AND ended_at IS NULL RETURNING sess_id",
             (len(section_students), ended_at, sess_id)
+        ).fetchone()
+        if not claimed:
+            row = conn.execute("SELECT ended_at FROM sessions WHERE sess_id=?", (sess_id,)).fetchone()
+            print(f"[FINALIZE] Session {sess_id} already finalized by another worker")
+            return {'already_ended': True, 'ended_at': (row['ended_at'] if row else '') or ''}
+        _bulk_mark_absent(
+            conn,
+            sess_id=sess_id,
+            students=absent_students,
+            tap_time=ended_at,
+            class_type=class_type_norm,
+            created_at=_now_local().strftime('%Y-%m-%d %H:%M:%S'),
         )
+        _recompute_session_totals(conn, sess_id)
+        _refresh_stats_rollup(conn, sess_id)
 
     sess['ended_at'] = ended_at
     sess['absent'] = absent_ids
@@ -4297,6 +4908,7 @@ def _finalize_session(sess_id, ended_time=None, async_chain_and_email=True):
                                     (ended_at, ev_id),
                                 )
                             print(f"[AUTO EVENT] Archived event {ev_id} after blockchain upload")
+                            _notify_schedule_changed(f'event archived {ev_id}')
                         except Exception as _e:
                             print(f"[AUTO EVENT] Failed to archive event {ev_id} after blockchain upload: {_e}")
         except Exception:
@@ -4312,190 +4924,10 @@ def _finalize_session(sess_id, ended_time=None, async_chain_and_email=True):
 
     
 
-    def _post_finalize_worker():
-        with app.app_context():
-            # For school events, gather all teachers and sections for the email
-            is_school_event = str(sess.get('class_type')).lower() == 'school_event'
-            teachers_list = None
-            sections_list = None
-            if is_school_event:
-                teachers_list = [sess.get('teacher_name', 'Teacher')]
-                sections_list = []
-                sched_id = sess.get('schedule_id')
-                if sched_id:
-                    with get_db() as _conn:
-                        sched_meta = _parse_event_schedule_id(sched_id)
-                        ev_id = sched_meta.get('event_id')
-                        if ev_id:
-                            ev_row = _conn.execute("SELECT section_keys_json, teacher_usernames_json FROM event_schedules WHERE event_id=?", (ev_id,)).fetchone()
-                            if ev_row:
-                                import json
-                                try:
-                                    s_keys = json.loads(ev_row['section_keys_json'])
-                                    for entry in s_keys:
-                                        k = entry.get('key') if isinstance(entry, dict) else entry
-                                        sm = entry.get('semester') if isinstance(entry, dict) else ''
-                                        if k:
-                                            k_fmt = k.replace('|', '-')
-                                            sm_fmt = normalize_semester(sm)
-                                            sections_list.append(f"{k_fmt} {sm_fmt}" if sm_fmt else k_fmt)
-                                except: pass
-                                try:
-                                    t_users = json.loads(ev_row['teacher_usernames_json'])
-                                    for tuname in t_users:
-                                        u = db_get_user(tuname)
-                                        if u and u.get('full_name'):
-                                            teachers_list.append(u['full_name'])
-                                except: pass
-                teachers_list = sorted(list(set([t for t in teachers_list if t])))
-                sections_list = sorted(list(set([s for s in sections_list if s])))
-
-            for st in section_students:
-                nid = st['nfcId']
-                if nid in present_set or nid in excused_set:
-                    continue
-                try:
-                    with get_db() as conn:
-                        lg = conn.execute(
-                            "SELECT tx_hash, block_number FROM attendance_logs WHERE sess_id=? AND nfc_id=?",
-                            (sess_id, nid)
-                        ).fetchone()
-                    send_student_attendance_receipt(
-                        student_name=st.get('name', nid),
-                        student_email=st.get('email', ''),
-                        student_id=st.get('student_id', ''),
-                        subject_name=sess.get('subject_name', ''),
-                        section_key=sess.get('section_key', ''),
-                        teacher_name=sess.get('teacher_name', ''),
-                        tap_time=ended_at,
-                        status='absent',
-                        tx_hash=lg['tx_hash'] if lg else '',
-                        block_num=lg['block_number'] if lg else '',
-                        sess_id=sess_id,
-                        nfc_id=nid,
-                        semester=normalize_semester(st.get('semester')) or sess.get('semester'),
-                        time_slot=sess.get('time_slot'),
-                        enrollment_status=st.get('enrollment_status', 'Regular'),
-                        class_type=sess.get('class_type', 'lecture'),
-                        event_description=sess.get('event_description'),
-                        teachers_involved=teachers_list,
-                        programs_involved=sections_list,
-                    )
-                except Exception as e:
-                    print(f"[EMAIL] Failed absence email for {nid}: {e}")
-
-            # Send final receipts to all students (Present, Late, Excused) with the session TX hash
-            for st in section_students:
-                nid = st['nfcId']
-                if nid in absent_ids: # Already handled above
-                    continue
-                try:
-                    with get_db() as conn:
-                        lg = conn.execute(
-                            "SELECT status, tap_time, tx_hash, block_number FROM attendance_logs WHERE sess_id=? AND nfc_id=?",
-                            (sess_id, nid)
-                        ).fetchone()
-                    if lg:
-                        send_student_attendance_receipt(
-                            student_name=st.get('name', nid),
-                            student_email=st.get('email', ''),
-                            student_id=st.get('student_id', ''),
-                            subject_name=sess.get('subject_name', ''),
-                            section_key=sess.get('section_key', ''),
-                            teacher_name=sess.get('teacher_name', ''),
-                            tap_time=lg['tap_time'] or ended_at,
-                            status=lg['status'],
-                            tx_hash=lg['tx_hash'] or tx_hash or '',
-                            block_num=lg['block_number'] or block_num or 0,
-                            sess_id=sess_id,
-                            nfc_id=nid,
-                            semester=normalize_semester(st.get('semester')) or sess.get('semester'),
-                            time_slot=sess.get('time_slot'),
-                            enrollment_status=st.get('enrollment_status', 'Regular'),
-                            class_type=sess.get('class_type', 'lecture'),
-                            event_description=sess.get('event_description'),
-                            teachers_involved=teachers_list,
-                            programs_involved=sections_list,
-                        )
-                except Exception as e:
-                    print(f"[EMAIL] Failed final receipt email for {nid}: {e}")
-
-            try:
-                users = db_get_all_users()
-                teacher_username = sess.get('teacher_username', '') or sess.get('teacher', '')
-                teacher_email = users.get(teacher_username, {}).get('email', '')
-                if teacher_email:
-                    logs = {lg['nfc_id']: lg for lg in db_get_session_attendance(sess_id)}
-                    present_count = late_count = absent_count = excused_count = 0
-                    rows = []
-                    for st in section_students:
-                        nid = st['nfcId']
-                        lg = logs.get(nid, {})
-                        st_status = (lg.get('status') or 'absent').lower() if lg else 'absent'
-                        if st_status == 'late':
-                            late_count += 1
-                        elif st_status == 'present':
-                            present_count += 1
-                        elif st_status == 'excused':
-                            excused_count += 1
-                        else:
-                            absent_count += 1
-                        # Formatting: BSCS4A (1st Semester)
-                        prog_code = st.get('course', '—')
-                        yr = st.get('year_level', '—')[0] if st.get('year_level') else '—'
-                        sec = st.get('section', '—')
-                        st_sem = normalize_semester(st.get('semester')) or sess.get('semester', '—')
-                        ps_disp = f"{prog_code}-{st.get('year_level','—')}-{sec} {st_sem}".replace('--', '-')
-                        
-                        rows.append({
-                            'name': st.get('name', '—'),
-                            'student_id': st.get('student_id', ''),
-                            'nfc_id': nid,
-                            'status': st_status,
-                            'tap_time': lg.get('tap_time', '—') if lg else '—',
-                            'tx_hash': lg.get('tx_hash', '') if lg else '',
-                            'block_num': lg.get('block_number', '') if lg else '',
-                            'enrollment_status': st.get('enrollment_status', 'Regular'),
-                            'program_section': ps_disp,
-                        })
-                    
-                    # Reload session to get the latest TX hash/block
-                    fresh_sess = load_session(sess_id)
-                    session_tx_hash = fresh_sess.get('session_tx_hash', '')
-                    session_block_number = fresh_sess.get('session_block_number', 0)
-                    
-                    if session_tx_hash and len(str(session_tx_hash)) > 10:
-                        send_teacher_session_summary(
-                            teacher_email=teacher_email,
-                            teacher_name=sess.get('teacher_name', ''),
-                            subject_name=sess.get('subject_name', ''),
-                            section_key=sess.get('section_key', ''),
-                            time_slot=sess.get('time_slot', ''),
-                            started_at=sess.get('started_at', ''),
-                            ended_at=ended_at,
-                            present_count=present_count,
-                            late_count=late_count,
-                            absent_count=absent_count,
-                            excused_count=excused_count,
-                            student_rows=rows,
-                            session_tx_hash=session_tx_hash,
-                            session_block_number=session_block_number,
-                            semester=sess.get('semester', ''),
-                            class_type=sess.get('class_type', 'lecture'),
-                            course_code=sess.get('course_code', ''),
-                            event_description=sess.get('event_description'),
-                            teachers_involved=teachers_list,
-                            programs_involved=sections_list,
-                        )
-                    else:
-                        print(f"[EMAIL] Skipping teacher summary for {sess_id}: TX hash pending/failed (val='{session_tx_hash}').")
-            except Exception as e:
-                print(f"[EMAIL] Teacher summary error: {e}")
-
-    if async_chain_and_email:
-        Thread(target=_post_finalize_worker, daemon=True).start()
-    else:
-        _post_finalize_worker()
+    _enqueue_post_finalize_jobs(sess_id, section_students, absent_ids, ended_at)
+    if not async_chain_and_email:
+        while POST_FINALIZE_QUEUE.run_once(sess_id=sess_id):
+            pass
 
     return {
         'already_ended': False,
@@ -4509,6 +4941,264 @@ def _finalize_session(sess_id, ended_time=None, async_chain_and_email=True):
         'bc_error': bc_error,
     }
 
+FINALIZE_POOL = _FinalizePool(
+    finalize_fn=_finalize_session,
+    max_workers=int(os.getenv('FINALIZE_WORKERS', '4') or 4),
+    context_fn=app.app_context,
+)
+
+
+# ── Post-finalize jobs (receipts + teacher summary) ────────────────────────
+
+def _roster_payload(st):
+    return {
+        'name': st.get('name', ''),
+        'email': st.get('email', ''),
+        'student_id': st.get('student_id', ''),
+        'course': st.get('course', ''),
+        'year_level': st.get('year_level', ''),
+        'section': st.get('section', ''),
+        'semester': st.get('semester', ''),
+        'enrollment_status': st.get('enrollment_status', 'Regular'),
+    }
+
+
+def _enqueue_post_finalize_jobs(sess_id, section_students, absent_ids, ended_at):
+    """One receipt job per student plus one teacher summary job; safe to call twice."""
+    absent_set = set(absent_ids)
+    jobs = []
+    for st in section_students:
+        nid = st['nfcId']
+        if not st.get('email'):
+            continue
+        payload = _roster_payload(st)
+        payload.update({'ended_at': ended_at, 'absent': nid in absent_set})
+        jobs.append((sess_id, nid, 'receipt', payload))
+    jobs.append((sess_id, '', 'teacher_summary', {
+        'ended_at': ended_at,
+        'students': [dict(_roster_payload(st), nfc_id=st['nfcId']) for st in section_students],
+    }))
+    try:
+        POST_FINALIZE_QUEUE.enqueue(jobs)
+    except Exception as e:
+        print(f"[JOBS] Could not enqueue post-finalize jobs for {sess_id}: {e}")
+
+
+def _post_finalize_event_context(sess):
+    """(teachers_involved, programs_involved) for school-event emails, else (None, None)."""
+    if str(sess.get('class_type')).lower() != 'school_event':
+        return None, None
+    teachers_list = [sess.get('teacher_name', 'Teacher')]
+    sections_list = []
+    sched_id = sess.get('schedule_id')
+    if sched_id:
+        sched_meta = _parse_event_schedule_id(sched_id)
+        ev_id = sched_meta.get('event_id')
+        if ev_id:
+            with get_db() as _conn:
+                ev_row = _conn.execute("SELECT section_keys_json, teacher_usernames_json FROM event_schedules WHERE event_id=?", (ev_id,)).fetchone()
+            if ev_row:
+                try:
+                    s_keys = json.loads(ev_row['section_keys_json'])
+                    for entry in s_keys:
+                        k = entry.get('key') if isinstance(entry, dict) else entry
+                        sm = entry.get('semester') if isinstance(entry, dict) else ''
+                        if k:
+                            k_fmt = k.replace('|', '-')
+                            sm_fmt = normalize_semester(sm)
+                            sections_list.append(f"{k_fmt} {sm_fmt}" if sm_fmt else k_fmt)
+                except: pass
+                try:
+                    users = db_get_all_users()
+                    for tuname in json.loads(ev_row['teacher_usernames_json']):
+                        u = users.get(tuname)
+                        if u and u.get('full_name'):
+                            teachers_list.append(u['full_name'])
+                except: pass
+    teachers_list = sorted(list(set([t for t in teachers_list if t])))
+    sections_list = sorted(list(set([s for s in sections_list if s])))
+    return teachers_list, sections_list
+
+
+def _run_post_finalize_jobs(sess_id, jobs):
+    """Queue handler: all claimed jobs of one session, sharing one attendance_logs read."""
+    sess = load_session(sess_id)
+    if not sess:
+        return {j['id']: None for j in jobs}
+    logs = {lg['nfc_id']: lg for lg in db_get_session_attendance(sess_id)}
+    teachers_list, sections_list = _post_finalize_event_context(sess)
+    session_tx_hash = sess.get('session_tx_hash', '')
+    session_block_number = sess.get('session_block_number', 0)
+    results = {}
+    receipts = []
+
+    for job in jobs:
+        p = job['payload']
+        nid = job['nfc_id']
+        try:
+            if job['kind'] == 'receipt':
+                lg = logs.get(nid)
+                if not lg and not p.get('absent'):
+                    results[job['id']] = None
+                    continue
+                receipts.append((job, dict(
+                    student_name=p.get('name') or nid,
+                    student_email=p.get('email', ''),
+                    student_id=p.get('student_id', ''),
+                    subject_name=sess.get('subject_name', ''),
+                    section_key=sess.get('section_key', ''),
+                    teacher_name=sess.get('teacher_name', ''),
+                    tap_time=(lg['tap_time'] if lg and not p.get('absent') else None) or p.get('ended_at'),
+                    status='absent' if p.get('absent') else lg['status'],
+                    tx_hash=(lg['tx_hash'] if lg else '') or session_tx_hash or '',
+                    block_num=(lg['block_number'] if lg else 0) or session_block_number or 0,
+                    sess_id=sess_id,
+                    nfc_id=nid,
+                    semester=normalize_semester(p.get('semester')) or sess.get('semester'),
+                    time_slot=sess.get('time_slot'),
+                    enrollment_status=p.get('enrollment_status', 'Regular'),
+                    class_type=sess.get('class_type', 'lecture'),
+                    event_description=sess.get('event_description'),
+                    teachers_involved=teachers_list,
+                    programs_involved=sections_list,
+                )))
+                continue
+            elif job['kind'] == 'teacher_summary':
+                _send_post_finalize_teacher_summary(sess_id, sess, p, logs, teachers_list, sections_list)
+            results[job['id']] = None
+        except Exception as e:
+            print(f"[EMAIL] Post-finalize {job['kind']} failed for {sess_id}/{nid}: {e}")
+            results[job['id']] = str(e) or e.__class__.__name__
+
+    results.update(_send_post_finalize_receipts(sess_id, receipts))
+    return results
+
+
+# Receipt fields that are per student; the rest are shared by the whole bulk send.
+_RECEIPT_STUDENT_FIELDS = ('student_name', 'student_email', 'student_id', 'nfc_id',
+                           'enrollment_status', 'tap_time', 'status')
+
+
+def _send_post_finalize_receipts(sess_id, receipts):
+    """
+    Send [(job, receipt_kwargs), ...]. Receipts that render from the same template
+    (same status, TX and semester) go out as one SendGrid/Brevo bulk call with
+    per-student substitutions; on plain SMTP each receipt is sent on its own.
+    """
+    results = {}
+    groups = defaultdict(list)
+    for job, r in receipts:
+        if not r['student_email'] or '@' not in r['student_email']:
+            results[job['id']] = None
+            continue
+        key = (r['status'], bool(r['student_id']), r['tx_hash'], r['block_num'], r['semester'])
+        groups[key].append((job, r))
+
+    for (status, has_student_id, *_), members in groups.items():
+        shared = {k: v for k, v in members[0][1].items() if k not in _RECEIPT_STUDENT_FIELDS}
+        errors = None
+        try:
+            subject, html = _student_receipt_bulk_template(
+                token_fn=_email_substitution_token, status=status,
+                has_student_id=has_student_id, url_for_fn=url_for, **shared)
+            errors = _send_email_bulk(subject, html, [
+                (r['student_email'], _student_receipt_substitutions(
+                    token_fn=_email_substitution_token,
+                    **{k: r[k] for k in _RECEIPT_STUDENT_FIELDS if k != 'student_email'}))
+                for _, r in members
+            ])
+        except Exception as e:
+            print(f"[EMAIL] Bulk receipts failed for {sess_id} ({status}): {e}")
+        if errors is not None:
+            for (job, _), err in zip(members, errors):
+                results[job['id']] = err
+            continue
+        for job, r in members:
+            try:
+                _send_student_attendance_receipt_template(send_email_fn=_send_email_sync, url_for_fn=url_for, **r)
+                results[job['id']] = None
+            except Exception as e:
+                print(f"[EMAIL] Post-finalize receipt failed for {sess_id}/{job['nfc_id']}: {e}")
+                results[job['id']] = str(e) or e.__class__.__name__
+    return results
+
+
+def _send_post_finalize_teacher_summary(sess_id, sess, payload, logs, teachers_list, sections_list):
+    teacher_username = sess.get('teacher_username', '') or sess.get('teacher', '')
+    teacher_email = (db_get_user(teacher_username) or {}).get('email', '') if teacher_username else ''
+    if not teacher_email:
+        return
+    session_tx_hash = sess.get('session_tx_hash', '')
+    session_block_number = sess.get('session_block_number', 0)
+    if not (session_tx_hash and len(str(session_tx_hash)) > 10):
+        # Not recorded on chain yet: fail the job so the queue retries it.
+        raise RuntimeError(f"session TX hash not confirmed yet (val='{session_tx_hash}')")
+    present_count = late_count = absent_count = excused_count = 0
+    rows = []
+    for st in payload.get('students', []):
+        nid = st['nfc_id']
+        lg = logs.get(nid, {})
+        st_status = (lg.get('status') or 'absent').lower() if lg else 'absent'
+        if st_status == 'late':
+            late_count += 1
+        elif st_status == 'present':
+            present_count += 1
+        elif st_status == 'excused':
+            excused_count += 1
+        else:
+            absent_count += 1
+        # Formatting: BSCS4A (1st Semester)
+        prog_code = st.get('course') or '—'
+        sec = st.get('section') or '—'
+        st_sem = normalize_semester(st.get('semester')) or sess.get('semester', '—')
+        ps_disp = f"{prog_code}-{st.get('year_level') or '—'}-{sec} {st_sem}".replace('--', '-')
+        rows.append({
+            'name': st.get('name') or '—',
+            'student_id': st.get('student_id', ''),
+            'nfc_id': nid,
+            'status': st_status,
+            'tap_time': lg.get('tap_time', '—') if lg else '—',
+            'tx_hash': lg.get('tx_hash', '') if lg else '',
+            'block_num': lg.get('block_number', '') if lg else '',
+            'enrollment_status': st.get('enrollment_status', 'Regular'),
+            'program_section': ps_disp,
+        })
+    send_teacher_session_summary(
+        teacher_email=teacher_email,
+        teacher_name=sess.get('teacher_name', ''),
+        subject_name=sess.get('subject_name', ''),
+        section_key=sess.get('section_key', ''),
+        time_slot=sess.get('time_slot', ''),
+        started_at=sess.get('started_at', ''),
+        ended_at=payload.get('ended_at', ''),
+        present_count=present_count,
+        late_count=late_count,
+        absent_count=absent_count,
+        excused_count=excused_count,
+        student_rows=rows,
+        session_tx_hash=session_tx_hash,
+        session_block_number=session_block_number,
+        semester=sess.get('semester', ''),
+        class_type=sess.get('class_type', 'lecture'),
+        course_code=sess.get('course_code', ''),
+        event_description=sess.get('event_description'),
+        teachers_involved=teachers_list,
+        programs_involved=sections_list,
+        send_email_fn=_send_email_sync,
+    )
+
+
+POST_FINALIZE_QUEUE = _PostFinalizeQueue(
+    get_db_fn=get_db,
+    handler_fn=_run_post_finalize_jobs,
+    now_fn=_now_local,
+    context_fn=app.app_context,
+    batch_size=int(os.getenv('POST_FINALIZE_BATCH_SIZE', '200') or 200),
+    poll_seconds=float(os.getenv('POST_FINALIZE_POLL_SECONDS', '5') or 5),
+    max_attempts=int(os.getenv('POST_FINALIZE_MAX_ATTEMPTS', '5') or 5),
+)
+
+
 def get_active_session_for_nfc(nfc_id, preferred_sess_id=None):
     all_students = get_all_students()
     student = next((s for s in all_students if s['nfcId'] == nfc_id), None)
@@ -5044,6 +5734,9 @@ def api_update_student_profile(nfc_id):
         section = data.get('section')
         enrollment_status = data.get('enrollment_status', 'Regular')
         new_nfc_id = data.get('new_nfc_id', '').strip().upper()
+        section_key = build_student_section_key(
+            {'course': course, 'year_level': year_level, 'section': section}
+        ) or ''
         
         with get_db() as conn:
             # Check student exists
@@ -5064,12 +5757,12 @@ def api_update_student_profile(nfc_id):
                     SET nfc_id=?, full_name=?, first_name=?, middle_initial=?, last_name=?,
                         student_id=?, email=?, contact=?, adviser=?, 
                         major=?, semester=?, school_year=?, date_registered=?, 
-                        program=?, year_level=?, section=?, enrollment_status=?
+                        program=?, year_level=?, section=?, enrollment_status=?, section_key=?
                     WHERE nfc_id=?
                 """, (new_nfc_id, full_name, first_name, middle_initial, last_name,
                       student_id, email, contact, adviser,
                       major, semester, school_year, date_registered,
-                      course, year_level, section, enrollment_status, nfc_id))
+                      course, year_level, section, enrollment_status, section_key, nfc_id))
                 
                 # Update dependent tables
                 conn.execute("UPDATE attendance_logs SET nfc_id=? WHERE nfc_id=?", (new_nfc_id, nfc_id))
@@ -5081,12 +5774,15 @@ def api_update_student_profile(nfc_id):
                     SET full_name=?, first_name=?, middle_initial=?, last_name=?,
                         student_id=?, email=?, contact=?, adviser=?, 
                         major=?, semester=?, school_year=?, date_registered=?, 
-                        program=?, year_level=?, section=?, enrollment_status=?
+                        program=?, year_level=?, section=?, enrollment_status=?, section_key=?
                     WHERE nfc_id=?
                 """, (full_name, first_name, middle_initial, last_name,
                       student_id, email, contact, adviser,
                       major, semester, school_year, date_registered,
-                      course, year_level, section, enrollment_status, nfc_id))
+                      course, year_level, section, enrollment_status, section_key, nfc_id))
+
+            if (student['enrollment_status'] or '').lower() != (enrollment_status or '').lower():
+                _refresh_student_rollups(conn, new_nfc_id or nfc_id)
         
         print(f"[STUDENT] Profile updated for {full_name or nfc_id}")
         return jsonify({'ok': True, 'message': 'Profile updated successfully'})
@@ -5103,12 +5799,15 @@ def api_delete_student(nfc_id):
     for attempt in range(max_retries):
         try:
             with get_db() as conn:
+                sess_ids = _student_log_sessions(conn, nfc_id)
                 # Delete attendance records first
                 conn.execute("DELETE FROM attendance_logs WHERE nfc_id = ?", (nfc_id,))
                 # Delete photos
                 conn.execute("DELETE FROM photos WHERE person_id = ?", (nfc_id,))
                 # Delete student
                 conn.execute("DELETE FROM students WHERE nfc_id = ?", (nfc_id,))
+                for sid in sess_ids:
+                    _refresh_stats_rollup(conn, sid)
             return jsonify({'success': True, 'message': 'Student and associated records deleted successfully.'})
         except Exception as e:
             err_str = str(e).lower()
@@ -5229,7 +5928,7 @@ def api_move_up_all_students():
 
         wsql = " AND ".join(where)
         rows = conn.execute(
-            f"SELECT nfc_id, full_name, year_level, semester, school_year FROM students WHERE {wsql}",
+            f"SELECT nfc_id, full_name, program, year_level, section, semester, school_year FROM students WHERE {wsql}",
             tuple(params)
         ).fetchall()
 
@@ -5244,9 +5943,12 @@ def api_move_up_all_students():
 
             if action == 'next_sem':
                 new_yl, new_sem, new_sy = _next_sem(curr_yl, curr_sem, curr_sy)
+                new_key = build_student_section_key({
+                    'program': row['program'], 'year_level': new_yl, 'section': row['section'],
+                }) or ''
                 conn.execute(
-                    "UPDATE students SET year_level=?, semester=?, school_year=? WHERE nfc_id=?",
-                    (new_yl, new_sem, new_sy, nfc_id)
+                    "UPDATE students SET year_level=?, semester=?, school_year=?, section_key=? WHERE nfc_id=?",
+                    (new_yl, new_sem, new_sy, new_key, nfc_id)
                 )
 
             elif action == 'summer':
@@ -5750,6 +6452,7 @@ def mark():
                 status='present', tap_time=_now_local().strftime('%Y-%m-%d %H:%M:%S'),
                 tx_hash='', block_number=0
             )
+            db_update_session_totals(sess_id)
         
         recent_attendance.append({'nfc_id':nfc_id,'name':name,'timestamp':time.time()})
         flash(f'Attendance marked for {name}')
@@ -5889,6 +6592,8 @@ def update_student():
         datetime_now=datetime.now,
         get_db=get_db,
         db_save_override=db_save_override,
+        build_student_section_key=build_student_section_key,
+        refresh_student_rollups=_refresh_student_rollups,
         jsonify=jsonify,
     )
 
@@ -5919,9 +6624,9 @@ def export_page():
 @admin_required
 def export_csv_all():
     return _export_csv_all_impl(
-        get_all_students_fn=get_all_students,
+        iter_student_session_rows_fn=iter_student_session_rows_for_export,
         get_attendance_records_fn=get_attendance_records,
-        get_student_session_rows_fn=get_student_session_rows_for_export,
+        chain_fallback=request.args.get('chain_fallback') == '1',
     )
 
 @app.route('/export/<nfc_id>.csv')
@@ -6091,9 +6796,8 @@ def _build_teacher_context(user):
         # Get student count from ALL students matching this section key
         # (not just from teacher.sections dict which may be empty)
         all_stu_for_section = [
-            s for s in db_get_all_students() 
-            if build_student_section_key(s) == skey
-            and (not ms_sem or normalize_semester(s.get('semester')) == ms_sem)
+            s for s in db_get_students_in_sections([skey])
+            if (not ms_sem or normalize_semester(s.get('semester')) == ms_sem)
         ]
         sec_count = len(all_stu_for_section)
         if skey in sections:
@@ -6370,23 +7074,14 @@ def api_session_attendance(sess_id):
         # For COMPLETED sessions, we strictly only show students from the attendance logs 
         # (which already include the captured absent students) and excuse records.
         if not sess.get('ended_at') or is_school_event:
-            all_students = get_all_students()
             sess_semester = normalize_semester(sess.get('semester') or '')
             if is_school_event:
                 # Do not filter event attendance by semester.
                 sess_semester = ''
-            if is_school_event:
-                enrolled = [
-                    s for s in all_students 
-                    if build_student_section_key(s) in section_keys 
-                    and (not sess_semester or not normalize_semester(s.get('semester')) or normalize_semester(s.get('semester')) == sess_semester)
-                ]
-            else:
-                enrolled = [
-                    s for s in all_students 
-                    if build_student_section_key(s) == section_key 
-                    and (not sess_semester or not normalize_semester(s.get('semester')) or normalize_semester(s.get('semester')) == sess_semester)
-                ]
+            enrolled = [
+                s for s in db_get_students_in_sections(section_keys if is_school_event else [section_key])
+                if (not sess_semester or not normalize_semester(s.get('semester')) or normalize_semester(s.get('semester')) == sess_semester)
+            ]
 
             # Fallback: if no students found via section_key, try exact database query
             if (not is_school_event) and (not enrolled) and program and year_level and section_val:
@@ -6636,6 +7331,8 @@ def start_session():
     }
     save_session(sess_id, new_sess)
     sessions_db[sess_id] = new_sess
+    _capture_session_roster(sess_id, [section_key])
+    _notify_schedule_changed(f'session started {sess_id}', plan_changed=False)
  
     # ── Launch auto-end background thread ─────────────────────────────────────
     if auto_end_str:
@@ -6663,6 +7360,7 @@ def blockchain_status():
     student_count = len(db_get_all_students())
     return jsonify({
         'online': BLOCKCHAIN_ONLINE,
+        'rpc_endpoints': RPC_PROVIDER.stats(),
         'student_cache_count': student_count,
         'message': 'Blockchain online' if BLOCKCHAIN_ONLINE else f'Offline — {student_count} students loaded from cache'
     })
@@ -6675,6 +7373,7 @@ def diagnostics():
     Helps diagnose why sessions might not be starting on Railway.
     """
     now_dt = _now_local()
+    today_start = now_dt.replace(hour=0, minute=0, second=0, microsecond=0)
     active = get_active_sessions()
     
     with get_db() as conn:
@@ -6686,11 +7385,15 @@ def diagnostics():
         
         all_sessions = conn.execute(
             "SELECT sess_id, subject_name, teacher_username, started_at, ended_at "
-            "FROM sessions WHERE started_at LIKE ? ORDER BY started_at DESC LIMIT 20",
-            (f"{now_dt.strftime('%Y-%m-%d')}%",)
+            "FROM sessions WHERE started_ts >= ? AND started_ts < ? ORDER BY started_ts DESC LIMIT 20",
+            (today_start, today_start + timedelta(days=1))
         ).fetchall()
     
     automation_running = AUTO_THREAD and AUTO_THREAD.is_alive()
+    try:
+        current_leader = AUTOMATION_LEADER.current_leader(get_db)
+    except Exception as e:
+        current_leader = {'error': str(e)}
     
     return jsonify({
         'server_time': now_dt.strftime('%Y-%m-%d %H:%M:%S'),
@@ -6711,6 +7414,18 @@ def diagnostics():
         'sessions_today': [dict(s) for s in all_sessions],
         'automation_running': automation_running,
         'automation_thread_name': AUTO_THREAD.name if AUTO_THREAD else 'None',
+        'automation_scheduler': AUTOMATION_SCHEDULER.status(),
+        'automation_leader': AUTOMATION_LEADER.status(),
+        'automation_current_leader': current_leader,
+        'today_plan': TODAY_PLAN.status(),
+        'finalize_pool': FINALIZE_POOL.metrics(),
+        'post_finalize_jobs': POST_FINALIZE_QUEUE.metrics(),
+        'smtp_pool': _smtp_pool_metrics(),
+        'http_email_api': _http_email_metrics(),
+        'email_dispatcher': _email_dispatcher_metrics(),
+        'email_config_cache': _email_config_cache_status(),
+        'blockchain_online': BLOCKCHAIN_ONLINE,
+        'rpc_endpoints': RPC_PROVIDER.stats(),
     })
 
 @app.route('/api/active_sessions')
@@ -6769,7 +7484,6 @@ def live_session(sess_id):
     if sess is None: flash('Session not found.'); return redirect(url_for('teacher_dashboard'))
     if not _is_my_session(sess):
         flash('Access denied.'); return redirect(url_for('teacher_dashboard'))
-    all_students     = get_all_students()
     section_key      = sess.get('section_key','')
     is_school_event = str(sess.get('class_type', 'lecture')).strip().lower() == 'school_event'
     section_keys_for_view = {normalize_section_key(section_key)} if section_key else set()
@@ -6797,10 +7511,12 @@ def live_session(sess_id):
     if is_school_event:
         # School events can span multiple sections/semesters.
         sess_semester = ''
+    roster = db_get_session_roster(sess_id)
+    if roster is None:
+        roster = db_get_students_in_sections(section_keys_for_view)
     section_students = [
-        s for s in all_students
-        if build_student_section_key(s) in section_keys_for_view
-        and (s.get('student_status') or 'active') != 'graduated'
+        s for s in roster
+        if (s.get('student_status') or 'active') != 'graduated'
         and (not sess_semester or not normalize_semester(s.get('semester')) or normalize_semester(s.get('semester')) == sess_semester)
     ]
     
@@ -6841,11 +7557,10 @@ def live_session(sess_id):
 
     tapped_nfc_ids = present_set | late_set | excused_set
     existing_nfc_ids = {s['nfcId'] for s in section_students}
-    for s in all_students:
-        if s['nfcId'] in tapped_nfc_ids and s['nfcId'] not in existing_nfc_ids:
-            # Include if they are irregular or managed to tap in
-            section_students.append(s)
-            existing_nfc_ids.add(s['nfcId'])
+    for s in db_get_students_by_nfc_ids(tapped_nfc_ids - existing_nfc_ids):
+        # Include if they are irregular or managed to tap in
+        section_students.append(s)
+        existing_nfc_ids.add(s['nfcId'])
 
     student_statuses = []
     for s in section_students:
@@ -6998,6 +7713,7 @@ def end_session(sess_id):
     )
     if not result:
         flash('Session not found.'); return redirect(url_for('teacher_dashboard'))
+    _notify_schedule_changed(f'session ended {sess_id}', plan_changed=False)
 
     if result.get('tx_hash'):
         flash(f"✅ Session ended. Blockchain TX: {result.get('tx_hash')[:10]}... | {result.get('present_count', 0)} present, "
@@ -7038,11 +7754,14 @@ def api_skip_session(sess_id):
         
         # 2. Delete logs and session record
         conn.execute("DELETE FROM attendance_logs WHERE sess_id=?", (sess_id,))
+        conn.execute("DELETE FROM session_roster WHERE sess_id=?", (sess_id,))
         conn.execute("DELETE FROM sessions WHERE sess_id=?", (sess_id,))
+        _refresh_stats_rollup(conn, sess_id)
         
     # 3. Remove from active memory
     if sess_id in sessions_db:
         del sessions_db[sess_id]
+    _notify_schedule_changed(f'session skipped {sess_id}', plan_changed=False)
     
     print(f"[SKIP] Session {sess_id} deleted and blocked for today.")
     return jsonify({'ok': True})
@@ -7166,11 +7885,9 @@ def teacher_export():
     return _teacher_export_section_csv_impl(
         user_obj=get_current_user(),
         sec_key=request.args.get('section', ''),
-        teacher_students_fn=teacher_students,
-        normalize_section_key_fn=normalize_section_key,
-        build_student_section_key_fn=build_student_section_key,
+        iter_student_session_rows_fn=iter_student_session_rows_for_export,
         get_attendance_records_fn=get_attendance_records,
-        get_student_session_rows_fn=get_student_session_rows_for_export,
+        chain_fallback=request.args.get('chain_fallback') == '1',
     )
 
 @app.route('/api/attendance/recent')
@@ -7231,38 +7948,35 @@ def poll_session(sess_id):
         # Subtract 2 seconds as a buffer to handle sub-second timing edge cases
         # and any minor clock drift between DB writes and poll timing
         since_buffered = since - 2
-        since_dt = datetime.fromtimestamp(since_buffered).strftime('%Y-%m-%d %H:%M:%S')
+        since_dt = datetime.fromtimestamp(since_buffered).replace(microsecond=0)
 
         with get_db() as conn:
             if is_school_event and related_ids:
                 placeholders = ','.join(['?'] * len(related_ids))
                 query = (
                     "SELECT al.nfc_id, al.student_name, al.student_id, al.status, "
-                    "al.tap_time, al.tx_hash, al.block_number, al.created_at "
+                    "al.tap_time, al.tx_hash, al.block_number, al.created_ts "
                     "FROM attendance_logs al "
                     f"WHERE al.sess_id IN ({placeholders}) "
                     "  AND al.status IN ('present','late') "
-                    "  AND al.created_at > ? "
-                    "ORDER BY al.created_at ASC"
+                    "  AND al.created_ts > ? "
+                    "ORDER BY al.created_ts ASC"
                 )
                 tap_rows = conn.execute(query, tuple(related_ids) + (since_dt,)).fetchall()
             else:
                 tap_rows = conn.execute(
                     "SELECT al.nfc_id, al.student_name, al.student_id, al.status, "
-                    "al.tap_time, al.tx_hash, al.block_number, al.created_at "
+                    "al.tap_time, al.tx_hash, al.block_number, al.created_ts "
                     "FROM attendance_logs al "
                     "WHERE al.sess_id = ? "
                     "  AND al.status IN ('present','late') "
-                    "  AND al.created_at > ? "
-                    "ORDER BY al.created_at ASC",
+                    "  AND al.created_ts > ? "
+                    "ORDER BY al.created_ts ASC",
                     (sess_id, since_dt)
                 ).fetchall()
 
         for row in tap_rows:
-            try:
-                ts = datetime.strptime(row['created_at'], '%Y-%m-%d %H:%M:%S').timestamp()
-            except Exception:
-                ts = since + 1
+            ts = row['created_ts'].timestamp() if row['created_ts'] else since + 1
             # Get enrollment status for each tap
             st_cached = get_student_by_nfc_cached(row['nfc_id']) or {}
             new_taps.append({
@@ -7647,6 +8361,7 @@ def export_session_attendance(sess_id):
         normalize_section_key_fn=normalize_section_key,
         build_student_section_key_fn=build_student_section_key,
         db_get_session_attendance_fn=db_get_session_attendance,
+        db_get_session_roster_fn=db_get_session_roster,
         get_db_fn=get_db,
         xl_helpers_fn=_xl_helpers,
     )
@@ -7660,13 +8375,13 @@ def export_stats_xlsx():
         request_obj=request,
         session_obj=session,
         build_stats_export_dataset_fn=_build_stats_export_dataset,
-        load_sessions_fn=load_sessions,
         db_get_all_students_fn=db_get_all_students,
-        db_get_override_fn=db_get_override,
+        db_get_overrides_fn=db_get_overrides,
+        db_get_approved_excuses_fn=db_get_approved_excuses,
         normalize_section_key_fn=normalize_section_key,
         build_student_section_key_fn=build_student_section_key,
         fmt_time_fn=fmt_time,
-        db_get_session_attendance_fn=db_get_session_attendance,
+        db_get_session_rosters_fn=db_get_session_rosters,
         get_db_fn=get_db,
         xl_helpers_fn=_xl_helpers,
         now=_now_local(),
@@ -8310,10 +9025,12 @@ def api_audit_sessions():
         scanned_count += 1
 
         try:
-            # Fetch blockchain records for this session
-            bc_records = contract.functions.getSessionAllAttendanceRecords(sess_id).call()
-            if not bc_records:
+            # Fetch blockchain records for this session, one page per RPC call
+            bc_records = _iter_session_attendance_records(contract, sess_id)
+            first_bc = next(bc_records, None)
+            if first_bc is None:
                 continue
+            bc_records = itertools.chain((first_bc,), bc_records)
 
             # Fetch DB records
             with get_db() as conn:
@@ -8380,6 +9097,7 @@ def api_resolve_tampering():
     resolved_details = []
 
     try:
+        touched = []
         with get_db() as conn:
             for c in conflicts:
                 sess_id = c['sess_id']
@@ -8391,12 +9109,16 @@ def api_resolve_tampering():
                     "UPDATE attendance_logs SET status=? WHERE sess_id=? AND nfc_id=?",
                     (bc_status, sess_id, nfc_id)
                 )
-                
-                # Update session totals
-                db_update_session_totals(sess_id)
+                if sess_id not in touched:
+                    touched.append(sess_id)
                 resolved_count += 1
                 resolved_details.append(c)
 
+            # Update session totals on this connection so they see the restored rows
+            for sess_id in touched:
+                _recompute_session_totals(conn, sess_id)
+                _refresh_stats_rollup(conn, sess_id)
+
         # Send Notification Report
         if resolved_count > 0:
             send_audit_resolution_report(resolved_details)
@@ -8419,8 +9141,7 @@ def send_audit_resolution_report(conflicts):
         recipients = [u['email'] for u in users if u['email']]
         if not recipients: return
 
-        from services.email_service import get_email_config
-        cfg = get_email_config(get_db)
+        cfg = get_email_config()
 
         from services.attendance_email_templates import send_audit_resolution_email
         send_audit_resolution_email(recipients, conflicts, cfg)
@@ -8507,6 +9228,13 @@ if os.getenv('DISABLE_AUTO_THREAD', '0') != '1':
     except Exception as _auto_boot_err:
         print(f"[AUTO] Startup thread init failed: {_auto_boot_err}")
 
+# Post-finalize jobs: drained in-process unless a dedicated post_finalize_worker.py runs.
+if os.getenv('POST_FINALIZE_IN_PROCESS', '1') != '0':
+    try:
+        POST_FINALIZE_QUEUE.start()
+    except Exception as _jobs_boot_err:
+        print(f"[JOBS] Post-finalize worker init failed: {_jobs_boot_err}")
+
 if __name__ == '__main__':
     # Only launch NFC listener in development
     if os.getenv('FLASK_ENV') != 'production':
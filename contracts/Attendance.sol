@@ -192,6 +192,39 @@ contract Attendance {
         return (timestamps, statuses);
     }
 
+    // Number of attendance records stored for an NFC ID
+    function getAttendanceCount(string memory _nfcId)
+        public
+        view
+        returns (uint256)
+    {
+        return attendance[_nfcId].length;
+    }
+
+    // Paginated attendance history for an NFC ID (returns at most _limit records from _offset)
+    function getAttendancePage(string memory _nfcId, uint256 _offset, uint256 _limit)
+        public
+        view
+        returns (uint256[] memory, uint8[] memory)
+    {
+        AttendanceRecord[] storage records = attendance[_nfcId];
+        uint256 end = _pageEnd(records.length, _offset, _limit);
+        uint256 size = end > _offset ? end - _offset : 0;
+        uint256[] memory timestamps = new uint256[](size);
+        uint8[] memory statuses = new uint8[](size);
+        for (uint256 i = 0; i < size; i++) {
+            timestamps[i] = records[_offset + i].timestamp;
+            statuses[i] = records[_offset + i].status;
+        }
+        return (timestamps, statuses);
+    }
+
+    function _pageEnd(uint256 _length, uint256 _offset, uint256 _limit) internal pure returns (uint256) {
+        if (_offset >= _length) return _offset;
+        uint256 remaining = _length - _offset;
+        return _offset + (_limit < remaining ? _limit : remaining);
+    }
+
     // Record a complete lecture/laboratory session with detailed attendance
     function recordLectureSession(
         string memory _sessionId,
@@ -449,6 +482,22 @@ contract Attendance {
         return sessionRecords[_sessionId].attendanceRecords;
     }
 
+    // Paginated attendance records for a session (returns at most _limit records from _offset)
+    function getSessionAttendanceRecordsPage(string memory _sessionId, uint256 _offset, uint256 _limit)
+        public
+        view
+        returns (StudentAttendanceDetail[] memory)
+    {
+        StudentAttendanceDetail[] storage records = sessionRecords[_sessionId].attendanceRecords;
+        uint256 end = _pageEnd(records.length, _offset, _limit);
+        uint256 size = end > _offset ? end - _offset : 0;
+        StudentAttendanceDetail[] memory page = new StudentAttendanceDetail[](size);
+        for (uint256 i = 0; i < size; i++) {
+            page[i] = records[_offset + i];
+        }
+        return page;
+    }
+
     // Get all recorded session IDs
     function getAllSessionIds()
         public
@@ -458,6 +507,21 @@ contract Attendance {
         return sessionIds;
     }
 
+    // Paginated session IDs in recording order (returns at most _limit IDs from _offset)
+    function getSessionIdsPage(uint256 _offset, uint256 _limit)
+        public
+        view
+        returns (string[] memory)
+    {
+        uint256 end = _pageEnd(sessionIds.length, _offset, _limit);
+        uint256 size = end > _offset ? end - _offset : 0;
+        string[] memory page = new string[](size);
+        for (uint256 i = 0; i < size; i++) {
+            page[i] = sessionIds[_offset + i];
+        }
+        return page;
+    }
+
     // Get session count
     function getSessionCount()
         public
@@ -0,0 +1,5 @@
+from services.ops.post_finalize_worker import main
+
+
+if __name__ == '__main__':
+    main()
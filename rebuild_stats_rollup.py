@@ -0,0 +1,5 @@
+from services.ops.rebuild_stats_rollup import main
+
+
+if __name__ == '__main__':
+    main()
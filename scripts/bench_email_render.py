@@ -0,0 +1,118 @@
+"""
+bench_email_render.py
+=====================
+DAVS — email template render benchmark
+
+Renders the post-finalize emails for a school event with N students
+(default 2,000) from the compiled Jinja templates in templates/emails/:
+
+  • receipts, fragments cold  — session fragments re-rendered per student
+                                (cache cleared each time; the old cost model)
+  • receipts, fragments warm  — session fragments rendered once, only the
+                                per-student fields rendered per recipient
+  • teacher summary           — one summary email listing all N students
+
+and prints renders/sec and output size for each.
+
+Requires:  pip install jinja2
+Usage:     python scripts/bench_email_render.py [--students 2000] [--repeat 3]
+"""
+
+import os, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import attendance_email_templates as tpl
+from services.email_rendering import email_template, EMAIL_TEMPLATES
+
+
+def arg(name, default):
+    if name in sys.argv:
+        return type(default)(sys.argv[sys.argv.index(name) + 1])
+    return default
+
+
+SESSION = dict(
+    subject_name='University Foundation Day', section_key='', teacher_name='Prof. Reyes',
+    tx_hash='0x' + 'ab' * 32, block_num=5123456, sess_id='BENCH-EVENT',
+    semester='1st Semester', time_slot='07:00 - 12:00', class_type='school_event',
+    event_description='Campus-wide assembly',
+    teachers_involved=['Prof. Reyes', 'Prof. Santos', 'Prof. Cruz'],
+    programs_involved=[f'BSCS|{y}|{s} 1st Semester' for y in range(1, 5) for s in 'ABC'],
+)
+
+STATUSES = ('present', 'late', 'absent', 'present', 'excused')
+
+
+def _url_for(endpoint, **kw):
+    return f"https://davs.local/excuse/{kw['sess_id']}/{kw['nfc_id']}"
+
+
+def make_students(n):
+    return [dict(student_name=f'Student {i}', student_id=f'2024-{i:05d}', nfc_id=f'04{i:08X}',
+                 enrollment_status='Irregular' if i % 7 == 0 else 'Regular',
+                 tap_time=f'2026-10-19 07:{i % 60:02d}:00', status=STATUSES[i % len(STATUSES)])
+            for i in range(n)]
+
+
+def receipts(students, cold):
+    size = 0
+    for st in students:
+        if cold:
+            tpl._receipt_fragments.cache_clear()
+        _subject, html = tpl.render_student_attendance_receipt(url_for_fn=_url_for, **st, **SESSION)
+        size += len(html)
+    return size
+
+
+def summary(students):
+    rows = [{'name': st['student_name'], 'student_id': st['student_id'], 'nfc_id': st['nfc_id'],
+             'status': st['status'], 'enrollment_status': st['enrollment_status'],
+             'program_section': 'BSCS-1-A 1st Semester'} for st in students]
+    counts = {s: sum(1 for st in students if st['status'] == s) for s in ('present', 'late', 'absent', 'excused')}
+    _subject, html = tpl.render_teacher_session_summary(
+        SESSION['teacher_name'], SESSION['subject_name'], SESSION['section_key'], SESSION['time_slot'],
+        '2026-10-19 07:00:00', '2026-10-19 12:00:00',
+        counts['present'], counts['late'], counts['absent'], counts['excused'], rows,
+        session_tx_hash=SESSION['tx_hash'], session_block_number=SESSION['block_num'],
+        semester=SESSION['semester'], class_type=SESSION['class_type'],
+        event_description=SESSION['event_description'],
+        teachers_involved=SESSION['teachers_involved'], programs_involved=SESSION['programs_involved'],
+    )
+    return len(html)
+
+
+def run(label, fn, count, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"  {label:<26} {count:>6} emails  {best * 1000:9.1f} ms  {count / best:10.1f} /s  "
+          f"{size / 1024:9.1f} KiB")
+
+
+def main():
+    n = arg('--students', 2000)
+    repeat = arg('--repeat', 3)
+    students = make_students(n)
+
+    started = time.perf_counter()
+    for name in EMAIL_TEMPLATES:
+        email_template(name)
+    compile_ms = (time.perf_counter() - started) * 1000
+
+    print()
+    print(f"  Email render benchmark — {n} students, best of {repeat}  "
+          f"(templates compiled once in {compile_ms:.1f} ms)")
+    print("  " + "─"*78)
+    run('receipts, fragments cold', lambda: receipts(students, cold=True), n, repeat)
+    tpl._receipt_fragments.cache_clear()
+    run('receipts, fragments warm', lambda: receipts(students, cold=False), n, repeat)
+    run('teacher summary', lambda: summary(students), 1, repeat)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""
+bench_http_email_bulk.py
+========================
+DAVS — SendGrid / Brevo bulk receipt benchmark
+
+Starts a local HTTP stand-in for the provider's mail-send endpoint and
+delivers the same set of attendance receipts two ways:
+
+  • per-message   — one POST per student with a fully rendered receipt
+                    (what the post-finalize jobs used to do)
+  • bulk          — services.http_email_api.HTTPEmailClient.send_bulk: one
+                    template, per-student substitutions, one keep-alive session
+
+The stand-in validates the payload shape, expands substitutions the way the
+provider would, and counts delivered messages. --bad-every N plants an
+invalid address every N students so the bulk call is rejected and the
+per-message fallback is exercised; the rendered bodies are compared against
+the per-message render either way.
+
+Requires:  pip install requests
+Usage:     python scripts/bench_http_email_bulk.py [--students 500] [--provider sendgrid|brevo]
+                                                   [--bulk-size 500] [--bad-every 0] [--latency-ms 20]
+"""
+
+import os, sys, re, json, time, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.attendance_email_templates import (
+    render_student_attendance_receipt,
+    student_receipt_bulk_template,
+    student_receipt_substitutions,
+)
+from services.http_email_api import HTTPEmailClient, apply_substitutions, substitution_token
+
+HOST = '127.0.0.1'
+
+
+def arg(name, default):
+    if name in sys.argv:
+        return type(default)(sys.argv[sys.argv.index(name) + 1])
+    return default
+
+
+class StandIn:
+    def __init__(self, latency):
+        self.latency = latency
+        self.requests = 0
+        self.delivered = {}
+        self._lock = threading.Lock()
+
+    def accept(self, payload):
+        """Return (status, body) and record the expanded messages, like the real API would."""
+        if 'messageVersions' in payload:
+            html = payload['htmlContent']
+            msgs = []
+            for v in payload['messageVersions']:
+                body = re.sub(r'\{\{ params\.(\w+) \}\}',
+                              lambda m: v.get('params', {}).get(m.group(1), ''), html)
+                msgs.extend((to['email'], body) for to in v['to'])
+        elif 'personalizations' in payload:
+            html = payload['content'][0]['value']
+            msgs = [(to['email'], apply_substitutions(html, p.get('substitutions')))
+                    for p in payload['personalizations'] for to in p['to']]
+        else:
+            msgs = [(to['email'], payload['htmlContent']) for to in payload['to']]
+        bad = [e for e, _ in msgs if not re.fullmatch(r'[^@\s]+@[^@\s]+\.\w+', e)]
+        if bad:
+            return 400, json.dumps({'errors': [{'message': f'invalid email {bad[0]}'}]})
+        with self._lock:
+            for email, body in msgs:
+                self.delivered[email] = body
+        return 202, ''
+
+
+def make_handler(stand_in):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'   # keep-alive, like the real APIs
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            with stand_in._lock:
+                stand_in.requests += 1
+            if stand_in.latency:
+                time.sleep(stand_in.latency)
+            status, out = stand_in.accept(json.loads(body))
+            out = out.encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+        def log_message(self, *args):
+            pass
+    return Handler
+
+
+SESSION = dict(
+    subject_name='Data Structures', section_key='BSCS|2|A', teacher_name='Prof. Reyes',
+    tx_hash='0x' + 'ab' * 32, block_num=5123456, sess_id='BENCH-SESSION',
+    semester='1st Semester', time_slot='07:00 - 09:00', class_type='lecture',
+    event_description=None, teachers_involved=None, programs_involved=None,
+)
+
+
+def _url_for(endpoint, **kw):
+    return f"http://{HOST}/excuse/{kw['sess_id']}/{kw['nfc_id']}"
+
+
+def make_students(n, bad_every):
+    out = []
+    for i in range(n):
+        email = f'student{i}@davs.local'
+        if bad_every and i % bad_every == bad_every - 1:
+            email = f'student{i}@invalid'
+        out.append(dict(student_name=f'Student {i}', student_email=email, student_id=f'2024-{i:05d}',
+                        nfc_id=f'04{i:08X}', enrollment_status='Regular',
+                        tap_time=f'2026-10-19 07:{i % 60:02d}:00', status='present'))
+    return out
+
+
+def per_message(client, students):
+    for st in students:
+        subject, html = render_student_attendance_receipt(
+            st['student_name'], st['student_id'], tap_time=st['tap_time'], status=st['status'],
+            nfc_id=st['nfc_id'], enrollment_status=st['enrollment_status'], url_for_fn=_url_for, **SESSION)
+        try:
+            client.send([st['student_email']], subject, html)
+        except Exception:
+            pass
+
+
+def bulk(client, students):
+    subject, html = student_receipt_bulk_template(token_fn=substitution_token, status='present',
+                                                  url_for_fn=_url_for, **SESSION)
+    recipients = [
+        (st['student_email'], student_receipt_substitutions(
+            token_fn=substitution_token,
+            **{k: v for k, v in st.items() if k != 'student_email'}))
+        for st in students
+    ]
+    return client.send_bulk(subject, html, recipients)
+
+
+def main():
+    n = arg('--students', 500)
+    provider = arg('--provider', 'sendgrid')
+    bulk_size = arg('--bulk-size', 500)
+    bad_every = arg('--bad-every', 0)
+    latency = arg('--latency-ms', 20) / 1000.0
+
+    stand_in = StandIn(latency)
+    server = ThreadingHTTPServer((HOST, 0), make_handler(stand_in))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://{HOST}:{server.server_address[1]}/v3/mail/send'
+    students = make_students(n, bad_every)
+    expected = {}
+    for st in students:
+        expected[st['student_email']] = render_student_attendance_receipt(
+            st['student_name'], st['student_id'], tap_time=st['tap_time'], status=st['status'],
+            nfc_id=st['nfc_id'], enrollment_status=st['enrollment_status'], url_for_fn=_url_for, **SESSION)[1]
+
+    print()
+    print(f"  {provider} bulk benchmark — {n} receipts, bulk_size={bulk_size}, "
+          f"bad_every={bad_every}, latency={latency * 1000:.0f}ms  (stand-in at {url})")
+    print("  " + "─"*70)
+    try:
+        for label, fn in (('per-message', per_message), ('bulk', bulk)):
+            stand_in.delivered.clear()
+            before = stand_in.requests
+            client = HTTPEmailClient(provider=provider, api_key='bench', sender_email='no-reply@davs.local',
+                                     api_url=url, bulk_size=bulk_size)
+            started = time.perf_counter()
+            fn(client, students)
+            elapsed = time.perf_counter() - started
+            client.close()
+            delivered = len(stand_in.delivered)
+            mismatched = sum(1 for e, body in stand_in.delivered.items() if expected.get(e) != body)
+            m = client.metrics()
+            print(f"  {label:<12} {delivered:>5}/{n} delivered  {stand_in.requests - before:>5} requests  "
+                  f"{elapsed:7.2f}s  {delivered / elapsed:8.1f} msg/s  "
+                  f"fallbacks={m['bulk_fallbacks']}  body_mismatch={mismatched}")
+    finally:
+        server.shutdown()
+    print()
+
+
+if __name__ == '__main__':
+    main()
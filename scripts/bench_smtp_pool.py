@@ -0,0 +1,161 @@
+"""
+bench_smtp_pool.py
+==================
+DAVS — SMTP delivery benchmark
+
+Sends the same batch of receipt-sized messages to a local aiosmtpd
+stand-in server two ways:
+
+  • per-message   — connect + EHLO + AUTH LOGIN + send + QUIT for every
+                    message (what send_email_async used to do)
+  • pooled        — services.smtp_pool.SMTPPool, a few authenticated
+                    connections reused across messages
+
+and prints messages/sec for each. An optional --latency-ms adds a delay to
+every SMTP command on the server side to approximate a remote provider.
+
+Requires:  pip install aiosmtpd
+Usage:     python scripts/bench_smtp_pool.py [--messages 500] [--pool 3] [--threads 6] [--latency-ms 0]
+"""
+
+import os, sys, time, socket, threading, asyncio
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.smtp_pool import SMTPPool, open_smtp_connection
+
+try:
+    from aiosmtpd.controller import Controller
+    from aiosmtpd.smtp import AuthResult, SMTP as _AioSMTP
+except ImportError:
+    print("  [ERR] aiosmtpd is not installed — pip install aiosmtpd")
+    sys.exit(1)
+
+HOST = '127.0.0.1'
+USER, PASSWORD = 'bench', 'bench'
+
+
+def arg(name, default):
+    if name in sys.argv:
+        return type(default)(sys.argv[sys.argv.index(name) + 1])
+    return default
+
+
+class CountingHandler:
+    def __init__(self, latency):
+        self.latency = latency
+        self.received = 0
+        self._lock = threading.Lock()
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        with self._lock:
+            self.received += 1
+        return '250 OK'
+
+
+def _authenticator(server, session, envelope, mechanism, auth_data):
+    return AuthResult(success=True)
+
+
+class LatencySMTP(_AioSMTP):
+    """Adds a fixed delay to connection setup, as a remote TLS/AUTH handshake would."""
+    latency = 0.0
+
+    async def smtp_EHLO(self, hostname):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return await super().smtp_EHLO(hostname)
+
+    async def smtp_AUTH(self, arg):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return await super().smtp_AUTH(arg)
+
+
+class BenchController(Controller):
+    def factory(self):
+        return LatencySMTP(self.handler, authenticator=_authenticator,
+                           auth_require_tls=False, auth_required=False)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind((HOST, 0))
+        return s.getsockname()[1]
+
+
+def make_message(i):
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = f'Attendance Receipt #{i}'
+    msg['From'] = 'no-reply@davs.local'
+    msg['To'] = f'student{i}@davs.local'
+    msg.attach(MIMEText('<html><body>\n' + ('<p>receipt row</p>\n' * 60) + '</body></html>', 'html'))
+    return msg.as_string()
+
+
+def per_message(port, messages, threads):
+    def _one(i):
+        srv = open_smtp_connection(HOST, port, USER, PASSWORD)
+        try:
+            srv.sendmail('no-reply@davs.local', [f'student{i}@davs.local'], messages[i])
+        finally:
+            srv.quit()
+    with ThreadPoolExecutor(max_workers=threads) as ex:
+        list(ex.map(_one, range(len(messages))))
+
+
+def pooled(port, messages, threads, pool_size):
+    pool = SMTPPool(host=HOST, port=port, user=USER, password=PASSWORD, size=pool_size)
+    def _one(i):
+        pool.send('no-reply@davs.local', [f'student{i}@davs.local'], messages[i])
+    try:
+        with ThreadPoolExecutor(max_workers=threads) as ex:
+            list(ex.map(_one, range(len(messages))))
+        return pool.metrics()
+    finally:
+        pool.close()
+
+
+def run(label, fn, handler, n):
+    before = handler.received
+    started = time.perf_counter()
+    extra = fn()
+    elapsed = time.perf_counter() - started
+    delivered = handler.received - before
+    print(f"  {label:<12} {delivered:>5}/{n} delivered  {elapsed:7.2f}s  {delivered / elapsed:8.1f} msg/s")
+    return extra
+
+
+def main():
+    n = arg('--messages', 500)
+    pool_size = arg('--pool', 3)
+    threads = arg('--threads', 6)
+    latency = arg('--latency-ms', 0) / 1000.0
+
+    LatencySMTP.latency = latency
+    handler = CountingHandler(latency)
+    port = free_port()
+    controller = BenchController(handler, hostname=HOST, port=port)
+    controller.start()
+    messages = [make_message(i) for i in range(n)]
+
+    print()
+    print(f"  SMTP benchmark — {n} messages, {threads} sender threads, pool={pool_size}, "
+          f"latency={latency * 1000:.0f}ms  (aiosmtpd on {HOST}:{port})")
+    print("  " + "─"*70)
+    try:
+        run('per-message', lambda: per_message(port, messages, threads), handler, n)
+        m = run('pooled', lambda: pooled(port, messages, threads, pool_size), handler, n)
+        print(f"\n  pool: {m['connections_opened']} connections opened, {m['reconnects']} reconnects")
+    finally:
+        controller.stop()
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+bench_xlsx_export.py
+====================
+DAVS — XLSX export writer benchmark
+
+Writes a Student Detail style sheet (17 columns, default 100,000 rows) two
+ways, each in its own process so peak memory is measured separately:
+
+  • legacy      — regular openpyxl Workbook, Font/Fill/Border/Alignment
+                  objects set on every cell, saved to an in-memory buffer
+  • write-only  — the xl_helpers() path used by the export routes:
+                  write-only workbook, rows appended as they are written,
+                  shared named styles, saved to a temp file
+
+and prints wall time, peak RSS growth and file size for each.
+
+Requires:  pip install openpyxl flask
+Usage:     python scripts/bench_xlsx_export.py [--rows 100000]
+"""
+
+import io, os, resource, subprocess, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.excel_helpers import xl_helpers
+
+
+def arg(name, default):
+    if name in sys.argv:
+        return type(default)(sys.argv[sys.argv.index(name) + 1])
+    return default
+
+
+HEADERS = ['#', 'Student Name', 'Student ID', 'Program', 'Year', 'Section', 'Enrollment',
+           'Subject', 'Course Code', 'Class Type', 'Teacher', 'Date', 'Tap Time',
+           'Status', 'TX Hash', 'Block #', 'Semester']
+WIDTHS = [6, 28, 14, 24, 10, 10, 12, 24, 12, 14, 22, 12, 12, 11, 30, 10, 14]
+COL_FORMATS = {14: ('status',), 15: ('tx',), 16: ('num',)}
+STATUSES = ('Present', 'Late', 'Absent', 'Present', 'Excused')
+
+
+def make_row(i):
+    return [i, f'Student {i % 3000}', f'2024-{i % 3000:05d}', 'BS Computer Science', '2nd Year', 'B',
+            'Regular', 'Data Structures', 'CS201', 'Lecture', 'Prof. Reyes',
+            f'2026-{1 + i % 12:02d}-{1 + i % 28:02d}', f'07:{i % 60:02d}:00',
+            STATUSES[i % len(STATUSES)], '0x' + f'{i:064x}', 5_000_000 + i, '1st Semester']
+
+
+def run_legacy(n):
+    """The pre-write-only data_row: fresh style objects on every cell."""
+    from openpyxl import Workbook
+    H = xl_helpers()
+    C, fill, thin_border, ctr, lft = H['C'], H['fill'], H['thin_border'], H['ctr'], H['lft']
+    Font = __import__('openpyxl.styles', fromlist=['Font']).Font
+    colors = {'Present': C['present'], 'Late': C['late'], 'Absent': C['absent'], 'Excused': C['excused']}
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'Student Detail'
+    H['make_header_row'](ws, 1, HEADERS, WIDTHS)
+    ws.freeze_panes = 'A2'
+    for i in range(1, n + 1):
+        r = i + 1
+        rf = fill(C['row_alt'] if i % 2 == 0 else C['row_def'])
+        for ci, val in enumerate(make_row(i), 1):
+            c = ws.cell(row=r, column=ci, value=val)
+            c.border = thin_border()
+            c.fill = rf
+            cf = COL_FORMATS.get(ci)
+            if cf and cf[0] == 'status':
+                c.font = Font(name='Calibri', size=10, bold=True, color=colors.get(val, '111111'))
+                c.alignment = ctr()
+            elif cf and cf[0] == 'tx':
+                c.font = Font(name='Courier New', size=8, color=C['muted'])
+                c.alignment = lft()
+            else:
+                c.font = H['normal_font']()
+                c.alignment = lft() if ci <= 3 else ctr()
+        ws.row_dimensions[r].height = 17
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.tell()
+
+
+def run_write_only(n):
+    H = xl_helpers()
+    wb = H['workbook']()
+    ws = H['sheet'](wb, 'Student Detail')
+    H['make_header_row'](ws, 1, HEADERS, WIDTHS)
+    ws.freeze_panes = 'A2'
+    for i in range(1, n + 1):
+        H['data_row'](ws, i + 1, make_row(i), alt=i % 2 == 0, col_formats=COL_FORMATS)
+    # send_workbook() needs a request context; flush and save the same way.
+    ws.flush()
+    fd, path = tempfile.mkstemp(prefix='davs_bench_', suffix='.xlsx')
+    os.close(fd)
+    try:
+        wb.save(path)
+        return os.path.getsize(path)
+    finally:
+        os.remove(path)
+
+
+MODES = {'legacy': run_legacy, 'write-only': run_write_only}
+
+
+def child(mode, n):
+    rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    size = MODES[mode](n)
+    dt = time.perf_counter() - t0
+    rss1 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f'{dt:.3f} {(rss1 - rss0) / 1024:.1f} {size}')
+
+
+def main():
+    n = arg('--rows', 100_000)
+    if '--run' in sys.argv:
+        child(arg('--run', ''), n)
+        return
+
+    print(f'DAVS xlsx export benchmark — {n:,} rows x {len(HEADERS)} columns\n')
+    results = {}
+    for mode in MODES:
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), '--run', mode, '--rows', str(n)],
+                             check=True, capture_output=True, text=True).stdout.split()
+        dt, mem, size = float(out[0]), float(out[1]), int(out[2])
+        results[mode] = dt, mem
+        print(f'  {mode:<11} {dt:7.2f} s   peak RSS +{mem:7.1f} MB   {size / 1e6:6.1f} MB file   '
+              f'{n / dt:9,.0f} rows/s')
+
+    (lt, lm), (wt, wm) = results['legacy'], results['write-only']
+    print(f'\n  write-only: {lt / wt:.1f}x faster, {lm / max(wm, 0.1):.1f}x less peak memory')
+
+
+if __name__ == '__main__':
+    main()
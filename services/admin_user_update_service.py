@@ -1,4 +1,13 @@
-def update_student_impl(*, request, datetime_now, get_db, db_save_override, jsonify):
+def update_student_impl(
+    *,
+    request,
+    datetime_now,
+    get_db,
+    db_save_override,
+    build_student_section_key,
+    refresh_student_rollups,
+    jsonify,
+):
     data = request.get_json()
     nfc_id = data.get('nfc_id', '').strip()
     if not nfc_id:
@@ -43,10 +52,27 @@ def update_student_impl(*, request, datetime_now, get_db, db_save_override, json
         params.append(now)
         params.append(nfc_id)
         with get_db() as conn:
+            prev = conn.execute(
+                "SELECT enrollment_status FROM students WHERE nfc_id=?",
+                (nfc_id,),
+            ).fetchone()
             conn.execute(
                 f"UPDATE students SET {', '.join(set_parts)} WHERE nfc_id=?",
                 params,
             )
+            if any(update_data.get(f) for f in ('course', 'year_level', 'section')):
+                row = conn.execute(
+                    "SELECT program, year_level, section FROM students WHERE nfc_id=?",
+                    (nfc_id,),
+                ).fetchone()
+                if row:
+                    conn.execute(
+                        "UPDATE students SET section_key=? WHERE nfc_id=?",
+                        (build_student_section_key(dict(row)) or '', nfc_id),
+                    )
+            new_status = update_data.get('enrollment_status')
+            if prev and new_status and (prev['enrollment_status'] or '').lower() != new_status.lower():
+                refresh_student_rollups(conn, nfc_id)
 
     override_data = {f: update_data[f] for f in fields if update_data.get(f)}
     if override_data:
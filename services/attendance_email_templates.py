@@ -1,66 +1,130 @@
+from functools import lru_cache
 from typing import Callable, Optional
-from datetime import datetime
-
-def _fmt_time(t_str):
-    """Format time string (e.g. '07:30:00' or '2024-04-26 07:30:00') to '7:00am'."""
-    if not t_str or t_str == '—': return '—'
-    try:
-        t_str = str(t_str)
-        if ' ' in t_str:
-            # Handle full ISO format
-            dt = datetime.strptime(t_str, '%Y-%m-%d %H:%M:%S')
-        elif ':' in t_str:
-            # Handle HH:MM:SS or HH:MM
-            parts = t_str.split(':')
-            if len(parts) == 3:
-                dt = datetime.strptime(t_str, '%H:%M:%S')
-            else:
-                dt = datetime.strptime(t_str, '%H:%M')
-        else:
-            return t_str
-        # Format as 7:00am (lowercase, no leading zero on hour)
-        return dt.strftime('%I:%M%p').lower().lstrip('0')
-    except:
-        return str(t_str)
-
-def _fmt_date(d_str):
-    """Format date string '2024-04-26 07:30:00' to 'April 26 2024'."""
-    if not d_str or d_str == '—': return '—'
-    try:
-        if ' ' in str(d_str):
-            dt = datetime.strptime(str(d_str).split(' ')[0], '%Y-%m-%d')
+
+from markupsafe import escape
+
+from services.email_rendering import (
+    email_macros,
+    fmt_email_date as _fmt_date,
+    fmt_email_time as _fmt_time,
+    render_email,
+)
+
+_FRAGMENTS = 'emails/_attendance_fragments.html'
+
+_STATUS_COLORS = {
+    'present': ('#2D6A27', '#E8F5E9', '✓ Present'),
+    'late': ('#D4A017', '#FFF8E1', '⏱ Late'),
+    'absent': ('#C0392B', '#FFEBEE', '✕ Absent'),
+    'excused': ('#2980B9', '#E3F2FD', '◎ Excused'),
+}
+
+
+def _status_style(status):
+    return _STATUS_COLORS.get(status, ('#333333', '#F5F5F5', status.capitalize()))
+
+
+def _as_tuple(values):
+    return tuple(values) if values else None
+
+
+@lru_cache(maxsize=256)
+def _receipt_fragments(final, status, subject_name, section_key, teacher_name, semester, time_slot,
+                       class_type, event_description, teachers_involved, programs_involved,
+                       tx_hash, block_num):
+    """
+    Everything in a receipt that is the same for every student of a session
+    (and status), rendered once and reused for each recipient.
+    ``final`` is the post-finalize receipt; otherwise the initial-tap one.
+    """
+    m = email_macros(_FRAGMENTS)
+    clr, bg, label = _status_style(status)
+
+    # Section + Semester formatting
+    section_display = (section_key.replace('|', ' · ') if section_key else '—')
+    if semester:
+        section_display += f" · {semester}"
+    section_lines = [section_display]
+    if class_type == 'school_event' and programs_involved:
+        if final:
+            section_lines = [str(p).replace('|', ' · ') for p in programs_involved]
         else:
-            dt = datetime.strptime(str(d_str), '%Y-%m-%d')
-        return dt.strftime('%B %d %Y')
-    except:
-        return str(d_str)
-
-def _fmt_dt(dt_str):
-    """Format to 'April 26 2024, 7:00am'."""
-    if not dt_str or dt_str == '—': return '—'
-    return f"{_fmt_date(dt_str)}, {_fmt_time(dt_str)}"
-
-def _fmt_slot(slot):
-    """Format '07:00 - 09:00' or '07:00 to 09:00' to '7:00am to 9:00am'."""
-    if not slot: return '—'
-    slot_str = str(slot)
-    
-    # Try different delimiters
-    delimiter = None
-    if ' - ' in slot_str:
-        delimiter = ' - '
-    elif ' to ' in slot_str:
-        delimiter = ' to '
-    
-    if not delimiter: return slot_str
-    
-    try:
-        parts = slot_str.split(delimiter)
-        if len(parts) == 2:
-            return f"{_fmt_time(parts[0].strip())} to {_fmt_time(parts[1].strip())}"
-        return slot_str
-    except:
-        return slot_str
+            # Remove duplicates
+            section_lines = sorted(set(str(p).replace('|', ' · ') for p in programs_involved if p))
+
+    instructor_lines = [teacher_name or '—']
+    if class_type == 'school_event' and teachers_involved:
+        # Remove duplicates
+        instructor_lines = sorted(set(str(t) for t in teachers_involved if t))
+
+    class_type_label = str(class_type or ('Lecture/Laboratory' if final else 'Lecture')).replace('_', ' ')
+    if final:
+        subject = f'[DAVS] Attendance Receipt - {subject_name} ({label})'
+    else:
+        subject = f'[DAVS] Attendance Recorded - {subject_name} ({label})'
+    return {
+        'subject': subject,
+        'banner': m.banner(clr, bg, label),
+        'session_rows': m.session_rows(subject_name, class_type, event_description, section_lines, instructor_lines),
+        'slot_rows': m.slot_rows(time_slot, class_type_label),
+        'status_row': m.status_row(clr, bg, label),
+        'tx_rows': m.tx_rows(tx_hash, block_num) if final else '',
+        'footer': m.footer(final, tx_hash),
+    }
+
+
+def render_student_attendance_receipt(
+    student_name,
+    student_id,
+    subject_name,
+    section_key,
+    teacher_name,
+    tap_time,
+    status,
+    tx_hash,
+    block_num,
+    sess_id=None,
+    nfc_id=None,
+    url_for_fn: Optional[Callable] = None,
+    semester=None,
+    time_slot=None,
+    enrollment_status='Regular',
+    class_type='lecture',
+    event_description=None,
+    teachers_involved=None,
+    programs_involved=None,
+    tap_date_text=None,
+    tap_time_text=None,
+):
+    """Build (subject, html) for a student attendance receipt."""
+    if tap_date_text is None:
+        tap_date_text = _fmt_date(tap_time)
+    if tap_time_text is None:
+        tap_time_text = "-" if status.lower() in ("absent", "excused") else _fmt_time(tap_time)
+    frags = _receipt_fragments(
+        True, status, subject_name, section_key, teacher_name, semester, time_slot, class_type,
+        event_description, _as_tuple(teachers_involved), _as_tuple(programs_involved), tx_hash, block_num,
+    )
+
+    excuse_link = None
+    if status == 'absent' and sess_id and nfc_id and url_for_fn is not None:
+        try:
+            excuse_link = url_for_fn('excuse_submit', sess_id=sess_id, nfc_id=nfc_id, _external=True)
+        except Exception:
+            excuse_link = None
+
+    html = render_email(
+        'emails/attendance_receipt.html',
+        s=frags,
+        student_name=student_name,
+        student_id=student_id,
+        tap_date=tap_date_text,
+        tap_time=tap_time_text,
+        nfc_id=nfc_id,
+        enrollment_status=enrollment_status,
+        excuse_link=excuse_link,
+    )
+    return frags['subject'], html
 
 
 def send_student_attendance_receipt(
@@ -89,213 +153,50 @@ def send_student_attendance_receipt(
     """Send attendance receipt email to student."""
     if not student_email or '@' not in student_email or send_email_fn is None:
         return
-    status_colors = {
-        'present': ('#2D6A27', '#E8F5E9', '✓ Present'),
-        'late': ('#D4A017', '#FFF8E1', '⏱ Late'),
-        'absent': ('#C0392B', '#FFEBEE', '✕ Absent'),
-        'excused': ('#2980B9', '#E3F2FD', '◎ Excused'),
-    }
-    clr, bg, label = status_colors.get(status, ('#333333', '#F5F5F5', status.capitalize()))
-    
-    # Section + Semester formatting
-    section_display = (section_key.replace('|', ' · ') if section_key else '—')
-    if semester:
-        section_display += f" · {semester}"
-    
-    if class_type == 'school_event' and programs_involved:
-        # Format list of sections with semester
-        section_display = "<br>".join([str(p).replace('|', ' · ') for p in programs_involved])
-    
-    instructor_display = teacher_name or '—'
-    if class_type == 'school_event' and teachers_involved:
-        # Remove duplicates
-        unique_teachers = sorted(list(set([str(t) for t in teachers_involved if t])))
-        instructor_display = "<br>".join(unique_teachers)
-        
-    tx_row = ''
-    excuse_section = ''
+    subject, html = render_student_attendance_receipt(
+        student_name, student_id, subject_name, section_key, teacher_name,
+        tap_time, status, tx_hash, block_num,
+        sess_id=sess_id, nfc_id=nfc_id, url_for_fn=url_for_fn, semester=semester,
+        time_slot=time_slot, enrollment_status=enrollment_status, class_type=class_type,
+        event_description=event_description, teachers_involved=teachers_involved,
+        programs_involved=programs_involved,
+    )
+    send_email_fn([student_email], subject, html)
 
-    if status == 'absent' and sess_id and nfc_id and url_for_fn is not None:
-        try:
-            excuse_link = url_for_fn('excuse_submit', sess_id=sess_id, nfc_id=nfc_id, _external=True)
-            excuse_section = f'''
-            <tr>
-              <td colspan="2" style="padding:16px 32px;text-align:center;border-top:1px solid #eee;">
-                <div style="font-size:13px;color:#666;margin-bottom:10px;">If this absence is valid, please submit an excuse request below:</div>
-                <a href="{excuse_link}" style="display:inline-block;background:#3b82f6;color:#ffffff;text-decoration:none;padding:10px 20px;border-radius:6px;font-weight:bold;font-size:14px;">Submit Excuse Form</a>
-              </td>
-            </tr>
-            '''
-        except Exception:
-            excuse_section = ''
-
-    if tx_hash:
-        tx_row = f'''
-        <tr>
-          <td style="padding:8px 12px;font-size:12px;color:#666;border-bottom:1px solid #eee;">
-            Blockchain TX
-          </td>
-          <td style="padding:8px 12px;font-size:11px;font-family:monospace;
-                     color:#2D6A27;border-bottom:1px solid #eee;word-break:break-all;">
-            {tx_hash}
-            <div style="margin-top:4px;">
-              <a href="https://sepolia.etherscan.io/tx/{tx_hash}" style="color:#2D6A27;text-decoration:none;font-weight:bold;font-size:10px;" target="_blank">
-                View on Blockchain Explorer
-              </a>
-            </div>
-          </td>
-        </tr>
-        <tr>
-          <td style="padding:8px 12px;font-size:12px;color:#666;">Block #</td>
-          <td style="padding:8px 12px;font-size:12px;font-family:monospace;color:#333;">
-            {block_num}
-          </td>
-        </tr>'''
-
-    html = f'''<!DOCTYPE html>
-<html><head><meta charset="UTF-8"></head>
-<body style="margin:0;padding:0;background:#f4f4f4;font-family:Calibri,Arial,sans-serif;">
-<table width="100%" cellpadding="0" cellspacing="0">
-  <tr><td align="center" style="padding:32px 16px;">
-    <table width="560" cellpadding="0" cellspacing="0"
-           style="background:#fff;border-radius:12px;overflow:hidden;
-                  box-shadow:0 2px 12px rgba(0,0,0,.1);">
-      <!-- Header -->
-      <tr>
-        <td style="background:#1E4A1A;padding:24px 32px;">
-          <div style="font-size:20px;font-weight:700;color:#F5C518;
-                      letter-spacing:1px;">DAVS</div>
-          <div style="font-size:11px;color:#94a3b8;margin-top:2px;">
-            Decentralized Attendance Verification System
-          </div>
-          <div style="font-size:11px;color:#94a3b8;">
-            Cavite State University - Silang Campus
-          </div>
-        </td>
-      </tr>
-      <!-- Status banner -->
-      <tr>
-        <td style="background:{bg};padding:20px 32px;
-                   border-left:4px solid {clr};">
-          <div style="font-size:28px;font-weight:700;color:{clr};">
-            {label}
-          </div>
-          <div style="font-size:13px;color:#555;margin-top:4px;">
-            Your attendance has been recorded for today's class.
-          </div>
-        </td>
-      </tr>
-      <!-- Details table -->
-      <tr>
-        <td style="padding:24px 32px 8px;">
-          <div style="font-size:13px;font-weight:700;color:#1E4A1A;
-                      text-transform:uppercase;letter-spacing:1px;
-                      margin-bottom:12px;">Attendance Details</div>
-          <table width="100%" cellpadding="0" cellspacing="0"
-                 style="border:1px solid #eee;border-radius:8px;overflow:hidden;">
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;width:140px;">Student</td>
-              <td style="padding:8px 12px;font-size:12px;font-weight:600;
-                         color:#333;border-bottom:1px solid #eee;">
-                {student_name}
-                {f'<span style="color:#999;font-size:11px;"> - ID: {student_id}</span>'
-                 if student_id else ''}
-              </td>
-            </tr>
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;">{ 'Event Name' if class_type == 'school_event' else 'Subject' }</td>
-              <td style="padding:8px 12px;font-size:12px;font-weight:600;
-                         color:#333;border-bottom:1px solid #eee;">
-                {subject_name}
-                {f'<div style="font-weight:normal;font-size:11px;color:#666;margin-top:2px;">{event_description}</div>' if class_type == 'school_event' and event_description else ''}
-              </td>
-            </tr>
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;">{ 'Program(s) and Section(s)' if class_type == 'school_event' else 'Section' }</td>
-              <td style="padding:8px 12px;font-size:12px;color:#333;
-                         border-bottom:1px solid #eee;">{section_display}</td>
-            </tr>
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;">{ 'Teachers Involved' if class_type == 'school_event' else 'Instructor' }</td>
-              <td style="padding:8px 12px;font-size:12px;color:#333;
-                         border-bottom:1px solid #eee;">{instructor_display}</td>
-            </tr>
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;">Date</td>
-              <td style="padding:8px 12px;font-size:12px;color:#333;
-                         border-bottom:1px solid #eee;">{_fmt_date(tap_time)}</td>
-            </tr>
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;">Tapped Time</td>
-              <td style="padding:8px 12px;font-size:12px;color:#333;
-                          border-bottom:1px solid #eee;">{"-" if status.lower() in ("absent", "excused") else _fmt_time(tap_time)}</td>
-            </tr>
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;">Time Slot</td>
-              <td style="padding:8px 12px;font-size:12px;color:#333;
-                         border-bottom:1px solid #eee;">{_fmt_slot(time_slot)}</td>
-            </tr>
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;">Class Type</td>
-              <td style="padding:8px 12px;font-size:12px;color:#333;
-                         border-bottom:1px solid #eee;text-transform:capitalize;">{str(class_type or 'Lecture/Laboratory').replace('_', ' ')}</td>
-            </tr>
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;">NFC UID</td>
-              <td style="padding:8px 12px;font-size:12px;color:#333;
-                         border-bottom:1px solid #eee;font-family:monospace;">{nfc_id or '—'}</td>
-            </tr>
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;">Enrollment Type</td>
-              <td style="padding:8px 12px;font-size:12px;color:#333;
-                         border-bottom:1px solid #eee;">{enrollment_status}</td>
-            </tr>
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;">Status</td>
-              <td style="padding:8px 12px;">
-                <span style="background:{bg};color:{clr};font-weight:700;
-                             font-size:12px;padding:3px 10px;border-radius:20px;
-                             border:1px solid {clr};">{label}</span>
-              </td>
-            </tr>
-            {tx_row}
-          </table>
-        </td>
-      </tr>
-      {excuse_section}
-      <!-- Footer -->
-      <tr>
-        <td style="padding:20px 32px 28px;">
-          <div style="font-size:11px;color:#94a3b8;line-height:1.6;">
-            This is an automated attendance receipt from the DAVS system.<br>
-            {"The TX hash above is your tamper-proof blockchain proof of attendance.<br>" if tx_hash else ""}
-            {f'<div style="margin-top:8px;padding:8px;background:#f8fafc;border-radius:4px;border-left:3px solid #cbd5e1;color:#64748b;"><strong>How to verify:</strong> To verify the attendance record, click the "View on Blockchain Explorer" button above. On Etherscan, go to the <strong>"More Details"</strong> section, find <strong>"Input Data"</strong>, and click <strong>"View Input As"</strong> &rarr; <strong>"UTF-8"</strong> to see the full attendance record.</div>' if tx_hash else ""}
-            Please do not reply to this email.
-          </div>
-        </td>
-      </tr>
-    </table>
-  </td></tr>
-</table>
-</body></html>'''
-    send_email_fn(
-        [student_email],
-        f'[DAVS] Attendance Receipt - {subject_name} ({label})',
-        html,
+
+# Per-student fields of the receipt; everything else is the same for a whole
+# session, so one rendered template can go out to many students in a bulk send.
+RECEIPT_BULK_FIELDS = ('student_name', 'student_id', 'nfc_id', 'enrollment_status', 'tap_date', 'tap_time')
+
+
+def student_receipt_bulk_template(*, token_fn: Callable, status, has_student_id=True, **session_fields):
+    """(subject, html) with a token_fn(field) placeholder in place of each RECEIPT_BULK_FIELDS value."""
+    return render_student_attendance_receipt(
+        student_name=token_fn('student_name'),
+        student_id=token_fn('student_id') if has_student_id else '',
+        tap_time=None,
+        status=status,
+        nfc_id=token_fn('nfc_id'),
+        enrollment_status=token_fn('enrollment_status'),
+        tap_date_text=token_fn('tap_date'),
+        tap_time_text=token_fn('tap_time'),
+        **session_fields,
     )
 
 
+def student_receipt_substitutions(*, token_fn: Callable, student_name, student_id, nfc_id,
+                                  enrollment_status, tap_time, status):
+    """Placeholder -> value map filling in a student_receipt_bulk_template."""
+    return {
+        token_fn('student_name'): str(escape(student_name)),
+        token_fn('student_id'): str(escape(student_id or '')),
+        token_fn('nfc_id'): str(escape(nfc_id or '—')),
+        token_fn('enrollment_status'): str(escape(enrollment_status)),
+        token_fn('tap_date'): _fmt_date(tap_time),
+        token_fn('tap_time'): "-" if status.lower() in ("absent", "excused") else _fmt_time(tap_time),
+    }
+
+
 def send_student_attendance_receipt_initial_tap(
     student_name,
     student_email,
@@ -318,170 +219,22 @@ def send_student_attendance_receipt_initial_tap(
     """Send initial attendance receipt email to student immediately after tap (WITHOUT blockchain TX info)."""
     if not student_email or '@' not in student_email or send_email_fn is None:
         return
-    status_colors = {
-        'present': ('#2D6A27', '#E8F5E9', '✓ Present'),
-        'late': ('#D4A017', '#FFF8E1', '⏱ Late'),
-        'absent': ('#C0392B', '#FFEBEE', '✕ Absent'),
-        'excused': ('#2980B9', '#E3F2FD', '◎ Excused'),
-    }
-    clr, bg, label = status_colors.get(status, ('#333333', '#F5F5F5', status.capitalize()))
-    
-    # Section + Semester formatting
-    section_display = (section_key.replace('|', ' · ') if section_key else '—')
-    if semester:
-        section_display += f" · {semester}"
-    
-    if class_type == 'school_event' and programs_involved:
-        # Format list of sections with semester and remove duplicates
-        unique_programs = sorted(list(set([str(p).replace('|', ' · ') for p in programs_involved if p])))
-        section_display = "<br>".join(unique_programs)
-    
-    instructor_display = teacher_name or '—'
-    if class_type == 'school_event' and teachers_involved:
-        # Remove duplicates
-        unique_teachers = sorted(list(set([str(t) for t in teachers_involved if t])))
-        instructor_display = "<br>".join(unique_teachers)
-
-    html = f'''<!DOCTYPE html>
-<html><head><meta charset="UTF-8"></head>
-<body style="margin:0;padding:0;background:#f4f4f4;font-family:Calibri,Arial,sans-serif;">
-<table width="100%" cellpadding="0" cellspacing="0">
-  <tr><td align="center" style="padding:32px 16px;">
-    <table width="560" cellpadding="0" cellspacing="0"
-           style="background:#fff;border-radius:12px;overflow:hidden;
-                  box-shadow:0 2px 12px rgba(0,0,0,.1);">
-      <!-- Header -->
-      <tr>
-        <td style="background:#1E4A1A;padding:24px 32px;">
-          <div style="font-size:20px;font-weight:700;color:#F5C518;
-                      letter-spacing:1px;">DAVS</div>
-          <div style="font-size:11px;color:#94a3b8;margin-top:2px;">
-            Decentralized Attendance Verification System
-          </div>
-          <div style="font-size:11px;color:#94a3b8;">
-            Cavite State University - Silang Campus
-          </div>
-        </td>
-      </tr>
-      <!-- Status banner -->
-      <tr>
-        <td style="background:{bg};padding:20px 32px;
-                   border-left:4px solid {clr};">
-          <div style="font-size:28px;font-weight:700;color:{clr};">
-            {label}
-          </div>
-          <div style="font-size:13px;color:#555;margin-top:4px;">
-            Your attendance has been recorded for today's class.
-          </div>
-        </td>
-      </tr>
-      <!-- Details table -->
-      <tr>
-        <td style="padding:24px 32px 8px;">
-          <div style="font-size:13px;font-weight:700;color:#1E4A1A;
-                      text-transform:uppercase;letter-spacing:1px;
-                      margin-bottom:12px;">Attendance Details</div>
-          <table width="100%" cellpadding="0" cellspacing="0"
-                 style="border:1px solid #eee;border-radius:8px;overflow:hidden;">
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;width:140px;">Student</td>
-              <td style="padding:8px 12px;font-size:12px;font-weight:600;
-                         color:#333;border-bottom:1px solid #eee;">
-                {student_name}
-                {f'<span style="color:#999;font-size:11px;"> - ID: {student_id}</span>'
-                 if student_id else ''}
-              </td>
-            </tr>
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;">{ 'Event Name' if class_type == 'school_event' else 'Subject' }</td>
-              <td style="padding:8px 12px;font-size:12px;font-weight:600;
-                         color:#333;border-bottom:1px solid #eee;">
-                {subject_name}
-                {f'<div style="font-weight:normal;font-size:11px;color:#666;margin-top:2px;">{event_description}</div>' if class_type == 'school_event' and event_description else ''}
-              </td>
-            </tr>
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;">{ 'Program(s) and Section(s)' if class_type == 'school_event' else 'Section' }</td>
-              <td style="padding:8px 12px;font-size:12px;color:#333;
-                         border-bottom:1px solid #eee;">{section_display}</td>
-            </tr>
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;">{ 'Teachers Involved' if class_type == 'school_event' else 'Instructor' }</td>
-              <td style="padding:8px 12px;font-size:12px;color:#333;
-                         border-bottom:1px solid #eee;">{instructor_display}</td>
-            </tr>
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;">Date</td>
-              <td style="padding:8px 12px;font-size:12px;color:#333;
-                         border-bottom:1px solid #eee;">{_fmt_date(tap_time)}</td>
-            </tr>
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;">Tapped Time</td>
-              <td style="padding:8px 12px;font-size:12px;color:#333;
-                          border-bottom:1px solid #eee;">{"-" if status.lower() in ("absent", "excused") else _fmt_time(tap_time)}</td>
-            </tr>
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;">Time Slot</td>
-              <td style="padding:8px 12px;font-size:12px;color:#333;
-                         border-bottom:1px solid #eee;">{_fmt_slot(time_slot)}</td>
-            </tr>
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;">Class Type</td>
-              <td style="padding:8px 12px;font-size:12px;color:#333;
-                         border-bottom:1px solid #eee;text-transform:capitalize;">{str(class_type or 'Lecture').replace('_', ' ')}</td>
-            </tr>
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;">NFC UID</td>
-              <td style="padding:8px 12px;font-size:12px;color:#333;
-                         border-bottom:1px solid #eee;font-family:monospace;">{nfc_id or '—'}</td>
-            </tr>
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;">Enrollment Type</td>
-              <td style="padding:8px 12px;font-size:12px;color:#333;
-                         border-bottom:1px solid #eee;">{enrollment_status}</td>
-            </tr>
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;">Status</td>
-              <td style="padding:8px 12px;">
-                <span style="background:{bg};color:{clr};font-weight:700;
-                             font-size:12px;padding:3px 10px;border-radius:20px;
-                             border:1px solid {clr};">{label}</span>
-              </td>
-            </tr>
-          </table>
-        </td>
-      </tr>
-      <!-- Footer -->
-      <tr>
-        <td style="padding:20px 32px 28px;">
-          <div style="font-size:11px;color:#94a3b8;line-height:1.6;">
-            This is an automated attendance receipt from the DAVS system.<br>
-            Your attendance is being permanently recorded on the blockchain.<br>
-            You will receive a <strong>final confirmation email</strong> with the blockchain transaction hash once the session is finalized.<br>
-            Please do not reply to this email.
-          </div>
-        </td>
-      </tr>
-    </table>
-  </td></tr>
-</table>
-</body></html>'''
-    send_email_fn(
-        [student_email],
-        f'[DAVS] Attendance Recorded - {subject_name} ({label})',
-        html,
+    frags = _receipt_fragments(
+        False, status, subject_name, section_key, teacher_name, semester, time_slot, class_type,
+        event_description, _as_tuple(teachers_involved), _as_tuple(programs_involved), None, None,
     )
+    html = render_email(
+        'emails/attendance_receipt.html',
+        s=frags,
+        student_name=student_name,
+        student_id=student_id,
+        tap_date=_fmt_date(tap_time),
+        tap_time="-" if status.lower() in ("absent", "excused") else _fmt_time(tap_time),
+        nfc_id=nfc_id,
+        enrollment_status=enrollment_status,
+        excuse_link=None,
+    )
+    send_email_fn([student_email], frags['subject'], html)
 
 
 def send_teacher_session_summary(
@@ -510,337 +263,102 @@ def send_teacher_session_summary(
     """Send session summary email to teacher when session ends."""
     if not teacher_email or '@' not in teacher_email or send_email_fn is None:
         return
+    subject, html = render_teacher_session_summary(
+        teacher_name, subject_name, section_key, time_slot, started_at, ended_at,
+        present_count, late_count, absent_count, excused_count, student_rows,
+        session_tx_hash=session_tx_hash, session_block_number=session_block_number,
+        semester=semester, class_type=class_type, course_code=course_code,
+        event_description=event_description, teachers_involved=teachers_involved,
+        programs_involved=programs_involved,
+    )
+    send_email_fn([teacher_email], subject, html)
+
+
+def render_teacher_session_summary(
+    teacher_name,
+    subject_name,
+    section_key,
+    time_slot,
+    started_at,
+    ended_at,
+    present_count,
+    late_count,
+    absent_count,
+    excused_count,
+    student_rows,
+    session_tx_hash=None,
+    session_block_number=None,
+    semester=None,
+    class_type='lecture',
+    course_code=None,
+    event_description=None,
+    teachers_involved=None,
+    programs_involved=None,
+):
+    """Build (subject, html) for the teacher session summary."""
     total = present_count + late_count + absent_count + excused_count
     rate = round((present_count + late_count) / total * 100, 1) if total else 0
-    
+    is_event = class_type == 'school_event'
+
     # Section + Semester formatting
     section_disp = section_key.replace('|', ' · ') if section_key else '—'
     if semester:
         section_disp += f" · {semester}"
-        
-    status_colors = {
-        'present': ('#2D6A27', '#E8F5E9', '✓ Present'),
-        'late': ('#D4A017', '#FFF8E1', '⏱ Late'),
-        'absent': ('#C0392B', '#FFEBEE', '✕ Absent'),
-        'excused': ('#2980B9', '#E3F2FD', '◎ Excused'),
-    }
-    
+    section_lines = [section_disp]
+    if is_event and programs_involved:
+        # Remove duplicates
+        section_lines = sorted(set(str(p).replace('|', ' · ') for p in programs_involved if p))
+        section_disp = "<br>".join(section_lines)
+
     # Subject display with course code
     subject_display = subject_name
-    if class_type != 'school_event' and course_code:
+    if not is_event and course_code:
         subject_display += f" [{course_code}]"
-        
+
     # Teacher display for events
-    teacher_disp = teacher_name
-    if class_type == 'school_event' and teachers_involved:
+    teacher_lines = [teacher_name]
+    if is_event and teachers_involved:
         # Remove duplicates
-        unique_teachers = sorted(list(set([str(t) for t in teachers_involved if t])))
-        teacher_disp = "<br>".join(unique_teachers)
-        
-    # Section display for events
-    if class_type == 'school_event' and programs_involved:
-        # Remove duplicates
-        unique_programs = sorted(list(set([str(p).replace('|', ' · ') for p in programs_involved if p])))
-        section_disp = "<br>".join(unique_programs)
-        
-    rows_html = ''
-    for i, st in enumerate(student_rows):
-        clr, bg, lbl = status_colors.get(
-            st.get('status', 'absent'),
-            ('#333', '#f5f5f5', st.get('status', '—').capitalize()),
-        )
-        bg_row = '#F9FBF9' if i % 2 == 0 else '#FFFFFF'
-        rows_html += f'''<tr style="background:{bg_row};">
-          <td style="padding:7px 10px;font-size:12px;border-bottom:1px solid #eee;">
-            {st.get("name", "—")}
-            <div style="font-size:10px;color:#999;">{st.get("student_id", "")}</div>
-          </td>
-          <td style="padding:7px 10px;font-size:11px;color:#666;border-bottom:1px solid #eee;">
-             <span style="font-size:10px;font-weight:700;color:{'#C0392B' if st.get('enrollment_status','Regular')=='Irregular' else '#2D6A27'};">
-               {st.get('enrollment_status', 'Regular')}
-             </span>
-          </td>
-          <td style="padding:7px 10px;font-size:10px;color:#666;border-bottom:1px solid #eee;">
-             {st.get('program_section', '—').replace('|', ' · ')}
-          </td>
-          <td style="padding:7px 10px;font-size:11px;color:#666;border-bottom:1px solid #eee;font-family:monospace;">
-             {st.get("nfc_id", st.get("nfc_uid", "—"))}
-          </td>
-          <td style="padding:7px 10px;border-bottom:1px solid #eee;">
-            <span style="background:{bg};color:{clr};font-weight:700;
-                         font-size:11px;padding:2px 8px;border-radius:20px;
-                         border:1px solid {clr};">{lbl}</span>
-          </td>
-        </tr>'''
-    session_blockchain_info = f'''
-      <!-- Session Blockchain Info -->
-      <tr>
-        <td style="background:#E8F5E9;padding:20px 32px;border-top:1px solid #ddd;">
-          <div style="font-size:13px;font-weight:700;color:#2D6A27;margin-bottom:12px;">
-            📋 Blockchain Verification
-          </div>
-          <table width="100%" cellpadding="0" cellspacing="0" style="border:1px solid #c8e6c9;border-radius:8px;overflow:hidden;background:#fff;">
-            <tr>
-              <td style="padding:10px 15px;font-size:12px;color:#666;border-bottom:1px solid #eee;width:120px;">Transaction Hash:</td>
-              <td style="padding:10px 15px;font-size:11px;font-family:monospace;color:#2D6A27;word-break:break-all;border-bottom:1px solid #eee;">
-                {session_tx_hash if session_tx_hash else '<i>Pending...</i>'}
-              </td>
-            </tr>
-            <tr>
-              <td style="padding:10px 15px;font-size:12px;color:#666;border-bottom:1px solid #eee;">Block Number:</td>
-              <td style="padding:10px 15px;font-size:12px;font-family:monospace;color:#333;border-bottom:1px solid #eee;">
-                {session_block_number if session_block_number else '—'}
-              </td>
-            </tr>
-            <tr>
-              <td colspan="2" style="padding:15px;text-align:center;">
-                <a href="https://sepolia.etherscan.io/tx/{session_tx_hash}" 
-                   style="display:inline-block;background:#2D6A27;color:#ffffff;text-decoration:none;padding:12px 24px;border-radius:6px;font-weight:bold;font-size:13px;{ 'display:none;' if not session_tx_hash else '' }" 
-                   target="_blank">
-                  View on Blockchain Explorer
-                </a>
-                { '<div style="font-size:12px;color:#666;">Transaction details will be available shortly once confirmed on the network.</div>' if not session_tx_hash else '' }
-              </td>
-            </tr>
-          </table>
-        </td>
-      </tr>'''
-    
-    html = f'''<!DOCTYPE html>
-<html><head><meta charset="UTF-8"></head>
-<body style="margin:0;padding:0;background:#f4f4f4;font-family:Calibri,Arial,sans-serif;">
-<table width="100%" cellpadding="0" cellspacing="0">
-  <tr><td align="center" style="padding:32px 16px;">
-    <table width="640" cellpadding="0" cellspacing="0"
-           style="background:#fff;border-radius:12px;overflow:hidden;
-                  box-shadow:0 2px 12px rgba(0,0,0,.1);">
-      <!-- Header -->
-      <tr>
-        <td style="background:#1E4A1A;padding:24px 32px;">
-          <div style="font-size:20px;font-weight:700;color:#F5C518;">DAVS</div>
-          <div style="font-size:11px;color:#94a3b8;margin-top:2px;">
-            Session Summary Report - {subject_name}
-          </div>
-        </td>
-      </tr>
-      <!-- Summary stats -->
-      <tr>
-        <td style="padding:20px 32px 8px;">
-          <div style="font-size:13px;font-weight:700;color:#1E4A1A;
-                      text-transform:uppercase;letter-spacing:1px;
-                      margin-bottom:12px;">Session Overview</div>
-          <table width="100%" cellpadding="0" cellspacing="0"
-                 style="border:1px solid #eee;border-radius:8px;
-                        overflow:hidden;margin-bottom:16px;">
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;width:140px;">{ 'Event Name' if class_type == 'school_event' else 'Subject' }</td>
-              <td style="padding:8px 12px;font-size:12px;font-weight:600;
-                         color:#333;border-bottom:1px solid #eee;">{subject_display}</td>
-            </tr>
-            { f'<tr><td style="padding:8px 12px;font-size:12px;color:#666;border-bottom:1px solid #eee;">Event Description</td><td style="padding:8px 12px;font-size:12px;color:#333;border-bottom:1px solid #eee;">{event_description}</td></tr>' if class_type == 'school_event' and event_description else '' }
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;">{ 'Program(s) and Section(s) involved' if class_type == 'school_event' else 'Section' }</td>
-              <td style="padding:8px 12px;font-size:12px;color:#333;
-                         border-bottom:1px solid #eee;">{section_disp}</td>
-            </tr>
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;">{ 'Instructors involved' if class_type == 'school_event' else 'Instructor' }</td>
-              <td style="padding:8px 12px;font-size:12px;color:#333;
-                         border-bottom:1px solid #eee;">{teacher_disp}</td>
-            </tr>
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;">Time Slot</td>
-              <td style="padding:8px 12px;font-size:12px;color:#333;
-                         border-bottom:1px solid #eee;">{_fmt_slot(time_slot)}</td>
-            </tr>
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;">Started</td>
-              <td style="padding:8px 12px;font-size:12px;color:#333;
-                         border-bottom:1px solid #eee;">{_fmt_dt(started_at)}</td>
-            </tr>
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;">Ended</td>
-              <td style="padding:8px 12px;font-size:12px;color:#333;
-                         border-bottom:1px solid #eee;">{_fmt_dt(ended_at)}</td>
-            </tr>
-            <tr>
-              <td style="padding:8px 12px;font-size:12px;color:#666;
-                         border-bottom:1px solid #eee;">Class Type</td>
-              <td style="padding:8px 12px;font-size:12px;color:#333;
-                         border-bottom:1px solid #eee;text-transform:capitalize;">{str(class_type or 'Lecture').replace('_', ' ')}</td>
-            </tr>
-          </table>
-          <!-- Stat boxes -->
-          <table width="100%" cellpadding="0" cellspacing="0" style="margin-bottom:20px;">
-            <tr>
-              <td width="25%" style="padding:4px;">
-                <div style="background:#E8F5E9;border:1px solid #2D6A27;border-radius:8px;
-                            padding:12px;text-align:center;">
-                  <div style="font-size:28px;font-weight:700;color:#2D6A27;">{present_count}</div>
-                  <div style="font-size:11px;color:#2D6A27;font-weight:600;">Present</div>
-                </div>
-              </td>
-              <td width="25%" style="padding:4px;">
-                <div style="background:#FFF8E1;border:1px solid #D4A017;border-radius:8px;
-                            padding:12px;text-align:center;">
-                  <div style="font-size:28px;font-weight:700;color:#D4A017;">{late_count}</div>
-                  <div style="font-size:11px;color:#D4A017;font-weight:600;">Late</div>
-                </div>
-              </td>
-              <td width="25%" style="padding:4px;">
-                <div style="background:#FFEBEE;border:1px solid #C0392B;border-radius:8px;
-                            padding:12px;text-align:center;">
-                  <div style="font-size:28px;font-weight:700;color:#C0392B;">{absent_count}</div>
-                  <div style="font-size:11px;color:#C0392B;font-weight:600;">Absent</div>
-                </div>
-              </td>
-              <td width="25%" style="padding:4px;">
-                <div style="background:#E3F2FD;border:1px solid #2980B9;border-radius:8px;
-                            padding:12px;text-align:center;">
-                  <div style="font-size:28px;font-weight:700;color:#2980B9;">{excused_count}</div>
-                  <div style="font-size:11px;color:#2980B9;font-weight:600;">Excused</div>
-                </div>
-              </td>
-            </tr>
-          </table>
-          <div style="font-size:12px;color:#555;margin-bottom:20px;">
-            Attendance rate: <strong style="color:#1E4A1A;">{rate}%</strong>
-            &nbsp;-&nbsp; {total} students enrolled
-          </div>
-          <!-- Student list -->
-          <div style="font-size:13px;font-weight:700;color:#1E4A1A;
-                      text-transform:uppercase;letter-spacing:1px;
-                      margin-bottom:10px;">Student Attendance List</div>
-          <table width="100%" cellpadding="0" cellspacing="0"
-                 style="border:1px solid #eee;border-radius:8px;overflow:hidden;">
-            <thead>
-              <tr style="background:#1E4A1A;">
-                <th style="padding:9px 10px;font-size:11px;color:#fff;
-                           text-align:left;font-weight:600;">Student</th>
-                <th style="padding:9px 10px;font-size:11px;color:#fff;
-                           text-align:left;font-weight:600;">Enrollment</th>
-                <th style="padding:9px 10px;font-size:11px;color:#fff;
-                           text-align:left;font-weight:600;">Program and Section</th>
-                <th style="padding:9px 10px;font-size:11px;color:#fff;
-                           text-align:left;font-weight:600;">NFC UID</th>
-                <th style="padding:9px 10px;font-size:11px;color:#fff;
-                           text-align:left;font-weight:600;">Status</th>
-              </tr>
-            </thead>
-            <tbody>{rows_html}</tbody>
-          </table>
-        </td>
-      </tr>
-      {session_blockchain_info}
-      <!-- Footer -->
-      <tr>
-        <td style="padding:16px 32px 28px;">
-          <div style="font-size:11px;color:#94a3b8;line-height:1.6;">
-            This is an automated session summary from the DAVS system.<br>
-            All TX hashes are immutable blockchain records verifiable on the Sepolia testnet.<br>
-            {f'<div style="margin-top:8px;padding:8px;background:#f8fafc;border-radius:4px;border-left:3px solid #cbd5e1;color:#64748b;"><strong>How to verify:</strong> To verify the attendance record, click the "View on Blockchain Explorer" button above. On Etherscan, go to the <strong>"More Details"</strong> section, find <strong>"Input Data"</strong>, and click <strong>"View Input As"</strong> &rarr; <strong>"UTF-8"</strong> to see the full attendance record.</div>' if session_tx_hash else ""}
-            Please do not reply to this email.
-          </div>
-        </td>
-      </tr>
-    </table>
-  </td></tr>
-</table>
-</body></html>'''
-    send_email_fn(
-        [teacher_email],
-        f'[DAVS] Session Summary - {subject_name} · {section_disp}',
-        html,
+        teacher_lines = sorted(set(str(t) for t in teachers_involved if t))
+
+    # One badge per status, reused for every row.
+    m = email_macros(_FRAGMENTS)
+    badges = {st: m.summary_badge(*_STATUS_COLORS[st]) for st in _STATUS_COLORS}
+
+    html = render_email(
+        'emails/teacher_session_summary.html',
+        subject_name=subject_name,
+        subject_display=subject_display,
+        is_event=is_event,
+        event_description=event_description,
+        section_lines=section_lines,
+        teacher_lines=teacher_lines,
+        time_slot=time_slot,
+        started_at=started_at,
+        ended_at=ended_at,
+        class_type_label=str(class_type or 'Lecture').replace('_', ' '),
+        present_count=present_count,
+        late_count=late_count,
+        absent_count=absent_count,
+        excused_count=excused_count,
+        rate=rate,
+        total=total,
+        student_rows=student_rows,
+        badges=badges,
+        fallback_badge=m.summary_badge,
+        session_tx_hash=session_tx_hash,
+        session_block_number=session_block_number,
     )
+    return f'[DAVS] Session Summary - {subject_name} · {section_disp}', html
+
 
 def send_audit_resolution_email(recipients, conflicts, cfg):
     """
     Sends a high-priority alert about detected and resolved tampering.
     """
     from services.email_service import send_email_async
-    
-    rows_html = ""
-    for c in conflicts:
-        date_fmt = '-'
-        if c.get('started_at'):
-            from datetime import datetime
-            try:
-                dt = datetime.strptime(c['started_at'], '%Y-%m-%d %H:%M:%S')
-                date_fmt = dt.strftime('%B %d, %Y')
-            except:
-                date_fmt = c['started_at']
-        
-        rows_html += f"""
-        <tr>
-            <td style="padding:10px; border-bottom:1px solid #eee;">
-                <div style="font-weight:700;color:#1E4A1A;">{c['subject_name']}</div>
-                <div style="font-size:10px;color:#666;">{c.get('class_type', 'Lecture').title()}</div>
-            </td>
-            <td style="padding:10px; border-bottom:1px solid #eee;">
-                <a href="https://sepolia.etherscan.io/tx/{c['tx_hash']}" style="font-size:10px;font-family:monospace;color:#2D6A27;text-decoration:none;">{c['tx_hash'][:10]}...</a>
-            </td>
-            <td style="padding:10px; border-bottom:1px solid #eee;">
-                <div style="font-size:10px;color:#444;">{date_fmt}</div>
-            </td>
-            <td style="padding:10px; border-bottom:1px solid #eee;">
-                <div style="font-weight:600;">{c['student_name']}</div>
-                <div style="font-size:10px;color:#666;">{c.get('student_id', '-')} | {c['nfc_id']}</div>
-            </td>
-            <td style="padding:10px; border-bottom:1px solid #eee;">
-                <span style="color:#C0392B;font-weight:700;font-size:10px;">{c['db_status'].upper()}</span>
-            </td>
-            <td style="padding:10px; border-bottom:1px solid #eee;">
-                <span style="color:#2D6A27;font-weight:700;font-size:10px;">{c['bc_status'].upper()}</span>
-            </td>
-        </tr>
-        """
-
-    html = f'''
-    <html><body style="font-family:sans-serif;background:#f4f7f6;padding:20px;">
-        <div style="max-width:800px;margin:0 auto;background:#fff;border-radius:12px;overflow:hidden;border:1px solid #eee;box-shadow:0 4px 12px rgba(0,0,0,0.05);">
-            <div style="background:#2D6A27;padding:24px;text-align:center;color:#fff;">
-                <h2 style="margin:0;font-size:20px;letter-spacing:1px;">BLOCKCHAIN INTEGRITY RESOLVED</h2>
-                <p style="margin:8px 0 0;font-size:13px;opacity:0.9;">Tampered Records Safely Restored</p>
-            </div>
-            <div style="padding:32px;">
-                <p style="font-size:14px;color:#444;line-height:1.6;">
-                    The DAVS integrity scanner detected discrepancies between the <strong>PostgreSQL Database</strong> and the <strong>Sepolia Blockchain</strong>. 
-                    The unauthorized local changes have been successfully <strong>resolved and synced</strong> to perfectly match the immutable blockchain ledger below.
-                </p>
-                <div style="margin:24px 0; overflow-x:auto;">
-                    <table width="100%" cellpadding="0" cellspacing="0" style="border:1px solid #eee;border-radius:8px;min-width:600px;">
-                        <thead style="background:#f8fafc;">
-                            <tr>
-                                <th style="padding:10px;text-align:left;font-size:11px;color:#64748b;">SESSION</th>
-                                <th style="padding:10px;text-align:left;font-size:11px;color:#64748b;">TX HASH</th>
-                                <th style="padding:10px;text-align:left;font-size:11px;color:#64748b;">DATE</th>
-                                <th style="padding:10px;text-align:left;font-size:11px;color:#64748b;">STUDENT</th>
-                                <th style="padding:10px;text-align:left;font-size:11px;color:#64748b;">LOCAL DB (TAMPERED)</th>
-                                <th style="padding:10px;text-align:left;font-size:11px;color:#64748b;">BLOCKCHAIN (RESTORED)</th>
-                            </tr>
-                        </thead>
-                        <tbody>{rows_html}</tbody>
-                    </table>
-                </div>
-                <div style="background:#f0f9ff;border-left:4px solid #0369a1;padding:16px;border-radius:4px;margin-bottom:24px;">
-                    <p style="margin:0;font-size:12px;color:#0369a1;line-height:1.5;">
-                        <strong>Status: Solved.</strong> These records are now synchronized with the Sepolia blockchain. The database is secure.
-                    </p>
-                </div>
-                <p style="font-size:12px;color:#94a3b8;text-align:center;margin:0;">
-                    Automated Security Report &bull; DAVS Blockchain System
-                </p>
-            </div>
-        </div>
-    </body></html>
-    '''
-    
+
+    html = render_email('emails/audit_resolution.html', conflicts=conflicts)
     send_email_async(
         recipients,
         "[DAVS] Blockchain Integrity Audit - Tampering Resolved",
@@ -0,0 +1,45 @@
+def bulk_mark_absent(conn, *, sess_id, students, tap_time, class_type, created_at):
+    """
+    Write 'absent' attendance rows for ``students`` (dicts with nfcId / name /
+    student_id) in one INSERT ... SELECT FROM unnest(...) statement on the
+    caller's connection, instead of one connection + upsert per student.
+
+    Conflicts follow db_save_attendance_log: an existing (sess_id, nfc_id)
+    row is overwritten to absent. Returns the number of rows written.
+    """
+    if not students:
+        return 0
+    nfc_ids = [st['nfcId'] for st in students]
+    names = [st.get('name', '') or '' for st in students]
+    student_ids = [st.get('student_id', '') or '' for st in students]
+    cur = conn.execute(
+        "INSERT INTO attendance_logs "
+        "(sess_id,nfc_id,student_name,student_id,status,class_type,tap_time,"
+        " tx_hash,block_number,excuse_note,created_at) "
+        "SELECT ?, u.nfc_id, u.student_name, u.student_id, 'absent', ?, ?, '', 0, '', ? "
+        "FROM unnest(?::text[], ?::text[], ?::text[]) AS u(nfc_id, student_name, student_id) "
+        "ON CONFLICT(sess_id,nfc_id) DO UPDATE SET "
+        "status=excluded.status, class_type=excluded.class_type, tap_time=excluded.tap_time, "
+        "tx_hash=excluded.tx_hash, block_number=excluded.block_number, "
+        "excuse_note=excluded.excuse_note",
+        (sess_id, class_type, tap_time, created_at, nfc_ids, names, student_ids),
+    )
+    return cur.rowcount
+
+
+def recompute_session_totals(conn, sess_id):
+    """Recompute sessions.total_* from attendance_logs on the caller's connection."""
+    counts = conn.execute(
+        "SELECT status, COUNT(*) as cnt FROM attendance_logs "
+        "WHERE sess_id=? GROUP BY status", (sess_id,)
+    ).fetchall()
+    totals = {r['status']: r['cnt'] for r in counts}
+    conn.execute(
+        "UPDATE sessions SET "
+        "total_present=?, total_late=?, total_absent=?, total_excused=? "
+        "WHERE sess_id=?",
+        (totals.get('present', 0) + totals.get('late', 0),
+         totals.get('late', 0), totals.get('absent', 0),
+         totals.get('excused', 0), sess_id)
+    )
+    return totals
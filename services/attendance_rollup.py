@@ -0,0 +1,200 @@
+"""
+Pre-aggregated attendance counts for the dashboard stats endpoint.
+
+  stats_attendance_rollup  day × hour × section (key, program, year, letter) ×
+                           subject × teacher × class type × semester × time
+                           slot × enrollment status × status -> cnt
+  stats_session_rollup     the same session dimensions -> sessions
+  stats_rollup_sources     what each session currently contributes to the two
+                           tables above (one row per enrollment/status, plus a
+                           status='' row for the session itself)
+
+``refresh_session_rollup`` recomputes one session's contribution from its
+attendance_logs and applies only the difference, so it can run after any
+write (tap, absent marking, excuse, status fix, delete) in the same
+transaction. ``rebuild_rollup`` recomputes everything from scratch.
+"""
+
+ROLLUP_DIMENSIONS = (
+    'day', 'hour', 'section_key', 'program', 'year_level', 'section_letter',
+    'subject_name', 'course_code', 'teacher_username', 'teacher_name',
+    'class_type', 'semester', 'time_slot',
+)
+
+# Session columns -> rollup dimensions. Stats filter and bucket on the
+# session's start, not on the tap time.
+_SESSION_DIMENSION_EXPRS = (
+    "SUBSTR(s.started_at, 1, 10)", "SUBSTR(s.started_at, 12, 2)", "s.section_key",
+    "s.program", "s.year_level", "s.section_letter", "s.subject_name", "s.course_code",
+    "s.teacher_username", "s.teacher_name",
+    "LOWER(COALESCE(s.class_type, 'lecture'))", "s.semester", "s.time_slot",
+)
+SESSION_DIMENSION_SQL = ', '.join(
+    f'{expr} AS {name}' for expr, name in zip(_SESSION_DIMENSION_EXPRS, ROLLUP_DIMENSIONS)
+)
+ENROLLMENT_SQL = "LOWER(COALESCE(st.enrollment_status, 'regular'))"
+
+
+def _group_by_positions(n):
+    # Positional: the dimension names also exist on students, so GROUP BY by name is ambiguous.
+    return ', '.join(str(i) for i in range(1, n + 1))
+
+
+_DIMS = ', '.join(ROLLUP_DIMENSIONS)
+_DIM_MATCH = ' AND '.join(f'{d}=?' for d in ROLLUP_DIMENSIONS)
+
+# Session marker rows in stats_rollup_sources carry status='' and count 1.
+SESSION_MARKER = ''
+
+_DIM_COLUMNS = ''.join(
+    f"        {d:<17} TEXT NOT NULL DEFAULT '{'lecture' if d == 'class_type' else ''}',\n"
+    for d in ROLLUP_DIMENSIONS
+)
+
+# Derived data: when the dimensions change, the app drops and recreates these
+# tables at startup and rebuilds them (see _migrate_stats_rollup in app.py).
+ROLLUP_SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS stats_attendance_rollup (
+{_DIM_COLUMNS}        enrollment_status TEXT NOT NULL DEFAULT 'regular',
+        status            TEXT NOT NULL DEFAULT '',
+        cnt               INTEGER NOT NULL DEFAULT 0,
+        UNIQUE ({_DIMS}, enrollment_status, status)
+    );
+    CREATE INDEX IF NOT EXISTS idx_rollup_att_day ON stats_attendance_rollup(day);
+    CREATE TABLE IF NOT EXISTS stats_session_rollup (
+{_DIM_COLUMNS}        sessions          INTEGER NOT NULL DEFAULT 0,
+        UNIQUE ({_DIMS})
+    );
+    CREATE INDEX IF NOT EXISTS idx_rollup_sess_day ON stats_session_rollup(day);
+    CREATE TABLE IF NOT EXISTS stats_rollup_sources (
+        sess_id           TEXT NOT NULL,
+{_DIM_COLUMNS}        enrollment_status TEXT NOT NULL DEFAULT '',
+        status            TEXT NOT NULL DEFAULT '',
+        cnt               INTEGER NOT NULL DEFAULT 0,
+        UNIQUE (sess_id, enrollment_status, status)
+    );
+"""
+ROLLUP_TABLES = ('stats_attendance_rollup', 'stats_session_rollup', 'stats_rollup_sources')
+
+
+def _contribution_key(row):
+    return tuple(row[d] for d in ROLLUP_DIMENSIONS) + (row['enrollment_status'], row['status'])
+
+
+def _session_contribution(conn, sess_id):
+    rows = conn.execute(
+        f"SELECT {SESSION_DIMENSION_SQL}, {ENROLLMENT_SQL} AS enrollment_status, "
+        "al.status, COUNT(*) AS cnt "
+        "FROM attendance_logs al "
+        "JOIN sessions s ON s.sess_id = al.sess_id "
+        "LEFT JOIN students st ON st.nfc_id = al.nfc_id "
+        "WHERE al.sess_id = ? "
+        f"GROUP BY {_group_by_positions(len(ROLLUP_DIMENSIONS) + 2)}",
+        (sess_id,),
+    ).fetchall()
+    out = {_contribution_key(r): int(r['cnt']) for r in rows}
+    marker = conn.execute(
+        f"SELECT {SESSION_DIMENSION_SQL} FROM sessions s WHERE s.sess_id = ?", (sess_id,)
+    ).fetchone()
+    if marker:
+        out[tuple(marker[d] for d in ROLLUP_DIMENSIONS) + (SESSION_MARKER, SESSION_MARKER)] = 1
+    return out
+
+
+def _stored_contribution(conn, sess_id):
+    rows = conn.execute(
+        f"SELECT {_DIMS}, enrollment_status, status, cnt FROM stats_rollup_sources WHERE sess_id = ?",
+        (sess_id,),
+    ).fetchall()
+    return {_contribution_key(r): int(r['cnt']) for r in rows}
+
+
+def _apply_delta(conn, key, delta):
+    dims, enrollment_status, status = key[:len(ROLLUP_DIMENSIONS)], key[-2], key[-1]
+    if status == SESSION_MARKER:
+        conn.execute(
+            f"INSERT INTO stats_session_rollup ({_DIMS}, sessions) "
+            f"VALUES ({', '.join('?' * len(ROLLUP_DIMENSIONS))}, ?) "
+            f"ON CONFLICT({_DIMS}) DO UPDATE SET sessions = stats_session_rollup.sessions + excluded.sessions",
+            dims + (delta,),
+        )
+        if delta < 0:
+            conn.execute(f"DELETE FROM stats_session_rollup WHERE {_DIM_MATCH} AND sessions <= 0", dims)
+        return
+    conn.execute(
+        f"INSERT INTO stats_attendance_rollup ({_DIMS}, enrollment_status, status, cnt) "
+        f"VALUES ({', '.join('?' * len(ROLLUP_DIMENSIONS))}, ?, ?, ?) "
+        f"ON CONFLICT({_DIMS}, enrollment_status, status) "
+        "DO UPDATE SET cnt = stats_attendance_rollup.cnt + excluded.cnt",
+        dims + (enrollment_status, status, delta),
+    )
+    if delta < 0:
+        conn.execute(
+            f"DELETE FROM stats_attendance_rollup WHERE {_DIM_MATCH} "
+            "AND enrollment_status=? AND status=? AND cnt <= 0",
+            dims + (enrollment_status, status),
+        )
+
+
+def refresh_session_rollup(conn, sess_id):
+    """
+    Bring the rollup tables in line with ``sess_id``'s current logs on the
+    caller's connection (so it commits or rolls back with the write that
+    prompted it). Safe to call for a session that was just deleted: its old
+    contribution is subtracted. Returns the number of rollup rows touched.
+    """
+    if not sess_id:
+        return 0
+    # Serialize refreshes of one session; the caller's write usually holds this row lock already.
+    conn.execute("SELECT sess_id FROM sessions WHERE sess_id = ? FOR UPDATE", (sess_id,))
+    new = _session_contribution(conn, sess_id)
+    old = _stored_contribution(conn, sess_id)
+    if new == old:
+        return 0
+    touched = 0
+    for key in set(new) | set(old):
+        delta = new.get(key, 0) - old.get(key, 0)
+        if delta:
+            _apply_delta(conn, key, delta)
+            touched += 1
+    conn.execute("DELETE FROM stats_rollup_sources WHERE sess_id = ?", (sess_id,))
+    if new:
+        conn.executemany(
+            f"INSERT INTO stats_rollup_sources (sess_id, {_DIMS}, enrollment_status, status, cnt) "
+            f"VALUES (?, {', '.join('?' * len(ROLLUP_DIMENSIONS))}, ?, ?, ?)",
+            [(sess_id,) + key + (cnt,) for key, cnt in new.items()],
+        )
+    return touched
+
+
+def rebuild_rollup(conn):
+    """Recompute all three rollup tables from sessions / attendance_logs / students."""
+    conn.execute("TRUNCATE stats_rollup_sources, stats_attendance_rollup, stats_session_rollup")
+    # Written as WITH ... INSERT so the connection wrapper does not treat it as an
+    # INSERT into attendance_logs (and append RETURNING id).
+    conn.execute(
+        "WITH src AS ("
+        f" SELECT al.sess_id, {SESSION_DIMENSION_SQL}, {ENROLLMENT_SQL} AS enrollment_status,"
+        "  al.status, COUNT(*) AS cnt"
+        "  FROM attendance_logs al"
+        "  JOIN sessions s ON s.sess_id = al.sess_id"
+        "  LEFT JOIN students st ON st.nfc_id = al.nfc_id"
+        f"  GROUP BY {_group_by_positions(len(ROLLUP_DIMENSIONS) + 3)}"
+        " UNION ALL"
+        f" SELECT s.sess_id, {SESSION_DIMENSION_SQL}, '', '', 1 FROM sessions s"
+        ") "
+        f"INSERT INTO stats_rollup_sources (sess_id, {_DIMS}, enrollment_status, status, cnt) "
+        "SELECT * FROM src"
+    )
+    conn.execute(
+        f"INSERT INTO stats_attendance_rollup ({_DIMS}, enrollment_status, status, cnt) "
+        f"SELECT {_DIMS}, enrollment_status, status, SUM(cnt) FROM stats_rollup_sources "
+        f"WHERE status <> '' GROUP BY {_DIMS}, enrollment_status, status"
+    )
+    conn.execute(
+        f"INSERT INTO stats_session_rollup ({_DIMS}, sessions) "
+        f"SELECT {_DIMS}, SUM(cnt) FROM stats_rollup_sources "
+        f"WHERE status = '' GROUP BY {_DIMS}"
+    )
+    row = conn.execute("SELECT COUNT(*) AS n FROM stats_attendance_rollup").fetchone()
+    return row['n'] if row else 0
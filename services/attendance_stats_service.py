@@ -2,6 +2,69 @@ from datetime import datetime
 import calendar as _cal
 
 
+def stats_query(wsql, enroll_where_clause, tkey_expr,
+                attendance_source='stats_attendance_rollup', session_source='stats_session_rollup'):
+    """
+    One statement for every breakdown on the stats dashboard: donut (status),
+    trend (tkey × status) and per-subject counts as GROUPING SETS over the
+    filtered attendance rows, plus the session count and subject labels over
+    the filtered sessions (no enrollment filter there). ``partition_stats_rows``
+    splits the result back up. The sources default to the rollup tables; any
+    relation exposing the same columns works (scripts/bench_stats_query.py runs
+    it over the live attendance_logs join).
+    """
+    return (
+        "SELECT 'attendance' AS part, GROUPING(tkey) AS no_tkey, GROUPING(subject_name) AS no_subject, "
+        "tkey, subject_name, course_code, status, SUM(cnt) AS cnt "
+        "FROM (SELECT " + tkey_expr + " AS tkey, subject_name, course_code, status, cnt "
+        "FROM " + attendance_source + " WHERE " + wsql + ' ' + enroll_where_clause + ") a "
+        "GROUP BY GROUPING SETS ((status), (tkey, status), (subject_name, course_code, status)) "
+        "UNION ALL "
+        "SELECT 'sessions', 1, GROUPING(subject_name), NULL, subject_name, course_code, NULL, SUM(sessions) "
+        "FROM " + session_source + " WHERE " + wsql + ' '
+        "GROUP BY GROUPING SETS ((), (subject_name, course_code)) "
+        "ORDER BY part, tkey, subject_name"
+    )
+
+
+def stats_query_params(params, enroll_params_extra):
+    return tuple(params) + tuple(enroll_params_extra) + tuple(params)
+
+
+def _subject_label(r):
+    return f"[{r['course_code']}] {r['subject_name']}" if r['course_code'] else r['subject_name']
+
+
+def partition_stats_rows(rows):
+    """(donut, trend, subjects, all_subjects, session_count) from ``stats_query`` rows."""
+    donut = {'present': 0, 'late': 0, 'absent': 0, 'excused': 0}
+    trend_buckets = {}
+    subjects_breakdown = {}
+    subj_labels_out = []
+    sess_count = 0
+    for r in rows:
+        if r['part'] == 'sessions':
+            if r['no_subject']:
+                sess_count = r['cnt'] or 0
+            else:
+                subj_labels_out.append(_subject_label(r))
+            continue
+        status = r['status']
+        if not r['no_tkey']:
+            bucket = trend_buckets.setdefault(r['tkey'], {'present': 0, 'late': 0, 'absent': 0, 'excused': 0})
+            if status in bucket:
+                bucket[status] = r['cnt']
+        elif not r['no_subject']:
+            label = _subject_label(r)
+            if label not in subjects_breakdown:
+                subjects_breakdown[label] = {'present': 0, 'late': 0, 'absent': 0, 'excused': 0, 'sessions': 0}
+            if status in subjects_breakdown[label]:
+                subjects_breakdown[label][status] = r['cnt']
+        elif status in donut:
+            donut[status] = r['cnt']
+    return donut, trend_buckets, subjects_breakdown, subj_labels_out, sess_count
+
+
 def attendance_stats_impl(
     *,
     request_obj,
@@ -48,136 +111,67 @@ def attendance_stats_impl(
         start_dt = datetime(2000, 1, 1)
         end_dt = None
 
-    # Direct string comparison on s.started_at
-    where = ["s.started_at >= ?"]
-    params = [start_dt.strftime('%Y-%m-%d %H:%M:%S')]
+    # Reads the pre-aggregated stats_* rollup tables (services/attendance_rollup.py):
+    # one row per day/hour × session dimensions × enrollment × status.
+    where = ["day >= ?"]
+    params = [start_dt.strftime('%Y-%m-%d')]
     if end_dt:
-        where.append("s.started_at <= ?")
-        params.append(end_dt.strftime('%Y-%m-%d %H:%M:%S'))
+        where.append("day <= ?")
+        params.append(end_dt.strftime('%Y-%m-%d'))
     if role == 'teacher':
-        where.append('(s.teacher_username = ? OR s.teacher_name = ?)')
+        where.append('(teacher_username = ? OR teacher_name = ?)')
         params.append(username)
         params.append(session_obj.get('full_name', ''))
     if f_section:
-        where.append('s.section_key = ?')
+        where.append('section_key = ?')
         params.append(normalize_section_key_fn(f_section))
     if f_program:
-        where.append('s.section_key LIKE ?')
-        params.append(f_program + '%')
+        where.append('program = ?')
+        params.append(f_program)
     if f_year_lvl:
-        where.append('s.section_key LIKE ?')
-        params.append('%|' + f_year_lvl + '|%')
+        where.append('year_level = ?')
+        params.append(f_year_lvl)
     if f_sec_ltr:
-        where.append('s.section_key LIKE ?')
-        params.append('%|' + f_sec_ltr)
+        where.append('section_letter = ?')
+        params.append(f_sec_ltr)
     if f_subject:
-        where.append('s.subject_name = ?')
+        where.append('subject_name = ?')
         params.append(f_subject)
     if f_instr:
-        where.append('s.teacher_name = ?')
+        where.append('teacher_name = ?')
         params.append(f_instr)
     if f_class_type in ('lecture', 'laboratory', 'school_event'):
-        where.append('LOWER(COALESCE(s.class_type,\'lecture\')) = ?')
+        where.append('class_type = ?')
         params.append(f_class_type)
     if f_semester:
-        where.append('LOWER(s.semester) = ?')
+        where.append('LOWER(semester) = ?')
         params.append(f_semester.lower())
     if f_tod and ':' in f_tod:
-        where.append('s.time_slot = ?')
+        where.append('time_slot = ?')
         params.append(f_tod)
 
-    # enrollment_type is handled separately (only applies to attendance_log queries, not session counts)
+    # enrollment_type is handled separately (only applies to attendance counts, not session counts)
     enroll_where_clause = ''
     enroll_params_extra = []
     if f_enrollment:
-        enroll_where_clause = "AND LOWER(COALESCE(st.enrollment_status, 'regular')) = ?"
+        enroll_where_clause = "AND enrollment_status = ?"
         enroll_params_extra = [f_enrollment.lower()]
 
     wsql = ' AND '.join(where)
 
     if period == 'today':
-        tkey_expr = "SUBSTR(s.started_at, 12, 2) || ':00'"
+        tkey_expr = "hour || ':00'"
     elif period == 'month':
-        tkey_expr = "SUBSTR(s.started_at, 6, 5)"
+        tkey_expr = "SUBSTR(day, 6, 5)"
     elif period == 'year':
-        tkey_expr = "SUBSTR(s.started_at, 6, 2)"
+        tkey_expr = "SUBSTR(day, 6, 2)"
     else:
-        tkey_expr = "SUBSTR(s.started_at, 1, 4)"
-
-    params = tuple(params)
+        tkey_expr = "SUBSTR(day, 1, 4)"
 
+    sql = stats_query(wsql, enroll_where_clause, tkey_expr)
     with get_db_fn() as conn:
-        donut_rows = conn.execute(
-            "SELECT al.status, COUNT(*) as cnt "
-            "FROM attendance_logs al "
-            "JOIN sessions s ON al.sess_id = s.sess_id "
-            "LEFT JOIN students st ON al.nfc_id = st.nfc_id "
-            "WHERE " + wsql + ' ' + enroll_where_clause + ' GROUP BY al.status',
-            tuple(params) + tuple(enroll_params_extra),
-        ).fetchall()
-        trend_rows = conn.execute(
-            "SELECT " + tkey_expr + " as tkey, al.status, COUNT(*) as cnt "
-            "FROM attendance_logs al "
-            "JOIN sessions s ON al.sess_id = s.sess_id "
-            "LEFT JOIN students st ON al.nfc_id = st.nfc_id "
-            "WHERE " + wsql + ' ' + enroll_where_clause + ' GROUP BY tkey, al.status ORDER BY tkey',
-            tuple(params) + tuple(enroll_params_extra),
-        ).fetchall()
-        subj_rows = conn.execute(
-            "SELECT s.subject_name, s.course_code, al.status, COUNT(*) as cnt "
-            "FROM attendance_logs al "
-            "JOIN sessions s ON al.sess_id = s.sess_id "
-            "LEFT JOIN students st ON al.nfc_id = st.nfc_id "
-            "WHERE " + wsql + ' ' + enroll_where_clause + ' GROUP BY s.subject_name, s.course_code, al.status',
-            tuple(params) + tuple(enroll_params_extra),
-        ).fetchall()
-
-        # Session count and subject labels use base wsql only (no enrollment filter)
-        count_sql = (
-            "SELECT COUNT(DISTINCT s.sess_id) as cnt "
-            "FROM sessions s "
-            "LEFT JOIN attendance_logs al ON s.sess_id = al.sess_id "
-            "LEFT JOIN students st ON al.nfc_id = st.nfc_id "
-            "WHERE " + wsql
-        )
-        sess_count_row = conn.execute(count_sql, tuple(params)).fetchone()
-        sess_count = sess_count_row['cnt'] if sess_count_row else 0
-
-        # Fixed: subject labels query must join necessary tables for filtering
-        subj_labels_rows = conn.execute(
-            "SELECT DISTINCT s.subject_name, s.course_code FROM sessions s "
-            "LEFT JOIN attendance_logs al ON s.sess_id = al.sess_id "
-            "LEFT JOIN students st ON al.nfc_id = st.nfc_id "
-            "WHERE " + wsql + ' ORDER BY s.subject_name',
-            tuple(params),
-        ).fetchall()
-
-    donut = {'present': 0, 'late': 0, 'absent': 0, 'excused': 0}
-    for r in donut_rows:
-        if r['status'] in donut:
-            donut[r['status']] = r['cnt']
-
-    trend_buckets = {}
-    for r in trend_rows:
-        key = r['tkey']
-        if key not in trend_buckets:
-            trend_buckets[key] = {'present': 0, 'late': 0, 'absent': 0, 'excused': 0}
-        if r['status'] in trend_buckets[key]:
-            trend_buckets[key][r['status']] = r['cnt']
-
-    subjects_breakdown = {}
-    for r in subj_rows:
-        code = r['course_code']
-        label = f"[{code}] {r['subject_name']}" if code else r['subject_name']
-        if label not in subjects_breakdown:
-            subjects_breakdown[label] = {'present': 0, 'late': 0, 'absent': 0, 'excused': 0, 'sessions': 0}
-        if r['status'] in subjects_breakdown[label]:
-            subjects_breakdown[label][r['status']] = r['cnt']
-
-    subj_labels_out = [
-        (f"[{r['course_code']}] {r['subject_name']}" if r['course_code'] else r['subject_name'])
-        for r in subj_labels_rows
-    ]
+        rows = conn.execute(sql, stats_query_params(params, enroll_params_extra)).fetchall()
+    donut, trend_buckets, subjects_breakdown, subj_labels_out, sess_count = partition_stats_rows(rows)
 
     resp = jsonify_fn(
         {
@@ -0,0 +1,116 @@
+import os
+import socket
+import threading
+import time
+
+import psycopg2
+
+
+# Advisory lock key shared by every DAVS process ("DAVS" as a 32-bit int).
+AUTOMATION_LOCK_KEY = 0x44415653
+
+
+def default_identity():
+    host = os.getenv('RAILWAY_REPLICA_ID') or socket.gethostname()
+    return f'davs-automation:{host}:{os.getpid()}'
+
+
+class AutomationLeader:
+    """
+    Leader election for the automation scheduler across gunicorn workers and
+    replicas, using a session-level Postgres advisory lock held on a dedicated
+    connection. If the leader process dies its connection closes, Postgres
+    releases the lock, and the next campaigning process takes over on its
+    following attempt. The connection's application_name carries the
+    leader's identity so any process can report who currently leads.
+    """
+
+    def __init__(self, *, dsn, identity=None, lock_key=AUTOMATION_LOCK_KEY, retry_seconds=15,
+                 on_elected=None):
+        self.dsn = dsn
+        self.identity = identity or default_identity()
+        self.lock_key = lock_key
+        self.retry_seconds = retry_seconds
+        self.on_elected = on_elected
+        self._is_leader = False
+        self._thread = None
+        self.elected_at = None
+        self.last_heartbeat = None
+
+    def is_leader(self):
+        return self._is_leader
+
+    def _set_leader(self, value):
+        if value and not self._is_leader:
+            self.elected_at = time.strftime('%Y-%m-%d %H:%M:%S')
+            print(f'[AUTO] {self.identity} elected automation leader')
+            self._is_leader = True
+            if self.on_elected:
+                try:
+                    self.on_elected()
+                except Exception as e:
+                    print(f'[AUTO] on_elected callback failed: {e}')
+        elif not value and self._is_leader:
+            print(f'[AUTO] {self.identity} lost automation leadership')
+            self._is_leader = False
+
+    def _campaign(self):
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(
+                    self.dsn,
+                    application_name=self.identity[:63],
+                    keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=3,
+                )
+                conn.autocommit = True
+                cur = conn.cursor()
+                while True:
+                    if self._is_leader:
+                        # Heartbeat: raises if the lock-holding connection is gone.
+                        cur.execute('SELECT 1')
+                    else:
+                        cur.execute('SELECT pg_try_advisory_lock(%s)', (self.lock_key,))
+                        if cur.fetchone()[0]:
+                            self._set_leader(True)
+                    self.last_heartbeat = time.strftime('%Y-%m-%d %H:%M:%S')
+                    time.sleep(self.retry_seconds)
+            except Exception as e:
+                print(f'[AUTO] Leader election connection error: {e}')
+            finally:
+                self._set_leader(False)
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            time.sleep(self.retry_seconds)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self._thread
+        self._thread = threading.Thread(target=self._campaign, daemon=True, name='davs-automation-leader')
+        self._thread.start()
+        return self._thread
+
+    def current_leader(self, get_db_fn):
+        """Identity of whichever process holds the lock right now (any process can ask)."""
+        with get_db_fn() as conn:
+            row = conn.execute(
+                "SELECT a.application_name, a.backend_start "
+                "FROM pg_locks l JOIN pg_stat_activity a ON a.pid = l.pid "
+                "WHERE l.locktype = 'advisory' AND l.granted AND l.classid = 0 AND l.objid::bigint = ? "
+                "LIMIT 1",
+                (self.lock_key,),
+            ).fetchone()
+        if not row:
+            return None
+        return {'identity': row['application_name'], 'connected_since': str(row['backend_start'])}
+
+    def status(self):
+        return {
+            'identity': self.identity,
+            'is_leader': self._is_leader,
+            'elected_at': self.elected_at if self._is_leader else None,
+            'last_heartbeat': self.last_heartbeat,
+        }
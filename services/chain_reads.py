@@ -0,0 +1,59 @@
+import os
+
+from web3.exceptions import ABIFunctionNotFound, BadFunctionCallOutput, ContractLogicError, MismatchedABI
+
+
+CHAIN_PAGE_SIZE = int(os.getenv('CHAIN_PAGE_SIZE', '200') or 200)
+
+# What calling a paged getter looks like on a contract deployed before it
+# existed: missing from the ABI, unknown selector (revert / empty output).
+# Anything else — timeouts, connection errors, rate limits — is re-raised.
+_MISSING_FUNCTION_ERRORS = (ABIFunctionNotFound, MismatchedABI, BadFunctionCallOutput, ContractLogicError)
+
+
+def iter_paged(fetch_page, page_size=CHAIN_PAGE_SIZE, legacy_fetch=None):
+    """
+    Lazily walk an offset/limit view function. ``fetch_page(offset, limit)``
+    returns a list; iteration stops at the first short page. Contracts deployed
+    before the paginated getters existed fail the first page with one of
+    ``_MISSING_FUNCTION_ERRORS`` — only then is ``legacy_fetch()`` (the
+    unbounded getter) used instead.
+    """
+    offset = 0
+    while True:
+        try:
+            page = fetch_page(offset, page_size)
+        except _MISSING_FUNCTION_ERRORS:
+            if offset == 0 and legacy_fetch is not None:
+                yield from legacy_fetch()
+                return
+            raise
+        yield from page
+        if len(page) < page_size:
+            return
+        offset += len(page)
+
+
+def iter_attendance_history(contract, nfc_id, page_size=CHAIN_PAGE_SIZE):
+    """Yield (timestamp, status_code) pairs for an NFC ID, one page per RPC call."""
+    fns = contract.functions
+
+    def _page(offset, limit):
+        ts, statuses = fns.getAttendancePage(nfc_id, offset, limit).call()
+        return list(zip(ts, statuses))
+
+    def _legacy():
+        ts, statuses = fns.getAttendance(nfc_id).call()
+        return zip(ts, statuses)
+
+    return iter_paged(_page, page_size, _legacy)
+
+
+def iter_session_attendance_records(contract, sess_id, page_size=CHAIN_PAGE_SIZE):
+    """Yield StudentAttendanceDetail tuples recorded on-chain for a session."""
+    fns = contract.functions
+    return iter_paged(
+        lambda offset, limit: fns.getSessionAttendanceRecordsPage(sess_id, offset, limit).call(),
+        page_size,
+        lambda: fns.getSessionAllAttendanceRecords(sess_id).call(),
+    )
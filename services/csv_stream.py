@@ -0,0 +1,47 @@
+import csv
+import io
+
+from flask import Response, stream_with_context
+
+
+# Rows per server-side cursor round trip, and CSV rows per chunk sent to the client.
+FETCH_SIZE = 2000
+FLUSH_EVERY = 500
+
+
+def iter_csv(header, rows, flush_every=FLUSH_EVERY):
+    """Yield CSV text in chunks: the header straight away, then every ``flush_every`` rows."""
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(header)
+    yield buf.getvalue()
+    buf.seek(0)
+    buf.truncate()
+    for i, row in enumerate(rows, 1):
+        w.writerow(row)
+        if i % flush_every == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def stream_query(get_db_fn, name, sql, params=(), fetch_size=FETCH_SIZE):
+    """
+    Rows of ``sql`` from a named (server-side) cursor, ``fetch_size`` at a
+    time. The connection stays open until the generator is exhausted or closed.
+    """
+    with get_db_fn() as conn:
+        cur = conn.cursor(name)
+        cur.itersize = fetch_size
+        cur.execute(sql, params)
+        yield from cur
+
+
+def csv_response(chunks, filename):
+    return Response(
+        stream_with_context(chunks),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename}'},
+    )
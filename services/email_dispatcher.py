@@ -0,0 +1,209 @@
+import heapq
+import itertools
+import queue
+import threading
+import time
+from collections import deque
+
+
+class RateLimiter:
+    """Token bucket: at most ``rate`` acquisitions per second, bursts up to ``burst``."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, self.rate))
+        self._tokens = self.burst
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class _Job:
+    __slots__ = ('to_addrs', 'subject', 'html_body', 'cfg', 'enqueued_at', 'attempts')
+
+    def __init__(self, to_addrs, subject, html_body, cfg):
+        self.to_addrs = to_addrs
+        self.subject = subject
+        self.html_body = html_body
+        self.cfg = cfg
+        self.enqueued_at = time.monotonic()
+        self.attempts = 0
+
+
+class EmailDispatcher:
+    """
+    Single outgoing-mail dispatcher: a bounded queue drained by a fixed pool
+    of sender threads.
+
+    ``submit`` never blocks the caller — when the queue is full the message is
+    dropped and counted, so a tap or request handler never waits behind an
+    email storm. Each worker takes a token from the provider's rate limiter
+    (``provider_fn(cfg)`` picks the provider, ``rate_limits`` maps provider to
+    messages/sec) and calls ``send_fn(to_addrs, subject, html_body, cfg)``.
+    Failures that ``retry_if(exc)`` accepts are retried with exponential
+    backoff up to ``max_attempts``; retries wait in a small timer heap rather
+    than holding a worker.
+    """
+
+    def __init__(self, *, send_fn, provider_fn=None, retry_if=None, workers=4, max_queue=10000,
+                 rate_limits=None, default_rate=10, max_attempts=3, backoff_seconds=5,
+                 max_backoff_seconds=300):
+        self.send_fn = send_fn
+        self.provider_fn = provider_fn or (lambda cfg: 'default')
+        self.retry_if = retry_if or (lambda exc: True)
+        self.workers = max(1, int(workers))
+        self.max_attempts = max(1, int(max_attempts))
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.rate_limits = dict(rate_limits or {})
+        self.default_rate = default_rate
+        self._queue = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._retry_heap = []
+        self._retry_seq = itertools.count()
+        self._limiters = {}
+        self._guard = threading.Lock()
+        self._threads = []
+        self._submitted = 0
+        self._sent = 0
+        self._failed = 0
+        self._retried = 0
+        self._dropped = 0
+        self._max_depth = 0
+        self._latencies = deque(maxlen=1000)
+        self._sent_by_provider = {}
+
+    # ── Producer side ──────────────────────────────────────────────────────
+    def submit(self, to_addrs, subject, html_body, cfg):
+        """Queue one message; returns False if the queue is full and it was dropped."""
+        self.start()
+        try:
+            self._queue.put_nowait(_Job(list(to_addrs), subject, html_body, cfg))
+        except queue.Full:
+            with self._guard:
+                self._dropped += 1
+            print(f'[EMAIL] Queue full ({self._queue.maxsize}) - dropped "{subject}" to {to_addrs}')
+            return False
+        with self._guard:
+            self._submitted += 1
+            self._max_depth = max(self._max_depth, self._queue.qsize())
+        return True
+
+    # ── Workers ────────────────────────────────────────────────────────────
+    def _limiter(self, provider):
+        with self._guard:
+            lim = self._limiters.get(provider)
+            if lim is None:
+                lim = RateLimiter(self.rate_limits.get(provider, self.default_rate))
+                self._limiters[provider] = lim
+            return lim
+
+    def _next_job(self):
+        """Next due retry if any, else block on the queue until one becomes due."""
+        with self._guard:
+            if self._retry_heap and self._retry_heap[0][0] <= time.monotonic():
+                return heapq.heappop(self._retry_heap)[2]
+            wait = (self._retry_heap[0][0] - time.monotonic()) if self._retry_heap else 1.0
+        try:
+            return self._queue.get(timeout=max(0.05, min(wait, 1.0)))
+        except queue.Empty:
+            return None
+
+    def _schedule_retry(self, job):
+        delay = min(self.backoff_seconds * (2 ** (job.attempts - 1)), self.max_backoff_seconds)
+        with self._guard:
+            heapq.heappush(self._retry_heap, (time.monotonic() + delay, next(self._retry_seq), job))
+            self._retried += 1
+
+    def _provider(self, cfg):
+        try:
+            return self.provider_fn(cfg)
+        except Exception:
+            return 'default'
+
+    def _record_sent(self, provider, enqueued_at):
+        with self._guard:
+            self._sent += 1
+            self._latencies.append(time.monotonic() - enqueued_at)
+            self._sent_by_provider[provider] = self._sent_by_provider.get(provider, 0) + 1
+
+    def send_now(self, to_addrs, subject, html_body, cfg):
+        """
+        Send on the caller's thread under the same rate limit; raises on failure.
+        For callers that already run in the background with their own retry
+        (the post-finalize jobs), so a failed send is not reported as done.
+        """
+        provider = self._provider(cfg)
+        started = time.monotonic()
+        self._limiter(provider).acquire()
+        try:
+            self.send_fn(list(to_addrs), subject, html_body, cfg)
+        except Exception:
+            with self._guard:
+                self._failed += 1
+            raise
+        self._record_sent(provider, started)
+
+    def _run(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                continue
+            provider = self._provider(job.cfg)
+            self._limiter(provider).acquire()
+            job.attempts += 1
+            try:
+                self.send_fn(job.to_addrs, job.subject, job.html_body, job.cfg)
+            except Exception as e:
+                if job.attempts < self.max_attempts and self.retry_if(e):
+                    print(f'[EMAIL] Send of "{job.subject}" failed (attempt {job.attempts}), will retry: {e}')
+                    self._schedule_retry(job)
+                else:
+                    with self._guard:
+                        self._failed += 1
+                    print(f'[EMAIL] Failed to send "{job.subject}": {e}')
+                continue
+            self._record_sent(provider, job.enqueued_at)
+
+    def start(self):
+        if self._threads:
+            return
+        with self._guard:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._run, daemon=True, name=f'davs-email-{i}')
+                t.start()
+                self._threads.append(t)
+
+    def metrics(self):
+        with self._guard:
+            lat = sorted(self._latencies)
+            return {
+                'workers': self.workers,
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'max_depth': self._max_depth,
+                'retry_pending': len(self._retry_heap),
+                'submitted': self._submitted,
+                'sent': self._sent,
+                'failed': self._failed,
+                'retried': self._retried,
+                'dropped': self._dropped,
+                'sent_by_provider': dict(self._sent_by_provider),
+                'rate_limits': {p: lim.rate for p, lim in self._limiters.items()},
+                'latency_avg_s': round(sum(lat) / len(lat), 3) if lat else None,
+                'latency_p95_s': round(lat[min(len(lat) - 1, int(len(lat) * 0.95))], 3) if lat else None,
+            }
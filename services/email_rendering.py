@@ -0,0 +1,151 @@
+import os
+import threading
+from datetime import datetime
+from functools import lru_cache
+
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates')
+
+EMAIL_TEMPLATES = (
+    'emails/attendance_receipt.html',
+    'emails/_attendance_fragments.html',
+    'emails/teacher_session_summary.html',
+    'emails/audit_resolution.html',
+    'emails/excuse_received.html',
+    'emails/excuse_resolved.html',
+    'emails/student_welcome.html',
+    'emails/staff_welcome.html',
+    'emails/password_changed.html',
+)
+
+
+# ── Formatting filters (memoized: the same few timestamps repeat per session) ──
+@lru_cache(maxsize=4096)
+def fmt_email_time(t_str):
+    """Format time string (e.g. '07:30:00' or '2024-04-26 07:30:00') to '7:30am'."""
+    if not t_str or t_str == '—': return '—'
+    try:
+        t_str = str(t_str)
+        if ' ' in t_str:
+            # Handle full ISO format
+            dt = datetime.strptime(t_str, '%Y-%m-%d %H:%M:%S')
+        elif ':' in t_str:
+            # Handle HH:MM:SS or HH:MM
+            parts = t_str.split(':')
+            if len(parts) == 3:
+                dt = datetime.strptime(t_str, '%H:%M:%S')
+            else:
+                dt = datetime.strptime(t_str, '%H:%M')
+        else:
+            return t_str
+        # Format as 7:00am (lowercase, no leading zero on hour)
+        return dt.strftime('%I:%M%p').lower().lstrip('0')
+    except:
+        return str(t_str)
+
+
+@lru_cache(maxsize=4096)
+def fmt_email_date(d_str):
+    """Format date string '2024-04-26 07:30:00' to 'April 26 2024'."""
+    if not d_str or d_str == '—': return '—'
+    try:
+        if ' ' in str(d_str):
+            dt = datetime.strptime(str(d_str).split(' ')[0], '%Y-%m-%d')
+        else:
+            dt = datetime.strptime(str(d_str), '%Y-%m-%d')
+        return dt.strftime('%B %d %Y')
+    except:
+        return str(d_str)
+
+
+def fmt_email_dt(dt_str):
+    """Format to 'April 26 2024, 7:00am'."""
+    if not dt_str or dt_str == '—': return '—'
+    return f"{fmt_email_date(dt_str)}, {fmt_email_time(dt_str)}"
+
+
+@lru_cache(maxsize=1024)
+def fmt_email_slot(slot):
+    """Format '07:00 - 09:00' or '07:00 to 09:00' to '7:00am to 9:00am'."""
+    if not slot: return '—'
+    slot_str = str(slot)
+
+    # Try different delimiters
+    delimiter = None
+    if ' - ' in slot_str:
+        delimiter = ' - '
+    elif ' to ' in slot_str:
+        delimiter = ' to '
+
+    if not delimiter: return slot_str
+
+    try:
+        parts = slot_str.split(delimiter)
+        if len(parts) == 2:
+            return f"{fmt_email_time(parts[0].strip())} to {fmt_email_time(parts[1].strip())}"
+        return slot_str
+    except:
+        return slot_str
+
+
+@lru_cache(maxsize=1024)
+def fmt_email_long_date(dt_str):
+    """'2024-04-26 07:30:00' -> 'April 26, 2024'; '-' when empty."""
+    if not dt_str:
+        return '-'
+    try:
+        return datetime.strptime(dt_str, '%Y-%m-%d %H:%M:%S').strftime('%B %d, %Y')
+    except:
+        return dt_str
+
+
+EMAIL_FILTERS = {
+    'email_time': fmt_email_time,
+    'email_date': fmt_email_date,
+    'email_dt': fmt_email_dt,
+    'email_slot': fmt_email_slot,
+    'email_long_date': fmt_email_long_date,
+}
+
+
+# ── Compiled templates ─────────────────────────────────────────────────────
+_COMPILED = {}
+_COMPILED_LOCK = threading.Lock()
+
+
+def init_email_templates(jinja_env):
+    """
+    Register the email filters on ``jinja_env`` (the Flask app's environment)
+    and compile every email template once; renders use the kept Template
+    objects, so no loader or auto-reload check runs per message.
+    """
+    jinja_env.filters.update(EMAIL_FILTERS)
+    compiled = {name: jinja_env.get_template(name) for name in EMAIL_TEMPLATES}
+    with _COMPILED_LOCK:
+        _COMPILED.clear()
+        _COMPILED.update(compiled)
+
+
+def _standalone_env():
+    # Scripts and workers that never build the Flask app get an equivalent
+    # environment (same folder, autoescaping for .html).
+    from jinja2 import Environment, FileSystemLoader, select_autoescape
+    return Environment(loader=FileSystemLoader(TEMPLATE_DIR), autoescape=select_autoescape(['html']))
+
+
+def email_template(name):
+    template = _COMPILED.get(name)
+    if template is None:
+        if not _COMPILED:
+            init_email_templates(_standalone_env())
+        template = _COMPILED[name]
+    return template
+
+
+def render_email(name, **context):
+    return email_template(name).render(**context)
+
+
+def email_macros(name):
+    """Macros of a fragment template, callable from Python; each returns Markup."""
+    return email_template(name).module
@@ -1,183 +1,257 @@
+import os
+import smtplib
+import threading
+import time
+import uuid
+
+from services.email_dispatcher import EmailDispatcher
+from services.http_email_api import HTTPEmailAPIError, get_http_email_client, http_api_provider
+from services.smtp_pool import get_smtp_pool
+
+
+_EMAIL_CONFIG_DEFAULTS = {
+    'smtp_host': 'smtp.gmail.com',
+    'smtp_port': '587',
+    'smtp_user': '',
+    'smtp_password': '',
+    'smtp_from': '',
+    'enabled': '0',
+}
+
+# Row in email_config bumped on every save; other worker processes compare it
+# to decide whether their cached copy is stale.
+CONFIG_VERSION_KEY = 'config_version'
+
+
+def _load_email_config(get_db_fn):
+    with get_db_fn() as conn:
+        rows = conn.execute('SELECT key, value FROM email_config').fetchall()
+    cfg = dict(_EMAIL_CONFIG_DEFAULTS)
+    version = ''
+    for row in rows:
+        if row['key'] == CONFIG_VERSION_KEY:
+            version = row['value']
+        else:
+            cfg[row['key']] = row['value']
+    return cfg, version
+
+
+def _email_config_version(get_db_fn):
+    with get_db_fn() as conn:
+        row = conn.execute('SELECT value FROM email_config WHERE key=?', (CONFIG_VERSION_KEY,)).fetchone()
+    return row['value'] if row else ''
+
+
+class EmailConfigCache:
+    """
+    Process-local copy of the email_config table.
+
+    Reads are served from memory. ``save_email_config`` drops the copy in the
+    saving process and bumps the ``config_version`` row; other worker
+    processes compare that one row at most every ``check_seconds`` and reload
+    the table only when it changed.
+    """
+
+    def __init__(self, *, get_db_fn, check_seconds=30):
+        self.get_db_fn = get_db_fn
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._cfg = None
+        self._version = None
+        self._checked = 0.0
+        self.loads = 0
+        self.version_checks = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._cfg = None
+
+    def get(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._cfg is not None and now - self._checked < self.check_seconds:
+                return dict(self._cfg)
+            try:
+                if self._cfg is not None:
+                    self.version_checks += 1
+                    if _email_config_version(self.get_db_fn) == self._version:
+                        self._checked = now
+                        return dict(self._cfg)
+                self._cfg, self._version = _load_email_config(self.get_db_fn)
+                self.loads += 1
+                self._checked = now
+            except Exception:
+                if self._cfg is None:
+                    return dict(_EMAIL_CONFIG_DEFAULTS)
+            return dict(self._cfg)
+
+    def status(self):
+        with self._lock:
+            return {
+                'cached': self._cfg is not None,
+                'version': self._version,
+                'loads': self.loads,
+                'version_checks': self.version_checks,
+                'check_seconds': self.check_seconds,
+            }
+
+
+_CONFIG_CACHE = None
+_CONFIG_CACHE_LOCK = threading.Lock()
+
+
+def _email_config_cache(get_db_fn):
+    global _CONFIG_CACHE
+    with _CONFIG_CACHE_LOCK:
+        if _CONFIG_CACHE is None or _CONFIG_CACHE.get_db_fn is not get_db_fn:
+            _CONFIG_CACHE = EmailConfigCache(
+                get_db_fn=get_db_fn,
+                check_seconds=float(os.getenv('EMAIL_CONFIG_CHECK_SECONDS', '30') or 30),
+            )
+        return _CONFIG_CACHE
+
+
 def get_email_config(get_db_fn):
-    """Load SMTP config from DB. Returns dict with all keys."""
-    defaults = {
-        'smtp_host': 'smtp.gmail.com',
-        'smtp_port': '587',
-        'smtp_user': '',
-        'smtp_password': '',
-        'smtp_from': '',
-        'enabled': '0',
-    }
-    try:
-        with get_db_fn() as conn:
-            rows = conn.execute('SELECT key, value FROM email_config').fetchall()
-            cfg = dict(defaults)
-            for row in rows:
-                cfg[row['key']] = row['value']
-            return cfg
-    except Exception:
-        return defaults
+    """SMTP config (dict with all keys), served from the in-process cache."""
+    return _email_config_cache(get_db_fn).get()
+
+
+def email_config_cache_status():
+    with _CONFIG_CACHE_LOCK:
+        cache = _CONFIG_CACHE
+    return cache.status() if cache else None
 
 
 def save_email_config(cfg: dict, get_db_fn):
-    """Upsert email config into DB."""
+    """Upsert email config into DB and bump its version so every worker reloads it."""
     with get_db_fn() as conn:
         for key, value in cfg.items():
+            if key == CONFIG_VERSION_KEY:
+                continue
             conn.execute(
                 'INSERT INTO email_config (key, value) VALUES (?, ?) '
                 'ON CONFLICT(key) DO UPDATE SET value=excluded.value',
                 (key, str(value)),
             )
+        conn.execute(
+            'INSERT INTO email_config (key, value) VALUES (?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET value=excluded.value',
+            (CONFIG_VERSION_KEY, uuid.uuid4().hex),
+        )
+    _email_config_cache(get_db_fn).invalidate()
 
 
-def send_email_async(to_addrs: list, subject: str, html_body: str, cfg: dict):
-    """Send an HTML email via SMTP in a background thread."""
-    import threading as _th
+def send_email_now(to_addrs: list, subject: str, html_body: str, cfg: dict):
+    """Send an HTML email synchronously (HTTP API or pooled SMTP); raises on failure."""
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
 
-    def _worker():
+    if cfg.get('enabled') != '1':
+        return
+    if not cfg.get('smtp_user') or not cfg.get('smtp_password'):
+        print('[EMAIL] SMTP credentials not configured - skipping.')
+        return
+    recipients = [a for a in to_addrs if a and '@' in a]
+    if not recipients:
+        return
+
+    # ── SENDGRID / BREVO HTTP API BYPASS ──
+    # Only trigger if host is explicitly SendGrid or Brevo; other services that use
+    # 'apikey' as a username still expect standard SMTP. Useful for Railway/Heroku
+    # where SMTP ports (587/465) are often blocked. The client keeps one
+    # keep-alive HTTPS session for all sends (see services/http_email_api.py).
+    api_client = get_http_email_client(cfg)
+    if api_client is not None:
+        provider = 'Brevo' if api_client.provider == 'brevo' else 'SendGrid'
         try:
-            import smtplib
-            import ssl
-            import socket
-            from email.mime.multipart import MIMEMultipart
-            from email.mime.text import MIMEText
-
-            if cfg.get('enabled') != '1':
-                return
-            if not cfg.get('smtp_user') or not cfg.get('smtp_password'):
-                print('[EMAIL] SMTP credentials not configured - skipping.')
-                return
-            recipients = [a for a in to_addrs if a and '@' in a]
-            if not recipients:
-                return
-
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = subject
-            msg['From'] = cfg.get('smtp_from') or cfg['smtp_user']
-            msg['To'] = ', '.join(recipients)
-            msg.attach(MIMEText(html_body, 'html'))
-
-            # ── HELPERS ──
-            def _extract_email(s):
-                import re
-                if not s: return None
-                match = re.search(r'[\w\.-]+@[\w\.-]+\.\w+', s)
-                return match.group(0) if match else s
-
-            host = cfg.get('smtp_host', '').lower().strip()
-            
-            # ── SENDGRID HTTP API BYPASS ──
-            # Only trigger if host is explicitly SendGrid to avoid intercepting other services (like Brevo)
-            # that might also use 'apikey' as a username but expect standard SMTP.
-            if 'sendgrid.net' in host:
-                import urllib.request
-                import json
-                
-                url = "https://api.sendgrid.com/v3/mail/send"
-                api_key = cfg['smtp_password'].strip()
-                headers = {
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                    "Accept": "application/json"
-                }
-                
-                # SendGrid API REQUIRES a valid email in the 'from' field. 
-                # If smtp_from is empty, we must NOT use 'apikey' as the email.
-                sender_email = _extract_email(cfg.get('smtp_from')) or ''
-                if not sender_email or '@' not in sender_email:
-                    u_email = _extract_email(cfg.get('smtp_user'))
-                    if u_email and '@' in u_email:
-                        sender_email = u_email
-                    else:
-                        sender_email = "no-reply@davs-attendance.com"
-                
-                personalizations = [{"to": [{"email": r}]} for r in recipients]
-                data = {
-                    "personalizations": personalizations,
-                    "from": {"email": sender_email},
-                    "subject": subject,
-                    "content": [{"type": "text/html", "value": html_body}]
-                }
-                
-                req = urllib.request.Request(url, data=json.dumps(data).encode('utf-8'), headers=headers)
-                try:
-                    urllib.request.urlopen(req, timeout=10)
-                    print(f'[EMAIL] Sent "{subject}" to {recipients} via SendGrid API')
-                except urllib.error.HTTPError as he:
-                    err_body = he.read().decode('utf-8')
-                    print(f'[EMAIL] SendGrid API Error {he.code}: {err_body}')
-                    raise
-                return
-
-            # ── BREVO (SENDINBLUE) HTTP API BYPASS ──
-            # Useful for Railway/Heroku where SMTP ports (587/465) are often blocked.
-            if 'brevo.com' in host or 'sendinblue.com' in host:
-                import urllib.request
-                import json
-                
-                url = "https://api.brevo.com/v3/smtp/email"
-                api_key = cfg['smtp_password'].strip()
-                headers = {
-                    "api-key": api_key,
-                    "Content-Type": "application/json",
-                    "Accept": "application/json"
-                }
-                
-                sender_email = _extract_email(cfg.get('smtp_from')) or ''
-                if not sender_email or '@' not in sender_email:
-                    u_email = _extract_email(cfg.get('smtp_user'))
-                    sender_email = u_email if (u_email and '@' in u_email) else "no-reply@brevo.com"
-                
-                data = {
-                    "sender": {"email": sender_email},
-                    "to": [{"email": r} for r in recipients],
-                    "subject": subject,
-                    "htmlContent": html_body
-                }
-                
-                req = urllib.request.Request(url, data=json.dumps(data).encode('utf-8'), headers=headers)
-                try:
-                    urllib.request.urlopen(req, timeout=10)
-                    print(f'[EMAIL] Sent "{subject}" to {recipients} via Brevo API')
-                except urllib.error.HTTPError as he:
-                    err_body = he.read().decode('utf-8')
-                    print(f'[EMAIL] Brevo API Error {he.code}: {err_body}')
-                    raise
-                return
-
-            # ── STANDARD SMTP ROUTE ──
-            ctx = ssl.create_default_context()
-            port = int(cfg.get('smtp_port', 587))
-            timeout = 5
+            api_client.send(recipients, subject, html_body)
+            print(f'[EMAIL] Sent "{subject}" to {recipients} via {provider} API')
+        except HTTPEmailAPIError as he:
+            print(f'[EMAIL] {provider} API Error {he.status}: {he.body}')
+            raise
+        return
 
-            try:
-                addr_info = socket.getaddrinfo(host, port, socket.AF_INET, socket.SOCK_STREAM)
-                target_ip = addr_info[0][4][0]
-            except:
-                target_ip = host
-
-            if port == 465:
-                try:
-                    srv = smtplib.SMTP_SSL(host, port, context=ctx, timeout=timeout)
-                except:
-                    srv = smtplib.SMTP_SSL(target_ip, port, context=ctx, timeout=timeout)
-            else:
-                try:
-                    srv = smtplib.SMTP(host, port, timeout=timeout)
-                except:
-                    srv = smtplib.SMTP(target_ip, port, timeout=timeout)
-                
-                srv.ehlo()
-                if srv.has_ext('STARTTLS'):
-                    srv.starttls(context=ctx)
-                    srv.ehlo()
-
-            with srv:
-                srv.login(cfg['smtp_user'], cfg['smtp_password'])
-                srv.sendmail(msg['From'], recipients, msg.as_string())
-            print(f'[EMAIL] Sent "{subject}" to {recipients}')
-        except Exception as _e:
-            print(f'[EMAIL] Failed to send "{subject}": {_e}')
-
-
-    _th.Thread(target=_worker, daemon=True).start()
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = cfg.get('smtp_from') or cfg['smtp_user']
+    msg['To'] = ', '.join(recipients)
+    msg.attach(MIMEText(html_body, 'html'))
+
+    # ── STANDARD SMTP ROUTE ──
+    # Reuses pooled, already-authenticated connections (see services/smtp_pool.py).
+    get_smtp_pool(cfg).send(msg['From'], recipients, msg.as_string())
+    print(f'[EMAIL] Sent "{subject}" to {recipients}')
+
+
+def _email_provider(cfg):
+    return http_api_provider(cfg) or 'smtp'
+
+
+def _is_retryable_email_error(exc):
+    """Transient failures are retried; rejected addresses / bad requests are not."""
+    if isinstance(exc, (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused)):
+        return False
+    if isinstance(exc, smtplib.SMTPResponseException) and 500 <= exc.smtp_code < 600:
+        return False
+    if isinstance(exc, HTTPEmailAPIError):
+        return exc.status == 429 or exc.status >= 500
+    return True
+
+
+_DISPATCHER = None
+_DISPATCHER_LOCK = threading.Lock()
+
+
+def get_email_dispatcher():
+    """Process-wide dispatcher; sizes and per-provider rates come from the environment."""
+    global _DISPATCHER
+    with _DISPATCHER_LOCK:
+        if _DISPATCHER is None:
+            _DISPATCHER = EmailDispatcher(
+                send_fn=send_email_now,
+                provider_fn=_email_provider,
+                retry_if=_is_retryable_email_error,
+                workers=int(os.getenv('EMAIL_WORKERS', '4') or 4),
+                max_queue=int(os.getenv('EMAIL_QUEUE_SIZE', '10000') or 10000),
+                rate_limits={
+                    'smtp': float(os.getenv('EMAIL_RATE_SMTP', '10') or 10),
+                    'sendgrid': float(os.getenv('EMAIL_RATE_SENDGRID', '100') or 100),
+                    'brevo': float(os.getenv('EMAIL_RATE_BREVO', '50') or 50),
+                },
+                max_attempts=int(os.getenv('EMAIL_MAX_ATTEMPTS', '3') or 3),
+            )
+        return _DISPATCHER
+
+
+def send_email_async(to_addrs: list, subject: str, html_body: str, cfg: dict):
+    """Queue an HTML email on the shared dispatcher; never blocks the caller."""
+    get_email_dispatcher().submit(to_addrs, subject, html_body, cfg)
+
+
+def send_email_sync(to_addrs: list, subject: str, html_body: str, cfg: dict):
+    """Send now on the calling thread (rate limited); raises so the caller can retry."""
+    get_email_dispatcher().send_now(to_addrs, subject, html_body, cfg)
+
+
+def email_dispatcher_metrics():
+    with _DISPATCHER_LOCK:
+        dispatcher = _DISPATCHER
+    return dispatcher.metrics() if dispatcher else None
+
+
+def send_email_bulk(subject: str, html_template: str, recipients: list, cfg: dict):
+    """
+    Synchronously send one templated email to many recipients through the
+    SendGrid/Brevo bulk API. ``recipients`` is a list of (email, substitutions).
+    Returns per-recipient errors (None = sent), or None when the configured
+    provider has no bulk API and the caller should send per message instead.
+    """
+    if cfg.get('enabled') != '1' or not cfg.get('smtp_user') or not cfg.get('smtp_password'):
+        return None
+    api_client = get_http_email_client(cfg)
+    if api_client is None:
+        return None
+    errors = api_client.send_bulk(subject, html_template, recipients)
+    sent = sum(1 for e in errors if not e)
+    print(f'[EMAIL] Sent "{subject}" to {sent}/{len(recipients)} recipients via {api_client.provider} bulk API')
+    return errors
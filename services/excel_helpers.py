@@ -1,6 +1,79 @@
+import os
+import tempfile
+
+from flask import send_file
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class WriteOnlySheet:
+    """
+    Worksheet-like front for an openpyxl write-only worksheet. ``cell()``,
+    ``merge_cells()`` and ``ws['A1']`` work as usual, but cells are buffered
+    per row and appended in row order by ``flush(upto)``; a flushed row can no
+    longer be touched. ``data_row`` flushes everything above the row it
+    writes, so a long detail sheet keeps only the current row in memory.
+    """
+
+    def __init__(self, ws):
+        self.ws = ws
+        self._rows = {}
+        self._written = 0
+        self._new_cell = __import__('openpyxl.cell', fromlist=['WriteOnlyCell']).WriteOnlyCell
+        self._to_tuple = __import__('openpyxl.utils', fromlist=['coordinate_to_tuple']).coordinate_to_tuple
+        self._cell_range = __import__('openpyxl.worksheet.cell_range', fromlist=['CellRange']).CellRange
+
+    def __getattr__(self, name):
+        return getattr(self.ws, name)
+
+    @property
+    def freeze_panes(self):
+        return self.ws.freeze_panes
+
+    @freeze_panes.setter
+    def freeze_panes(self, ref):
+        # The sheet view goes out with the first row.
+        if self._written:
+            raise ValueError(f'{self.ws.title}: set freeze_panes before writing rows')
+        self.ws.freeze_panes = ref
+
+    def cell(self, row, column, value=None):
+        if row <= self._written:
+            raise ValueError(f'{self.ws.title}: row {row} has already been written')
+        cells = self._rows.setdefault(row, {})
+        c = cells.get(column)
+        if c is None:
+            c = cells[column] = self._new_cell(self.ws)
+        if value is not None:
+            c.value = value
+        return c
+
+    def __getitem__(self, ref):
+        row, column = self._to_tuple(ref)
+        return self.cell(row=row, column=column)
+
+    def __setitem__(self, ref, value):
+        self[ref].value = value
+
+    def merge_cells(self, range_string=None, start_row=None, start_column=None, end_row=None, end_column=None):
+        self.ws.merged_cells.add(self._cell_range(
+            range_string, min_col=start_column, min_row=start_row, max_col=end_column, max_row=end_row
+        ))
+
+    def flush(self, upto=None):
+        last = max(self._rows, default=self._written) if upto is None else upto
+        for r in range(self._written + 1, last + 1):
+            cells = self._rows.pop(r, {})
+            self.ws.append([cells.get(ci) for ci in range(1, max(cells, default=0) + 1)])
+            # Written with the row; dropping it keeps memory flat on long sheets.
+            self.ws.row_dimensions.pop(r, None)
+        self._written = max(self._written, last)
+
+
 def xl_helpers():
     """Return a dict of reusable Excel style helpers."""
-    _ox_styles = __import__('openpyxl.styles', fromlist=['Alignment', 'Border', 'Font', 'PatternFill', 'Side'])
+    _ox = __import__('openpyxl')
+    _ox_styles = __import__('openpyxl.styles', fromlist=['Alignment', 'Border', 'Font', 'NamedStyle', 'PatternFill', 'Side'])
     _ox_utils = __import__('openpyxl.utils', fromlist=['get_column_letter'])
     _ox_chart = __import__('openpyxl.chart', fromlist=['BarChart', 'PieChart', 'Reference'])
     _ox_chart_series = __import__('openpyxl.chart.series', fromlist=['SeriesLabel'])
@@ -9,6 +82,7 @@ def xl_helpers():
     Font = _ox_styles.Font
     PatternFill = _ox_styles.PatternFill
     Side = _ox_styles.Side
+    NamedStyle = _ox_styles.NamedStyle
     get_column_letter = _ox_utils.get_column_letter
     BarChart = _ox_chart.BarChart
     PieChart = _ox_chart.PieChart
@@ -60,36 +134,57 @@ def xl_helpers():
             c.border = thin_border()
         ws.row_dimensions[row_num].height = 22
 
+    status_colors = {
+        'Present': C['present'],
+        'Late': C['late'],
+        'Absent': C['absent'],
+        'Excused': C['excused'],
+    }
+    named_styles = {}
+
+    def _cell_style(kind, alt):
+        if kind.startswith('status_'):
+            font = Font(name='Calibri', size=10, bold=True, color=status_colors.get(kind[7:], '111111'))
+            align = ctr()
+        elif kind == 'tx':
+            font = Font(name='Courier New', size=8, color=C['muted'])
+            align = lft()
+        else:
+            font = normal_font()
+            align = lft() if kind == 'text' else ctr()
+        return NamedStyle(
+            name=f"davs_{kind}{'_alt' if alt else ''}",
+            font=font,
+            fill=fill(C['row_alt'] if alt else C['row_def']),
+            border=thin_border(),
+            alignment=align,
+        )
+
+    def named_style(wb, kind, alt=False):
+        """Name of a data-cell style, registered on ``wb`` the first time it is used."""
+        key = (id(wb), kind, alt)
+        name = named_styles.get(key)
+        if name is None:
+            style = _cell_style(kind, alt)
+            if style.name not in wb.style_names:
+                wb.add_named_style(style)
+            name = named_styles[key] = style.name
+        return name
+
     def data_row(ws, row_num, values, alt=False, col_formats=None):
-        rf = fill(C['row_alt'] if alt else C['row_def'])
+        if isinstance(ws, WriteOnlySheet):
+            ws.flush(row_num - 1)
+        wb = ws.parent
         for ci, val in enumerate(values, 1):
-            c = ws.cell(row=row_num, column=ci, value=val)
-            c.border = thin_border()
             cf = (col_formats or {}).get(ci)
             if cf and cf[0] == 'status':
-                status = val
-                status_colors = {
-                    'Present': C['present'],
-                    'Late': C['late'],
-                    'Absent': C['absent'],
-                    'Excused': C['excused'],
-                }
-                fg = status_colors.get(status, '111111')
-                c.font = Font(name='Calibri', size=10, bold=True, color=fg)
-                c.fill = rf
-                c.alignment = ctr()
-            elif cf and cf[0] == 'tx':
-                c.font = Font(name='Courier New', size=8, color=C['muted'])
-                c.fill = rf
-                c.alignment = lft()
-            elif cf and cf[0] == 'num':
-                c.font = normal_font()
-                c.fill = rf
-                c.alignment = ctr()
+                kind = 'status_' + (val if val in status_colors else 'other')
+            elif cf and cf[0] in ('tx', 'num'):
+                kind = cf[0]
             else:
-                c.font = normal_font()
-                c.fill = rf
-                c.alignment = lft() if ci <= 3 else ctr()
+                kind = 'text' if ci <= 3 else 'num'
+            c = ws.cell(row=row_num, column=ci, value=val)
+            c.style = named_style(wb, kind, alt)
         ws.row_dimensions[row_num].height = 17
 
     def title_block(ws, title, subtitle_lines, n_cols):
@@ -228,6 +323,40 @@ def xl_helpers():
         chart.set_categories(labels)
         chart_ws.add_chart(chart, chart_anchor)
 
+    sheets = []
+
+    def workbook():
+        """A write-only workbook; add sheets with ``sheet(wb, title)``."""
+        return _ox.Workbook(write_only=True)
+
+    def sheet(wb, title):
+        ws = WriteOnlySheet(wb.create_sheet(title))
+        sheets.append(ws)
+        return ws
+
+    def send_workbook(wb, filename):
+        """Save ``wb`` to a temp file and send it; the file is removed once the response closes."""
+        for ws in sheets:
+            if ws.parent is wb:
+                ws.flush()
+        fd, path = tempfile.mkstemp(prefix='davs_', suffix='.xlsx')
+        os.close(fd)
+        try:
+            wb.save(path)
+            resp = send_file(path, mimetype=XLSX_MIMETYPE, as_attachment=True, download_name=filename)
+        except Exception:
+            os.remove(path)
+            raise
+
+        def _remove():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+        resp.call_on_close(_remove)
+        return resp
+
     return dict(
         C=C,
         fill=fill,
@@ -245,4 +374,8 @@ def xl_helpers():
         totals_row=totals_row,
         add_bar_chart=add_bar_chart,
         add_pie_chart=add_pie_chart,
+        named_style=named_style,
+        workbook=workbook,
+        sheet=sheet,
+        send_workbook=send_workbook,
     )
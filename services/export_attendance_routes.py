@@ -1,5 +1,4 @@
 from datetime import datetime, timedelta
-import io
 import traceback
 import json
 
@@ -109,10 +108,8 @@ def export_student_sessions_impl(
 ):
     """Export one student's full attendance history with blockchain proof."""
     try:
-        _ox = __import__('openpyxl')
         _ox_chart = __import__('openpyxl.chart', fromlist=['BarChart', 'PieChart', 'Reference'])
         _ox_styles = __import__('openpyxl.styles', fromlist=['Font', 'PatternFill', 'Alignment'])
-        Workbook = _ox.Workbook
         BarChart = _ox_chart.BarChart
         PieChart = _ox_chart.PieChart
         Reference = _ox_chart.Reference
@@ -227,9 +224,8 @@ def export_student_sessions_impl(
 
         H = xl_helpers_fn()
         C = H['C']
-        wb = Workbook()
-        ws = wb.active
-        ws.title = 'Attendance Log'
+        wb = H['workbook']()
+        ws = H['sheet'](wb, 'Attendance Log')
         prog = student.get('course', '') if student else ''
         yr = student.get('year_level', '') if student else ''
         sec = student.get('section', '') if student else ''
@@ -364,7 +360,7 @@ def export_student_sessions_impl(
             value=f'Generated by DAVS on {now.strftime("%B %d, %Y %I:%M %p")}',
         ).font = __import__('openpyxl').styles.Font(name='Calibri', size=9, italic=True, color='94A3B8')
 
-        wc = wb.create_sheet('Charts')
+        wc = H['sheet'](wb, 'Charts')
         wc.sheet_view.showGridLines = False
         wc.merge_cells('A1:N1')
         wc['A1'] = f'Attendance Summary — {stud_name}'
@@ -415,14 +411,7 @@ def export_student_sessions_impl(
 
         name_slug = stud_name.replace(' ', '_')
         fname = request.args.get('filename') or f"{name_slug}_Attendance_Record_{now.strftime('%Y-%m-%d')}.xlsx"
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
-        return Response(
-            output.getvalue(),
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            headers={'Content-Disposition': f'attachment;filename="{fname}"'},
-        )
+        return H['send_workbook'](wb, fname)
     except Exception:
         return Response(f'Export error: {traceback.format_exc()}', status=500, mimetype='text/plain')
 
@@ -438,20 +427,18 @@ def export_session_attendance_impl(
     db_get_session_attendance_fn,
     get_db_fn,
     xl_helpers_fn,
+    db_get_session_roster_fn=None,
 ):
     """Export one classroom session — attendance list with blockchain proof + charts."""
     try:
-        _ox = __import__('openpyxl')
         _ox_chart = __import__('openpyxl.chart', fromlist=['BarChart', 'PieChart', 'Reference'])
         _ox_styles = __import__('openpyxl.styles', fromlist=['Font', 'PatternFill', 'Alignment'])
-        Workbook = _ox.Workbook
         BarChart = _ox_chart.BarChart
         PieChart = _ox_chart.PieChart
         Reference = _ox_chart.Reference
         XFont = _ox_styles.Font
         XFill = _ox_styles.PatternFill
         XAlign = _ox_styles.Alignment
-        import io as _io
 
         sess = load_session_fn(sess_id)
         if not sess:
@@ -508,8 +495,12 @@ def export_session_attendance_impl(
                                 section_keys.add(skn)
                     except Exception:
                         pass
-        all_students = get_all_students_fn()
-        if is_school_event:
+        roster = db_get_session_roster_fn(sess_id) if db_get_session_roster_fn else None
+        all_students = get_all_students_fn() if roster is None else None
+        if roster is not None:
+            # Snapshot taken when the session started.
+            enrolled = sorted(roster, key=lambda x: x['name'])
+        elif is_school_event:
             enrolled = sorted(
                 [s for s in all_students if build_student_section_key_fn(s) in section_keys],
                 key=lambda x: x['name'],
@@ -534,10 +525,13 @@ def export_session_attendance_impl(
 
         tapped_nfc_ids = present_ids | late_ids | excused_ids
         existing_nfc_ids = {s['nfcId'] for s in enrolled}
-        for s in all_students:
-            if s['nfcId'] in tapped_nfc_ids and s['nfcId'] not in existing_nfc_ids:
-                enrolled.append(s)
-                existing_nfc_ids.add(s['nfcId'])
+        if tapped_nfc_ids - existing_nfc_ids:
+            if all_students is None:
+                all_students = get_all_students_fn()
+            for s in all_students:
+                if s['nfcId'] in tapped_nfc_ids and s['nfcId'] not in existing_nfc_ids:
+                    enrolled.append(s)
+                    existing_nfc_ids.add(s['nfcId'])
 
         excuse_details = {}
         with get_db_fn() as _conn:
@@ -626,9 +620,8 @@ def export_session_attendance_impl(
 
         H = xl_helpers_fn()
         C = H['C']
-        wb = Workbook()
-        ws = wb.active
-        ws.title = 'Attendance'
+        wb = H['workbook']()
+        ws = H['sheet'](wb, 'Attendance')
         subj = sess.get('subject_name', '')
         code = sess.get('course_code', '')
         sec = section_key.replace('|', ' · ')
@@ -715,7 +708,7 @@ def export_session_attendance_impl(
             value=f'Generated by DAVS on {now.strftime("%B %d, %Y %I:%M %p")}',
         ).font = XFont(name='Calibri', size=9, italic=True, color='94A3B8')
 
-        wc = wb.create_sheet('Charts')
+        wc = H['sheet'](wb, 'Charts')
         wc.sheet_view.showGridLines = False
         wc.merge_cells('A1:N1')
         wc['A1'] = f'Attendance Charts — {subj} {"["+code+"]" if code else ""}'
@@ -775,13 +768,6 @@ def export_session_attendance_impl(
         date_str = (started or '')[:10]
         code_part = f'_{code}' if code else ''
         fname = request.args.get('filename') or f"Session_Attendance{code_part}_{sec_last}_{date_str}.xlsx"
-        output = _io.BytesIO()
-        wb.save(output)
-        output.seek(0)
-        return Response(
-            output.getvalue(),
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            headers={'Content-Disposition': f'attachment;filename="{fname}"'},
-        )
+        return H['send_workbook'](wb, fname)
     except Exception:
         return Response(f'Export error: {traceback.format_exc()}', status=500, mimetype='text/plain')
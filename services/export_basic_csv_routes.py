@@ -5,6 +5,8 @@ import re
 
 from flask import Response
 
+from services.csv_stream import csv_response, iter_csv
+
 
 def _parse_dt(value):
     if not value:
@@ -71,6 +73,38 @@ def _normalize_time_slot(value):
     return _normalize_time_token(parts[0])
 
 
+_STUDENT_CSV_HEADER = [
+    'Name',
+    'NFC ID',
+    'Student ID',
+    'Course',
+    'Year',
+    'Section',
+    'Course Code',
+    'Subject Name',
+    'Instructor Name',
+    'Date',
+    'Time Slot',
+    'Transaction Number (TX)',
+    'Block Number',
+    'Status',
+    'Excused Reason',
+    'Document',
+]
+_EMPTY_ROW = {
+    'code': '—',
+    'subject': '—',
+    'teacher': '—',
+    'date': '—',
+    'time_slot': '—',
+    'tx_hash': '—',
+    'block': '—',
+    'status': '—',
+    'excuse': '—',
+    'document': '—',
+}
+
+
 def _fallback_rows(nfc_id, get_attendance_records_fn):
     rows = []
     for ts, is_present in (get_attendance_records_fn(nfc_id) or []):
@@ -91,94 +125,74 @@ def _fallback_rows(nfc_id, get_attendance_records_fn):
     return rows
 
 
+def _format_session_row(row):
+    return {
+        'code': row.get('code') or '—',
+        'subject': row.get('subject') or '—',
+        'teacher': row.get('teacher') or '—',
+        'date': _fmt_date_dash(row.get('date') or row.get('started_at') or row.get('tap_time') or ''),
+        'time_slot': _normalize_time_slot(row.get('time_slot') or ''),
+        'tx_hash': row.get('tx_hash') or '—',
+        'block': str(row.get('block')) if row.get('block') not in (None, '') else '—',
+        'status': (row.get('status') or '—').capitalize(),
+        'excuse': row.get('excuse') or '—',
+        'document': row.get('document') or '—',
+    }
+
+
 def _normalize_rows(nfc_id, get_student_session_rows_fn, get_attendance_records_fn):
     if get_student_session_rows_fn:
-        raw_rows = get_student_session_rows_fn(nfc_id) or []
-        rows = []
-        for row in raw_rows:
-            rows.append(
-                {
-                    'code': row.get('code') or '—',
-                    'subject': row.get('subject') or '—',
-                    'teacher': row.get('teacher') or '—',
-                    'date': _fmt_date_dash(row.get('date') or row.get('started_at') or row.get('tap_time') or ''),
-                    'time_slot': _normalize_time_slot(row.get('time_slot') or ''),
-                    'tx_hash': row.get('tx_hash') or '—',
-                    'block': str(row.get('block')) if row.get('block') not in (None, '') else '—',
-                    'status': (row.get('status') or '—').capitalize(),
-                    'excuse': row.get('excuse') or '—',
-                    'document': row.get('document') or '—',
-                }
-            )
+        rows = [_format_session_row(row) for row in get_student_session_rows_fn(nfc_id) or []]
         if rows:
             return rows
     return _fallback_rows(nfc_id, get_attendance_records_fn)
 
 
-def export_csv_all_impl(*, get_all_students_fn, get_attendance_records_fn, get_student_session_rows_fn=None):
-    out = io.StringIO()
-    w = csv.writer(out)
-    w.writerow(
-        [
-            'Name',
-            'NFC ID',
-            'Student ID',
-            'Course',
-            'Year',
-            'Section',
-            'Course Code',
-            'Subject Name',
-            'Instructor Name',
-            'Date',
-            'Time Slot',
-            'Transaction Number (TX)',
-            'Block Number',
-            'Status',
-            'Excused Reason',
-            'Document',
-        ]
-    )
-    for s in get_all_students_fn():
-        rows = _normalize_rows(s['nfcId'], get_student_session_rows_fn, get_attendance_records_fn) or [
-            {
-                'code': '—',
-                'subject': '—',
-                'teacher': '—',
-                'date': '—',
-                'time_slot': '—',
-                'tx_hash': '—',
-                'block': '—',
-                'status': '—',
-                'excuse': '—',
-                'document': '—',
-            }
-        ]
-        for row in rows:
-            w.writerow(
-                [
-                    s['name'],
-                    s['nfcId'],
-                    s['student_id'],
-                    s['course'],
-                    s['year_level'],
-                    s['section'],
-                    row['code'],
-                    row['subject'],
-                    row['teacher'],
-                    row['date'],
-                    row['time_slot'],
-                    row['tx_hash'],
-                    row['block'],
-                    row['status'],
-                    row['excuse'],
-                    row['document'],
-                ]
-            )
-    out.seek(0)
-    return Response(
-        out.getvalue(),
-        mimetype='text/csv',
-        headers={'Content-Disposition': f'attachment; filename=attendance_all_{(datetime.utcnow() + timedelta(hours=8)).strftime("%Y%m%d")}.csv'},
+def _csv_row(s, row):
+    return [
+        s['name'],
+        s['nfcId'],
+        s['student_id'],
+        s['course'],
+        s['year_level'],
+        s['section'],
+        row['code'],
+        row['subject'],
+        row['teacher'],
+        row['date'],
+        row['time_slot'],
+        row['tx_hash'],
+        row['block'],
+        row['status'],
+        row['excuse'],
+        row['document'],
+    ]
+
+
+def _joined_student_rows(student_rows, get_attendance_records_fn=None):
+    """
+    CSV rows from (student, session row) pairs. A student without logs gets
+    their on-chain history when ``get_attendance_records_fn`` is given (one
+    RPC per such student), else a row of dashes.
+    """
+    for s, row in student_rows:
+        if row is not None:
+            yield _csv_row(s, _format_session_row(row))
+            continue
+        rows = _fallback_rows(s['nfcId'], get_attendance_records_fn) if get_attendance_records_fn else []
+        for row in rows or [_EMPTY_ROW]:
+            yield _csv_row(s, row)
+
+
+def export_csv_all_impl(*, iter_student_session_rows_fn, get_attendance_records_fn, chain_fallback=False):
+    return csv_response(
+        iter_csv(
+            _STUDENT_CSV_HEADER,
+            _joined_student_rows(
+                iter_student_session_rows_fn(), get_attendance_records_fn if chain_fallback else None
+            ),
+        ),
+        f'attendance_all_{(datetime.utcnow() + timedelta(hours=8)).strftime("%Y%m%d")}.csv',
     )
 
 
@@ -232,78 +246,18 @@ def teacher_export_section_csv_impl(
     *,
     user_obj,
     sec_key,
-    teacher_students_fn,
-    normalize_section_key_fn,
-    build_student_section_key_fn,
+    iter_student_session_rows_fn,
     get_attendance_records_fn,
-    get_student_session_rows_fn=None,
+    chain_fallback=False,
 ):
-    students = teacher_students_fn(user_obj)
-    if sec_key:
-        norm_key = normalize_section_key_fn(sec_key)
-        students = [s for s in students if build_student_section_key_fn(s) == norm_key]
+    # The teacher's advisees, as in teacher_students(); none without a full name.
+    adviser = str((user_obj or {}).get('full_name', '')).strip().lower()
+    student_rows = iter_student_session_rows_fn(adviser=adviser, section_key=sec_key or None) if adviser else ()
 
-    out = io.StringIO()
-    w = csv.writer(out)
-    w.writerow(
-        [
-            'Name',
-            'NFC ID',
-            'Student ID',
-            'Course',
-            'Year',
-            'Section',
-            'Course Code',
-            'Subject Name',
-            'Instructor Name',
-            'Date',
-            'Time Slot',
-            'Transaction Number (TX)',
-            'Block Number',
-            'Status',
-            'Excused Reason',
-            'Document',
-        ]
-    )
-    for s in students:
-        rows = _normalize_rows(s['nfcId'], get_student_session_rows_fn, get_attendance_records_fn) or [
-            {
-                'code': '—',
-                'subject': '—',
-                'teacher': '—',
-                'date': '—',
-                'time_slot': '—',
-                'tx_hash': '—',
-                'block': '—',
-                'status': '—',
-                'excuse': '—',
-                'document': '—',
-            }
-        ]
-        for row in rows:
-            w.writerow(
-                [
-                    s['name'],
-                    s['nfcId'],
-                    s['student_id'],
-                    s['course'],
-                    s['year_level'],
-                    s['section'],
-                    row['code'],
-                    row['subject'],
-                    row['teacher'],
-                    row['date'],
-                    row['time_slot'],
-                    row['tx_hash'],
-                    row['block'],
-                    row['status'],
-                    row['excuse'],
-                    row['document'],
-                ]
-            )
-    out.seek(0)
-    return Response(
-        out.getvalue(),
-        mimetype='text/csv',
-        headers={'Content-Disposition': f'attachment; filename=section_{(datetime.utcnow() + timedelta(hours=8)).strftime("%Y%m%d")}.csv'},
+    return csv_response(
+        iter_csv(
+            _STUDENT_CSV_HEADER,
+            _joined_student_rows(student_rows, get_attendance_records_fn if chain_fallback else None),
+        ),
+        f'section_{(datetime.utcnow() + timedelta(hours=8)).strftime("%Y%m%d")}.csv',
     )
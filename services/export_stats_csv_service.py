@@ -1,9 +1,7 @@
 from datetime import datetime, timedelta
 import calendar as _cal
-import csv
-import io
 
-from flask import Response
+from services.csv_stream import csv_response, iter_csv, stream_query
 
 
 def export_stats_csv_impl(
@@ -58,14 +56,14 @@ def export_stats_csv_impl(
         where.append('s.section_key = ?')
         params.append(normalize_section_key_fn(f_section))
     if f_program:
-        where.append('s.section_key LIKE ?')
-        params.append(f_program + '%')
+        where.append('s.program = ?')
+        params.append(f_program)
     if f_year_lvl:
-        where.append('s.section_key LIKE ?')
-        params.append('%|' + f_year_lvl + '|%')
+        where.append('s.year_level = ?')
+        params.append(f_year_lvl)
     if f_sec_ltr:
-        where.append('s.section_key LIKE ?')
-        params.append('%|' + f_sec_ltr)
+        where.append('s.section_letter = ?')
+        params.append(f_sec_ltr)
     if f_subject:
         where.append('s.subject_name = ?')
         params.append(f_subject)
@@ -73,41 +71,41 @@ def export_stats_csv_impl(
         where.append('s.teacher_name = ?')
         params.append(f_instr)
     if f_tod == 'morning':
-        where.append("CAST(strftime('%H',s.started_at) AS INTEGER) < 12")
+        where.append('EXTRACT(HOUR FROM s.started_ts) < 12')
     elif f_tod == 'afternoon':
-        where.append("CAST(strftime('%H',s.started_at) AS INTEGER) >= 12")
+        where.append('EXTRACT(HOUR FROM s.started_ts) >= 12')
     elif f_tod and ':' in f_tod:
         where.append('s.time_slot = ?')
         params.append(f_tod)
     wsql = ' AND '.join(where)
 
-    out = io.StringIO()
-    w = csv.writer(out)
-    w.writerow(['Session ID', 'Subject', 'Section', 'Instructor', 'Date', 'Time Slot', 'Total Records', 'Present', 'Late', 'Absent', 'Excused', 'Rate%'])
-    with get_db_fn() as conn:
-        rows = conn.execute(
-            "SELECT s.sess_id, s.subject_name, s.section_key, s.teacher_name, s.started_at, s.time_slot, "
-            "SUM(CASE WHEN al.status='present' THEN 1 ELSE 0 END) AS present_count, "
-            "SUM(CASE WHEN al.status='late' THEN 1 ELSE 0 END) AS late_count, "
-            "SUM(CASE WHEN al.status='absent' THEN 1 ELSE 0 END) AS absent_count, "
-            "SUM(CASE WHEN al.status='excused' THEN 1 ELSE 0 END) AS excused_count, "
-            "COUNT(*) AS total_count "
-            "FROM attendance_logs al "
-            "JOIN sessions s ON al.sess_id = s.sess_id "
-            "WHERE " + wsql + ' '
-            "GROUP BY s.sess_id, s.subject_name, s.section_key, s.teacher_name, s.started_at, s.time_slot "
-            "ORDER BY s.started_at",
-            params,
-        ).fetchall()
-    for r in rows:
-        total = int(r['total_count'] or 0)
-        present = int(r['present_count'] or 0)
-        late = int(r['late_count'] or 0)
-        absent = int(r['absent_count'] or 0)
-        excused = int(r['excused_count'] or 0)
-        rate = round((present + late) / total * 100, 1) if total else 0
-        w.writerow(
-            [
+    header = ['Session ID', 'Subject', 'Section', 'Instructor', 'Date', 'Time Slot', 'Total Records', 'Present', 'Late', 'Absent', 'Excused', 'Rate%']
+    rows = stream_query(
+        get_db_fn,
+        'export_stats_csv',
+        "SELECT s.sess_id, s.subject_name, s.section_key, s.teacher_name, s.started_at, s.time_slot, "
+        "SUM(CASE WHEN al.status='present' THEN 1 ELSE 0 END) AS present_count, "
+        "SUM(CASE WHEN al.status='late' THEN 1 ELSE 0 END) AS late_count, "
+        "SUM(CASE WHEN al.status='absent' THEN 1 ELSE 0 END) AS absent_count, "
+        "SUM(CASE WHEN al.status='excused' THEN 1 ELSE 0 END) AS excused_count, "
+        "COUNT(*) AS total_count "
+        "FROM attendance_logs al "
+        "JOIN sessions s ON al.sess_id = s.sess_id "
+        "WHERE " + wsql + ' '
+        "GROUP BY s.sess_id, s.subject_name, s.section_key, s.teacher_name, s.started_at, s.time_slot "
+        "ORDER BY s.started_at",
+        params,
+    )
+
+    def csv_rows():
+        for r in rows:
+            total = int(r['total_count'] or 0)
+            present = int(r['present_count'] or 0)
+            late = int(r['late_count'] or 0)
+            absent = int(r['absent_count'] or 0)
+            excused = int(r['excused_count'] or 0)
+            rate = round((present + late) / total * 100, 1) if total else 0
+            yield [
                 (r['sess_id'] or '')[:8],
                 r['subject_name'] or '',
                 normalize_section_key_fn(r['section_key'] or '').replace('|', ' · '),
@@ -121,7 +119,5 @@ def export_stats_csv_impl(
                 excused,
                 rate,
             ]
-        )
-    out.seek(0)
-    fname = f'attendance_{period}_{now.strftime("%Y%m%d")}.csv'
-    return Response(out.getvalue(), mimetype='text/csv', headers={'Content-Disposition': f'attachment;filename={fname}'})
+
+    return csv_response(iter_csv(header, csv_rows()), f'attendance_{period}_{now.strftime("%Y%m%d")}.csv')
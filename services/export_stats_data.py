@@ -1,6 +1,151 @@
 from datetime import datetime
 import calendar as _cal
 
+import numpy as np
+import pandas as pd
+
+
+_STATUS_KEYS = ('present', 'late', 'absent', 'excused')
+_CLASS_TYPES = ('lecture', 'laboratory', 'school_event')
+_STUDENT_COLS = ('name', 'student_id', 'course', 'year_level', 'section', 'enrollment_status')
+_SESSION_COLS = (
+    'sess_id', 'subject_name', 'course_code', 'class_type', 'section_key', 'program', 'year_level',
+    'section_letter', 'teacher_username', 'teacher_name', 'time_slot', 'semester', 'started_at',
+)
+_LOG_COLS = ('sess_id', 'nfc_id', 'student_name', 'student_id', 'status', 'tx_hash', 'block_number')
+_EXCUSE_COLS = ('sess_id', 'nfc_id', 'reason_type', 'reason_detail', 'attachment_file')
+
+_REASON_LABELS = {
+    'sickness': 'Sickness / Illness',
+    'lbm': 'LBM',
+    'emergency': 'Family Emergency',
+    'bereavement': 'Bereavement',
+    'medical': 'Medical Appointment',
+    'accident': 'Accident / Injury',
+    'official': 'Official School Business',
+    'weather': 'Extreme Weather / Calamity',
+    'transport': 'Transportation Problem',
+    'others': 'Others',
+}
+
+
+def _frame(rows, columns):
+    return pd.DataFrame([dict(r) for r in rows], columns=list(columns)).astype(object)
+
+
+def _text(series):
+    """Object column with None/NaN as '' (what the dict-based code saw via .get(..., ''))."""
+    return series.astype(object).where(series.notna(), '')
+
+
+def _student_frame(students):
+    """nfc_id + the detail fields, read with the same .get defaults the row builder used."""
+    return pd.DataFrame(
+        [
+            (st['nfcId'], st['name'], st.get('student_id', ''), st.get('course', ''), st.get('year_level', ''),
+             st.get('section', ''), st.get('enrollment_status', 'Regular'))
+            for st in students
+        ],
+        columns=('nfc_id',) + _STUDENT_COLS,
+    ).astype(object)
+
+
+def _load_session_frame(get_db_fn, start_dt, end_dt):
+    # started_ts narrows the scan; the exact started_at format is still checked below.
+    where, params = ['started_ts >= ?'], [start_dt]
+    if end_dt:
+        where.append('started_ts <= ?')
+        params.append(end_dt)
+    with get_db_fn() as conn:
+        rows = conn.execute(
+            f"SELECT {', '.join(_SESSION_COLS)} FROM sessions WHERE {' AND '.join(where)}", tuple(params)
+        ).fetchall()
+    return _frame(rows, _SESSION_COLS)
+
+
+def _load_session_logs(get_db_fn, sess_ids):
+    """Attendance logs for ``sess_ids`` in one query."""
+    if not sess_ids:
+        return _frame([], _LOG_COLS)
+    with get_db_fn() as conn:
+        logs = conn.execute(
+            f"SELECT {', '.join(_LOG_COLS)} FROM attendance_logs WHERE sess_id = ANY(?)", (sess_ids,)
+        ).fetchall()
+    return _frame(logs, _LOG_COLS)
+
+
+def _filter_sessions(
+    sess, *, start_dt, end_dt, role, username, f_section, f_program, f_year_lvl, f_sec_ltr, f_subject,
+    f_instr, f_class_type, f_tod, f_semester, normalize_section_key_fn,
+):
+    for col in _SESSION_COLS:
+        sess[col] = _text(sess[col])
+    sess['sess_dt'] = pd.to_datetime(sess['started_at'], format='%Y-%m-%d %H:%M:%S', errors='coerce')
+    keep = sess['sess_dt'].notna()
+    keep &= sess['sess_dt'] >= start_dt
+    if end_dt:
+        keep &= sess['sess_dt'] <= end_dt
+    if role == 'teacher':
+        keep &= (sess['teacher_username'] == username) | (sess['teacher_name'] == username)
+    sk_norm = {k: normalize_section_key_fn(k) for k in sess['section_key'].unique()}
+    sess['sk'] = sess['section_key'].map(sk_norm).astype(object)
+    if f_section:
+        keep &= sess['sk'] == normalize_section_key_fn(f_section)
+    for value, col in ((f_program, 'program'), (f_year_lvl, 'year_level'), (f_sec_ltr, 'section_letter'),
+                       (f_subject, 'subject_name'), (f_instr, 'teacher_name')):
+        if value:
+            keep &= sess[col] == value
+    class_type = sess['class_type'].astype(str).str.strip().str.lower()
+    if f_class_type in _CLASS_TYPES:
+        keep &= class_type == f_class_type
+    if f_tod:
+        if ':' in f_tod:
+            keep &= sess['time_slot'] == f_tod
+        elif f_tod == 'morning':
+            keep &= sess['sess_dt'].dt.hour < 12
+        elif f_tod == 'afternoon':
+            keep &= sess['sess_dt'].dt.hour >= 12
+    if f_semester:
+        keep &= sess['semester'].astype(str).str.lower() == f_semester.lower()
+    sess['class_type_norm'] = class_type.where(class_type.isin(_CLASS_TYPES), 'lecture')
+    # Chronological; ties keep load order, like the stable sort the per-session loop used.
+    sess = sess[keep].sort_values('started_at', kind='stable').reset_index(drop=True)
+    sess['ord'] = np.arange(len(sess))
+    return sess
+
+
+def _session_members(sess, students, student_sk, rosters):
+    """
+    (sess_id, nfc_id) of every official member: the roster snapshot when the
+    session has one, else students of the section registered before it started.
+    Roster rows carry their own detail fields (roster_* columns).
+    """
+    has_roster = sess['sess_id'].isin(list(rosters))
+    roster_part = _student_frame([st for sid in sess.loc[has_roster, 'sess_id'] for st in rosters[sid]])
+    roster_part.insert(0, 'sess_id', [sid for sid in sess.loc[has_roster, 'sess_id'] for _ in rosters[sid]])
+    roster_part = roster_part.rename(columns={c: 'roster_' + c for c in _STUDENT_COLS})
+    roster_part['in_roster'] = True
+
+    by_section = pd.DataFrame({
+        'nfc_id': students['nfc_id'],
+        'sk': student_sk,
+        'created_at': students['created_at'],
+    })
+    by_section = by_section[by_section['sk'].notna()]
+    derived = sess.loc[~has_roster, ['sess_id', 'sk', 'started_at']].merge(by_section, on='sk')
+    derived = derived.loc[derived['created_at'] <= derived['started_at'], ['sess_id', 'nfc_id']]
+
+    members = pd.concat([roster_part, derived], ignore_index=True)
+    members['official'] = True
+    return members
+
+
+def _count_dict(frame, key, cols=_STATUS_KEYS):
+    return {
+        k: {c: int(v) for c, v in zip(cols, vals)}
+        for k, *vals in frame[[key, *cols]].itertuples(index=False, name=None)
+    }
+
 
 def build_stats_export_dataset(
     *,
@@ -19,16 +164,22 @@ def build_stats_export_dataset(
     role,
     username,
     now,
-    load_sessions_fn,
     db_get_all_students_fn,
-    db_get_override_fn,
+    db_get_overrides_fn,
+    db_get_approved_excuses_fn,
     normalize_section_key_fn,
     build_student_section_key_fn,
     fmt_time_fn,
-    db_get_session_attendance_fn,
     get_db_fn,
     f_enrollment=None,
+    db_get_session_rosters_fn=None,
 ):
+    """
+    Everything the stats workbook shows, built from bulk frames — sessions,
+    their attendance logs and approved excuses, and students with overrides
+    (one query each) — joined with merges and summed with groupbys instead of
+    walking every session's roster in Python.
+    """
     if period == 'today':
         start_dt = now.replace(hour=0, minute=0, second=0, microsecond=0)
         end_dt = now.replace(hour=23, minute=59, second=59, microsecond=999999)
@@ -49,10 +200,10 @@ def build_stats_export_dataset(
         end_dt = None
         period_label = 'All Time'
 
-    all_sess = load_sessions_fn()
     all_stud = db_get_all_students_fn()
+    overrides = db_get_overrides_fn()
     for _st in all_stud:
-        _ov = db_get_override_fn(_st['nfcId'])
+        _ov = overrides.get(_st['nfcId'], {})
         if _ov.get('course'):
             _st['course'] = _ov['course']
         if _ov.get('year_level'):
@@ -68,56 +219,13 @@ def build_stats_export_dataset(
     if f_enrollment:
         all_stud = [st for st in all_stud if st.get('enrollment_status', 'Regular').lower() == f_enrollment.lower()]
 
-    filtered = {}
-    f_section_norm = normalize_section_key_fn(f_section) if f_section else ''
-    for sid, s in all_sess.items():
-        if not s.get('started_at'):
-            continue
-        try:
-            sess_dt = datetime.strptime(s['started_at'], '%Y-%m-%d %H:%M:%S')
-        except Exception:
-            continue
-        if sess_dt < start_dt:
-            continue
-        if end_dt and sess_dt > end_dt:
-            continue
-        if role == 'teacher':
-            # Check if teacher_username or teacher_name matches the current user
-            if s.get('teacher_username') != username and s.get('teacher_name') != username:
-                continue
-        sk = s.get('section_key', '')
-        sk_parts = sk.split('|')
-        if f_section_norm and normalize_section_key_fn(sk) != f_section_norm:
-            continue
-        if f_program and (len(sk_parts) < 1 or sk_parts[0] != f_program):
-            continue
-        if f_year_lvl and (len(sk_parts) < 2 or sk_parts[1] != f_year_lvl):
-            continue
-        if f_sec_ltr and (len(sk_parts) < 3 or sk_parts[2] != f_sec_ltr):
-            continue
-        if f_subject and s.get('subject_name', '') != f_subject:
-            continue
-        if f_instr and s.get('teacher_name', '') != f_instr:
-            continue
-        class_type_norm = str(s.get('class_type', 'lecture')).strip().lower()
-        if f_class_type in ('lecture', 'laboratory', 'school_event') and class_type_norm != f_class_type:
-            continue
-        if f_tod:
-            if ':' in f_tod:
-                if s.get('time_slot', '') != f_tod:
-                    continue
-            else:
-                try:
-                    h = sess_dt.hour
-                    if f_tod == 'morning' and h >= 12:
-                        continue
-                    if f_tod == 'afternoon' and h < 12:
-                        continue
-                except Exception:
-                    pass
-        if f_semester and (s.get('semester') or '').lower() != f_semester.lower():
-            continue
-        filtered[sid] = s
+    sess = _filter_sessions(
+        _load_session_frame(get_db_fn, start_dt, end_dt),
+        start_dt=start_dt, end_dt=end_dt, role=role, username=username, f_section=f_section,
+        f_program=f_program, f_year_lvl=f_year_lvl, f_sec_ltr=f_sec_ltr, f_subject=f_subject,
+        f_instr=f_instr, f_class_type=f_class_type, f_tod=f_tod, f_semester=f_semester,
+        normalize_section_key_fn=normalize_section_key_fn,
+    )
 
     af = []
     if f_program:
@@ -141,180 +249,125 @@ def build_stats_export_dataset(
     filter_label = ' | '.join(af) if af else 'All data'
 
     donut = {'Present': 0, 'Late': 0, 'Absent': 0, 'Excused': 0}
-    trend = {}
-    subj_d = {}
-    sess_rows = []
-    detail_rows = []
-    by_section = {}
-    by_class_type = {}
-    reason_labels = {
-        'sickness': 'Sickness / Illness',
-        'lbm': 'LBM',
-        'emergency': 'Family Emergency',
-        'bereavement': 'Bereavement',
-        'medical': 'Medical Appointment',
-        'accident': 'Accident / Injury',
-        'official': 'Official School Business',
-        'weather': 'Extreme Weather / Calamity',
-        'transport': 'Transportation Problem',
-        'others': 'Others',
+    ds = {
+        'period_label': period_label,
+        'filter_label': filter_label,
+        'donut': donut,
+        'trend': {},
+        'subj_d': {},
+        'sess_rows': [],
+        'detail_rows': [],
+        'by_section': {},
+        'by_class_type': {},
     }
+    if sess.empty:
+        return ds
 
-    for sid, s in sorted(filtered.items(), key=lambda x: x[1].get('started_at', '')):
-        class_type_norm = str(s.get('class_type', 'lecture')).strip().lower()
-        if class_type_norm not in ('lecture', 'laboratory', 'school_event'):
-            class_type_norm = 'lecture'
-        sk = normalize_section_key_fn(s.get('section_key', ''))
-        enrolled_official = [st for st in all_stud if build_student_section_key_fn(st) == sk]
-        
-        att_logs = {lg['nfc_id']: lg for lg in db_get_session_attendance_fn(sid)}
-        
-        # Combined student set: official enrolled + any irregular student who tapped
-        all_session_stud_ids = {st['nfcId'] for st in enrolled_official} | set(att_logs.keys())
-        
-        # Smart Absent Logic: Only count official students as "Absent" if they were already registered when the session started.
-        # This prevents new students from appearing absent in history.
-        official_ids_for_absent = {
-            st['nfcId'] for st in enrolled_official 
-            if (st.get('created_at') or '9999') <= s.get('started_at', '')
-        }
-        
-        pre = set(s.get('present', []))
-        late = set(s.get('late', []))
-        exc = set(s.get('excused', []))
-        
-        # Recalculate counts to include irregular students
-        # Absent = (Eligible Official IDs + Irregular Taps) - (Present + Late + Excused)
-        # Actually, Irregular Taps are never absent by definition.
-        # So Absent = Eligible Official IDs - (Present + Late + Excused)
-        abs_ = official_ids_for_absent - pre - late - exc
-        
-        # All IDs involved in this specific session (for total enrollment stat)
-        session_total_ids = official_ids_for_absent | set(att_logs.keys())
-        
-        cnt = {
-            'enrolled': len(session_total_ids),
-            'present': len(pre - late),
-            'late': len(late),
-            'absent': len(abs_),
-            'excused': len(exc),
+    sess_ids = sess['sess_id'].tolist()
+    # Roster snapshots (captured at session start) for every filtered session in one query.
+    rosters = db_get_session_rosters_fn(sess_ids) if db_get_session_rosters_fn else {}
+    if f_enrollment:
+        rosters = {
+            sid: [st for st in roster if (st.get('enrollment_status') or 'Regular').lower() == f_enrollment.lower()]
+            for sid, roster in rosters.items()
         }
-        for k in ('present', 'late', 'absent', 'excused'):
-            donut[k.capitalize()] += cnt[k]
-        code = s.get('course_code', '')
-        subj_lbl = f"[{code}] {s.get('subject_name', '')}" if code else s.get('subject_name', '')
-        rate = round((cnt['present'] + cnt['late']) / cnt['enrolled'] * 100, 1) if cnt['enrolled'] else 0
-        date_key = s['started_at'][:10]
-        if date_key not in trend:
-            trend[date_key] = {'present': 0, 'late': 0, 'absent': 0, 'excused': 0}
-        for k in ('present', 'late', 'absent', 'excused'):
-            trend[date_key][k] += cnt[k]
-        sn = s.get('subject_name', 'Unknown')
-        if sn not in subj_d:
-            subj_d[sn] = {'code': code, 'present': 0, 'late': 0, 'absent': 0, 'excused': 0}
-        for k in ('present', 'late', 'absent', 'excused'):
-            subj_d[sn][k] += cnt[k]
-        if sk not in by_section:
-            by_section[sk] = {'present': 0, 'late': 0, 'absent': 0, 'excused': 0, 'enrolled': 0}
-        for k in ('present', 'late', 'absent', 'excused', 'enrolled'):
-            by_section[sk][k] += cnt[k]
-        
-        ct_key = class_type_norm.title()
-        if ct_key not in by_class_type:
-            by_class_type[ct_key] = {'present': 0, 'late': 0, 'absent': 0, 'excused': 0}
-        for k in ('present', 'late', 'absent', 'excused'):
-            by_class_type[ct_key][k] += cnt[k]
-
-        sess_rows.append(
-            [
-                subj_lbl,
-                class_type_norm.capitalize(),
-                fmt_time_fn(s['started_at']),
-                sk.replace('|', ' · '),
-                s.get('teacher_name', ''),
-                s.get('time_slot', ''),
-                cnt['enrolled'],
-                cnt['present'],
-                cnt['late'],
-                cnt['absent'],
-                cnt['excused'],
-                rate,
-            ]
+    logs = _load_session_logs(get_db_fn, sess_ids)
+    excuses = _frame(
+        [ex for by_nfc in db_get_approved_excuses_fn(sess_ids).values() for ex in by_nfc.values()], _EXCUSE_COLS
+    )
+
+    students = _student_frame(all_stud)
+    students['created_at'] = [st.get('created_at') or '9999' for st in all_stud]
+    student_sk = pd.Series([build_student_section_key_fn(st) for st in all_stud], index=students.index, dtype=object)
+    members = _session_members(sess, students, student_sk, rosters)
+
+    # One row per (session, student involved): official members ∪ everyone with a log.
+    logs['has_log'] = True
+    rows = members.merge(logs, on=['sess_id', 'nfc_id'], how='outer')
+    rows['official'] = rows['official'].eq(True)
+    rows['has_log'] = rows['has_log'].eq(True)
+    rows['in_roster'] = rows['in_roster'].eq(True)
+    status = _text(rows['status'])
+    for k in ('present', 'late', 'excused'):
+        rows[k] = status.eq(k)
+    # Absent = eligible official ids that did not tap or get excused; an irregular tap is never absent.
+    rows['absent'] = rows['official'] & ~(rows['present'] | rows['late'] | rows['excused'])
+    rows['enrolled'] = True
+
+    counts = rows.groupby('sess_id')[['enrolled', *_STATUS_KEYS]].sum()
+    sess = sess.join(counts, on='sess_id')
+    for k in ('enrolled', *_STATUS_KEYS):
+        sess[k] = sess[k].fillna(0).astype(int)
+
+    for k in _STATUS_KEYS:
+        donut[k.capitalize()] += int(sess[k].sum())
+    sess['date_key'] = sess['started_at'].str[:10]
+    sess['subj_lbl'] = np.where(
+        sess['course_code'] != '', '[' + sess['course_code'] + '] ' + sess['subject_name'], sess['subject_name']
+    )
+    sess['ct_key'] = sess['class_type_norm'].str.title()
+    sess['ct_label'] = sess['class_type_norm'].str.capitalize()
+    sess['started_fmt'] = sess['started_at'].map({t: fmt_time_fn(t) for t in sess['started_at'].unique()})
+
+    ds['trend'] = _count_dict(sess.groupby('date_key', sort=False)[list(_STATUS_KEYS)].sum().reset_index(), 'date_key')
+    subj = sess.groupby('subject_name', sort=False).agg(
+        code=('course_code', 'first'), **{k: (k, 'sum') for k in _STATUS_KEYS}
+    ).reset_index()
+    ds['subj_d'] = {
+        sn: {'code': code, **{k: int(v) for k, v in zip(_STATUS_KEYS, vals)}}
+        for sn, code, *vals in subj[['subject_name', 'code', *_STATUS_KEYS]].itertuples(index=False, name=None)
+    }
+    ds['by_section'] = _count_dict(
+        sess.groupby('sk', sort=False)[[*_STATUS_KEYS, 'enrolled']].sum().reset_index(), 'sk',
+        (*_STATUS_KEYS, 'enrolled'),
+    )
+    ds['by_class_type'] = _count_dict(
+        sess.groupby('ct_key', sort=False)[list(_STATUS_KEYS)].sum().reset_index(), 'ct_key'
+    )
+
+    ds['sess_rows'] = [
+        [lbl, ct, started, sk.replace('|', ' · '), teacher, slot, enrolled, present, late, absent, excused,
+         round((present + late) / enrolled * 100, 1) if enrolled else 0]
+        for lbl, ct, started, sk, teacher, slot, enrolled, present, late, absent, excused in zip(
+            sess['subj_lbl'], sess['ct_label'], sess['started_fmt'], sess['sk'], sess['teacher_name'],
+            sess['time_slot'], *(sess[k].tolist() for k in ('enrolled', 'present', 'late', 'absent', 'excused')),
         )
-        excuse_details = {}
-        with get_db_fn() as _conn:
-            excuses = _conn.execute(
-                "SELECT nfc_id, reason_type, reason_detail, attachment_file FROM excuse_requests WHERE sess_id=? AND status='approved'",
-                (sid,),
-            ).fetchall()
-            for exc_row in excuses:
-                excuse_details[exc_row['nfc_id']] = {
-                    'reason': exc_row['reason_type'],
-                    'reason_detail': exc_row['reason_detail'],
-                    'attachment_file': exc_row['attachment_file'],
-                }
-
-        # Map all students for quick lookup
-        stud_db_map = {st['nfcId']: st for st in all_stud}
-        
-        for nid in sorted(session_total_ids):
-            st = stud_db_map.get(nid)
-            lg = att_logs.get(nid, {})
-            
-            # If student not in DB (rare), use log data
-            st_name = st['name'] if st else lg.get('student_name', 'Unknown')
-            st_id = st.get('student_id', '') if st else lg.get('student_id', '')
-            st_course = st.get('course', '') if st else ''
-            st_year = st.get('year_level', '') if st else ''
-            st_sec = st.get('section', '') if st else ''
-            st_enrollment = st.get('enrollment_status', 'Regular') if st else 'Irregular'
-            
-            if nid in exc:
-                status = 'Excused'
-            elif nid in late:
-                status = 'Late'
-            elif nid in pre:
-                status = 'Present'
-            else:
-                status = 'Absent'
-            
-            excuse_info = excuse_details.get(nid, {})
-            excuse_reason = ''
-            if excuse_info.get('reason'):
-                excuse_reason = reason_labels.get(excuse_info['reason'], excuse_info['reason'])
-                if excuse_info.get('reason_detail'):
-                    excuse_reason += f" ({excuse_info['reason_detail']})"
-            
-            detail_rows.append(
-                [
-                    st_name,
-                    st_id,
-                    nid,
-                    st_course,
-                    st_year,
-                    st_sec,
-                    st_enrollment,
-                    subj_lbl,
-                    class_type_norm.capitalize(),
-                    fmt_time_fn(s['started_at']),
-                    s.get('time_slot', ''),
-                    s.get('teacher_name', ''),
-                    status,
-                    lg.get('tx_hash', ''),
-                    lg.get('block_number', ''),
-                    excuse_reason,
-                    'Yes' if excuse_info.get('attachment_file') else '',
-                ]
-            )
+    ]
 
-    return {
-        'period_label': period_label,
-        'filter_label': filter_label,
-        'donut': donut,
-        'trend': trend,
-        'subj_d': subj_d,
-        'sess_rows': sess_rows,
-        'detail_rows': detail_rows,
-        'by_section': by_section,
-        'by_class_type': by_class_type,
+    # Detail: student fields from the session's roster snapshot, else the student
+    # list, else the log itself (a tap by someone no longer registered).
+    rows = rows.merge(sess[['sess_id', 'ord', 'subj_lbl', 'ct_label', 'started_fmt', 'time_slot', 'teacher_name']],
+                      on='sess_id')
+    rows = rows.merge(students.drop(columns='created_at').rename(columns={c: 'db_' + c for c in _STUDENT_COLS})
+                      .assign(in_db=True), on='nfc_id', how='left')
+    rows['in_db'] = rows['in_db'].eq(True)
+    rows = rows.merge(excuses, on=['sess_id', 'nfc_id'], how='left')
+    rows = rows.sort_values(['ord', 'nfc_id'], kind='stable').reset_index(drop=True)
+
+    from_roster, from_db = rows['in_roster'], rows['in_db'] & ~rows['in_roster']
+    unknown = ~(from_roster | from_db)
+    fallback = {
+        'name': _text(rows['student_name']).where(rows['has_log'], 'Unknown'),
+        'student_id': _text(rows['student_id']),
+        'course': '', 'year_level': '', 'section': '', 'enrollment_status': 'Irregular',
     }
+    for c in _STUDENT_COLS:
+        col = rows['roster_' + c].where(from_roster, rows['db_' + c])
+        rows['out_' + c] = col.astype(object).where(~unknown, fallback[c])
+    rows['out_status'] = np.select(
+        [rows['excused'], rows['late'], rows['present']], ['Excused', 'Late', 'Present'], 'Absent'
+    )
+    reason = _text(rows['reason_type'])
+    detail = _text(rows['reason_detail'])
+    label = reason.map(lambda r: _REASON_LABELS.get(r, r))
+    rows['excuse_reason'] = label.where(detail == '', label + ' (' + detail + ')').where(reason != '', '')
+    rows['has_attachment'] = np.where(_text(rows['attachment_file']) != '', 'Yes', '')
+    rows['tx_hash'] = _text(rows['tx_hash'])
+    rows['block_number'] = rows['block_number'].astype(object).where(rows['has_log'], '')
+
+    ds['detail_rows'] = rows[[
+        'out_name', 'out_student_id', 'nfc_id', 'out_course', 'out_year_level', 'out_section',
+        'out_enrollment_status', 'subj_lbl', 'ct_label', 'started_fmt', 'time_slot', 'teacher_name',
+        'out_status', 'tx_hash', 'block_number', 'excuse_reason', 'has_attachment',
+    ]].astype(object).values.tolist()
+    return ds
@@ -9,30 +9,27 @@ def export_stats_xlsx_impl(
     request_obj,
     session_obj,
     build_stats_export_dataset_fn,
-    load_sessions_fn,
     db_get_all_students_fn,
-    db_get_override_fn,
+    db_get_overrides_fn,
+    db_get_approved_excuses_fn,
     normalize_section_key_fn,
     build_student_section_key_fn,
     fmt_time_fn,
-    db_get_session_attendance_fn,
     get_db_fn,
     xl_helpers_fn,
     now=None,
+    db_get_session_rosters_fn=None,
 ):
     """Unified analytics export - GET or POST. Produces rich multi-sheet workbook."""
     try:
-        _ox = __import__('openpyxl')
         _ox_chart = __import__('openpyxl.chart', fromlist=['BarChart', 'PieChart', 'Reference'])
         _ox_styles = __import__('openpyxl.styles', fromlist=['Font', 'PatternFill', 'Alignment'])
-        Workbook = _ox.Workbook
         BarChart = _ox_chart.BarChart
         PieChart = _ox_chart.PieChart
         Reference = _ox_chart.Reference
         XFont = _ox_styles.Font
         XFill = _ox_styles.PatternFill
         XAlign = _ox_styles.Alignment
-        import io as _io
 
         if request_obj.method == 'POST':
             from urllib.parse import parse_qs
@@ -98,14 +95,14 @@ def export_stats_xlsx_impl(
             role=role,
             username=username,
             now=now,
-            load_sessions_fn=load_sessions_fn,
             db_get_all_students_fn=db_get_all_students_fn,
-            db_get_override_fn=db_get_override_fn,
+            db_get_overrides_fn=db_get_overrides_fn,
+            db_get_approved_excuses_fn=db_get_approved_excuses_fn,
             normalize_section_key_fn=normalize_section_key_fn,
             build_student_section_key_fn=build_student_section_key_fn,
             fmt_time_fn=fmt_time_fn,
-            db_get_session_attendance_fn=db_get_session_attendance_fn,
             get_db_fn=get_db_fn,
+            db_get_session_rosters_fn=db_get_session_rosters_fn,
         )
         period_label = ds['period_label']
         filter_label = ds['filter_label']
@@ -119,11 +116,10 @@ def export_stats_xlsx_impl(
         total_all = sum(donut.values())
         H = xl_helpers_fn()
         C = H['C']
-        wb = Workbook()
+        wb = H['workbook']()
 
         # Sheet 1: Summary
-        ws1 = wb.active
-        ws1.title = 'Summary'
+        ws1 = H['sheet'](wb, 'Summary')
         n_cols = 12
         subtitles = [
             'Cavite State University - Decentralized Attendance Verification System',
@@ -149,6 +145,8 @@ def export_stats_xlsx_impl(
         wids = [30, 12, 22, 24, 22, 16, 10, 10, 9, 9, 10, 10]
         H['make_header_row'](ws1, first_row, hdrs, wids)
         first_row += 1
+        # Write-only sheets write their view before the first row, so freeze before the data.
+        ws1.freeze_panes = f'A{first_row}'
         for ri, row in enumerate(sess_rows, first_row):
             vals = list(row)
             vals[11] = f"{vals[11]}%"
@@ -177,10 +175,9 @@ def export_stats_xlsx_impl(
         ws1.cell(row=tr + 2, column=1, value=f'Generated by DAVS on {now.strftime("%B %d, %Y %I:%M %p")}').font = XFont(
             name='Calibri', size=9, italic=True, color='94A3B8'
         )
-        ws1.freeze_panes = ws1.cell(row=first_row, column=1)
 
         # Sheet 2: Student Detail
-        ws2 = wb.create_sheet('Student Detail')
+        ws2 = H['sheet'](wb, 'Student Detail')
         n2 = 16
         subtitles2 = [
             'Cavite State University - DAVS',
@@ -210,13 +207,13 @@ def export_stats_xlsx_impl(
         det_wids = [24, 14, 14, 24, 10, 6, 15, 28, 12, 20, 16, 22, 10, 52, 10, 26, 20]
         H['make_header_row'](ws2, dr, det_hdrs, det_wids)
         dr += 1
+        ws2.freeze_panes = f'A{dr}'
         for ri, row in enumerate(detail_rows, dr):
             col_fmt = {13: ('status',), 14: ('tx',), 15: ('num',)}
             H['data_row'](ws2, ri, row, alt=(ri % 2 == 0), col_formats=col_fmt)
-        ws2.freeze_panes = ws2.cell(row=dr, column=1)
 
         # Sheet 3: By Date
-        ws3 = wb.create_sheet('By Date')
+        ws3 = H['sheet'](wb, 'By Date')
         n3 = 5
         subtitles3 = [f'Period: {period_label}  |  Attendance counts per session date']
         tr3 = H['title_block'](ws3, 'Attendance Trend by Date', subtitles3, n3)
@@ -255,7 +252,7 @@ def export_stats_xlsx_impl(
             ws3.add_chart(bar3, f'G{tr3}')
 
         # Sheet 4: By Subject
-        ws4 = wb.create_sheet('By Subject')
+        ws4 = H['sheet'](wb, 'By Subject')
         n4 = 7
         subtitles4 = [f'Period: {period_label}  |  Aggregate attendance per subject']
         ts4 = H['title_block'](ws4, 'Attendance by Subject', subtitles4, n4)
@@ -300,7 +297,7 @@ def export_stats_xlsx_impl(
             ws4.add_chart(bar4, f'I{ts4}')
 
         # Sheet 5: By Section
-        ws5 = wb.create_sheet('By Section')
+        ws5 = H['sheet'](wb, 'By Section')
         n5 = 7
         subtitles5 = [f'Period: {period_label}  |  Aggregate attendance per section']
         ts5 = H['title_block'](ws5, 'Attendance by Section', subtitles5, n5)
@@ -353,7 +350,7 @@ def export_stats_xlsx_impl(
             ws5.add_chart(bar5, f'I{ts5}')
 
         # Sheet 6: By Class Type
-        ws6 = wb.create_sheet('By Class Type')
+        ws6 = H['sheet'](wb, 'By Class Type')
         n6 = 7
         subtitles6 = [f'Period: {period_label}  |  Aggregate attendance per class type']
         ts6 = H['title_block'](ws6, 'Attendance by Class Type', subtitles6, n6)
@@ -401,7 +398,7 @@ def export_stats_xlsx_impl(
             ws6.add_chart(bar6, f'I{ts6}')
 
         # Sheet 7: Charts Dashboard
-        wc = wb.create_sheet('Charts')
+        wc = H['sheet'](wb, 'Charts')
         wc.sheet_view.showGridLines = False
 
         n_chart_cols = 20
@@ -563,14 +560,7 @@ def export_stats_xlsx_impl(
         fname = re.sub(r'_+', '_', fname).strip('_')
         if not fname.endswith('.xlsx'):
             fname += '.xlsx'
-        output = _io.BytesIO()
-        wb.save(output)
-        output.seek(0)
-        return Response(
-            output.getvalue(),
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            headers={'Content-Disposition': f'attachment; filename="{fname}"'},
-        )
+        return H['send_workbook'](wb, fname)
     except Exception:
         import traceback
 
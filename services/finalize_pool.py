@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+
+class FinalizePool:
+    """
+    Bounded worker pool for session finalization.
+
+    The automation scheduler hands expired sessions to ``submit`` and returns
+    immediately, so a batch of classes ending at the same minute finalize in
+    parallel instead of one after another inside the scheduler tick. A session
+    that is already queued or running is not queued twice, and
+    ``session_lock`` serializes finalizations of the same session within this
+    process (pool worker vs. a teacher pressing End Session). Across workers
+    and replicas the claim on ``sessions.ended_at`` in ``_finalize_session``
+    is what keeps a session from being finalized twice.
+    """
+
+    def __init__(self, *, finalize_fn, max_workers=4, context_fn=None):
+        self.finalize_fn = finalize_fn
+        self.context_fn = context_fn
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='davs-finalize')
+        self._guard = threading.Lock()
+        self._locks = {}
+        self._pending = set()
+        self._queued = 0
+        self._running = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._durations = deque(maxlen=200)
+
+    @contextmanager
+    def session_lock(self, sess_id):
+        with self._guard:
+            entry = self._locks.setdefault(sess_id, [threading.RLock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._guard:
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    self._locks.pop(sess_id, None)
+
+    def _run(self, sess_id, kwargs):
+        with self._guard:
+            self._queued -= 1
+            self._running += 1
+        started = time.perf_counter()
+        ok = False
+        result = None
+        try:
+            if self.context_fn:
+                with self.context_fn():
+                    result = self.finalize_fn(sess_id, **kwargs)
+            else:
+                result = self.finalize_fn(sess_id, **kwargs)
+            ok = True
+            return result
+        except Exception as e:
+            print(f'[FINALIZE] Session {sess_id} failed in worker pool: {e}')
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._guard:
+                self._running -= 1
+                self._pending.discard(sess_id)
+                self._durations.append(elapsed)
+                if ok:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+            if ok and result and not result.get('already_ended'):
+                print(f'[FINALIZE] Session {sess_id} finalized in {elapsed:.1f}s')
+
+    def submit(self, sess_id, **kwargs):
+        """Queue finalization; returns the Future, or None if already queued/running."""
+        with self._guard:
+            if sess_id in self._pending:
+                return None
+            self._pending.add(sess_id)
+            self._queued += 1
+            self._submitted += 1
+        return self._executor.submit(self._run, sess_id, kwargs)
+
+    def metrics(self):
+        with self._guard:
+            durations = list(self._durations)
+            return {
+                'workers': self.max_workers,
+                'queue_depth': self._queued,
+                'running': self._running,
+                'submitted': self._submitted,
+                'completed': self._completed,
+                'failed': self._failed,
+                'last_duration_s': round(durations[-1], 2) if durations else None,
+                'avg_duration_s': round(sum(durations) / len(durations), 2) if durations else None,
+                'max_duration_s': round(max(durations), 2) if durations else None,
+            }
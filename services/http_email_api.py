@@ -0,0 +1,245 @@
+import os
+import re
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+SENDGRID_API_URL = 'https://api.sendgrid.com/v3/mail/send'
+BREVO_API_URL = 'https://api.brevo.com/v3/smtp/email'
+
+_TOKEN_RE = re.compile(r'__DAVS_([A-Z0-9_]+?)__')
+
+
+def http_api_provider(cfg):
+    """'sendgrid' / 'brevo' when the configured host is one of the HTTP APIs, else None."""
+    host = (cfg.get('smtp_host') or '').lower().strip()
+    if 'sendgrid.net' in host:
+        return 'sendgrid'
+    if 'brevo.com' in host or 'sendinblue.com' in host:
+        return 'brevo'
+    return None
+
+
+def _extract_email(s):
+    if not s:
+        return None
+    match = re.search(r'[\w\.-]+@[\w\.-]+\.\w+', s)
+    return match.group(0) if match else s
+
+
+def api_sender_email(cfg, provider):
+    # Both APIs REQUIRE a valid email in the sender field, so never fall back to
+    # the SMTP username when it is not an address (SendGrid's is literally 'apikey').
+    sender_email = _extract_email(cfg.get('smtp_from')) or ''
+    if not sender_email or '@' not in sender_email:
+        u_email = _extract_email(cfg.get('smtp_user'))
+        if u_email and '@' in u_email:
+            sender_email = u_email
+        elif provider == 'brevo':
+            sender_email = 'no-reply@brevo.com'
+        else:
+            sender_email = 'no-reply@davs-attendance.com'
+    return sender_email
+
+
+def substitution_token(name):
+    """Placeholder used in bulk templates, e.g. 'student_name' -> '__DAVS_STUDENT_NAME__'."""
+    return f'__DAVS_{name.upper()}__'
+
+
+def apply_substitutions(text, substitutions):
+    for token, value in (substitutions or {}).items():
+        text = text.replace(token, str(value))
+    return text
+
+
+class HTTPEmailAPIError(Exception):
+    def __init__(self, status, body):
+        super().__init__(f'HTTP {status}: {body[:300]}')
+        self.status = status
+        self.body = body
+
+
+class HTTPEmailClient:
+    """
+    SendGrid / Brevo mail-send client on one keep-alive ``requests.Session``.
+
+    ``send`` posts a single message. ``send_bulk`` posts one template to many
+    recipients with per-recipient substitutions — SendGrid ``personalizations``
+    with ``substitutions``, Brevo ``messageVersions`` with ``params`` — in
+    chunks of ``bulk_size``. If a bulk request is rejected (one bad address
+    fails the whole call on both APIs) or the connection drops, that chunk is
+    retried one message at a time so a single bad row cannot sink the rest.
+    ``api_url`` can point at a local stand-in server for testing.
+    """
+
+    def __init__(self, *, provider, api_key, sender_email, api_url=None, timeout=10,
+                 bulk_size=500, pool_size=4):
+        self.provider = provider
+        self.api_key = api_key
+        self.sender_email = sender_email
+        self.api_url = api_url or (BREVO_API_URL if provider == 'brevo' else SENDGRID_API_URL)
+        self.timeout = timeout
+        self.bulk_size = max(1, int(bulk_size))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, int(pool_size)))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if provider == 'brevo':
+            self.session.headers.update({'api-key': api_key})
+        else:
+            self.session.headers.update({'Authorization': f'Bearer {api_key}'})
+        self.session.headers.update({'Content-Type': 'application/json', 'Accept': 'application/json'})
+        self._guard = threading.Lock()
+        self._requests = 0
+        self._bulk_requests = 0
+        self._messages = 0
+        self._fallbacks = 0
+        self._errors = 0
+
+    @property
+    def key(self):
+        return (self.provider, self.api_key, self.sender_email, self.api_url)
+
+    def _post(self, data):
+        with self._guard:
+            self._requests += 1
+        resp = self.session.post(self.api_url, json=data, timeout=self.timeout)
+        if resp.status_code >= 300:
+            raise HTTPEmailAPIError(resp.status_code, resp.text or '')
+        return resp
+
+    # ── Single message ─────────────────────────────────────────────────────
+    def send(self, recipients, subject, html_body):
+        if self.provider == 'brevo':
+            data = {
+                'sender': {'email': self.sender_email},
+                'to': [{'email': r} for r in recipients],
+                'subject': subject,
+                'htmlContent': html_body,
+            }
+        else:
+            data = {
+                'personalizations': [{'to': [{'email': r}]} for r in recipients],
+                'from': {'email': self.sender_email},
+                'subject': subject,
+                'content': [{'type': 'text/html', 'value': html_body}],
+            }
+        try:
+            self._post(data)
+        except Exception:
+            with self._guard:
+                self._errors += 1
+            raise
+        with self._guard:
+            self._messages += 1
+
+    # ── Bulk ───────────────────────────────────────────────────────────────
+    def _bulk_payload(self, subject, html_template, chunk):
+        if self.provider == 'brevo':
+            # Brevo substitutes {{ params.X }} in htmlContent per message version.
+            html = _TOKEN_RE.sub(lambda m: '{{ params.' + m.group(1) + ' }}', html_template)
+            versions = []
+            for email, subs in chunk:
+                params = {}
+                for token, value in (subs or {}).items():
+                    m = _TOKEN_RE.fullmatch(token)
+                    if m:
+                        params[m.group(1)] = str(value)
+                versions.append({'to': [{'email': email}], 'params': params})
+            return {
+                'sender': {'email': self.sender_email},
+                'subject': subject,
+                'htmlContent': html,
+                'messageVersions': versions,
+            }
+        return {
+            'personalizations': [
+                {'to': [{'email': email}],
+                 'substitutions': {token: str(value) for token, value in (subs or {}).items()}}
+                for email, subs in chunk
+            ],
+            'from': {'email': self.sender_email},
+            'subject': subject,
+            'content': [{'type': 'text/html', 'value': html_template}],
+        }
+
+    def send_bulk(self, subject, html_template, recipients):
+        """
+        Send ``html_template`` to ``recipients`` — a list of (email, substitutions)
+        where substitutions maps placeholder tokens to values. Returns a list of
+        error strings (None on success) aligned with ``recipients``.
+        """
+        errors = [None] * len(recipients)
+        for start in range(0, len(recipients), self.bulk_size):
+            chunk = recipients[start:start + self.bulk_size]
+            try:
+                self._post(self._bulk_payload(subject, html_template, chunk))
+                with self._guard:
+                    self._bulk_requests += 1
+                    self._messages += len(chunk)
+                continue
+            except Exception as e:
+                print(f'[EMAIL] {self.provider} bulk send of {len(chunk)} failed ({e}); '
+                      f'falling back to per-message sends')
+                with self._guard:
+                    self._fallbacks += 1
+            for offset, (email, subs) in enumerate(chunk):
+                try:
+                    self.send([email], apply_substitutions(subject, subs),
+                              apply_substitutions(html_template, subs))
+                except Exception as e:
+                    errors[start + offset] = str(e) or e.__class__.__name__
+        return errors
+
+    def close(self):
+        self.session.close()
+
+    def metrics(self):
+        with self._guard:
+            return {
+                'provider': self.provider,
+                'api_url': self.api_url,
+                'requests': self._requests,
+                'bulk_requests': self._bulk_requests,
+                'messages': self._messages,
+                'bulk_fallbacks': self._fallbacks,
+                'errors': self._errors,
+            }
+
+
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_http_email_client(cfg):
+    """Process-wide client for the HTTP API in ``cfg`` (None for plain SMTP); rebuilt when it changes."""
+    provider = http_api_provider(cfg)
+    if not provider:
+        return None
+    env_name = 'BREVO_API_URL' if provider == 'brevo' else 'SENDGRID_API_URL'
+    api_url = os.getenv(env_name, '').strip() or (BREVO_API_URL if provider == 'brevo' else SENDGRID_API_URL)
+    client_key = (provider, (cfg.get('smtp_password') or '').strip(), api_sender_email(cfg, provider), api_url)
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get('default')
+        if client is not None and client.key == client_key:
+            return client
+        if client is not None:
+            client.close()
+        client = HTTPEmailClient(
+            provider=provider,
+            api_key=client_key[1],
+            sender_email=client_key[2],
+            api_url=client_key[3],
+            bulk_size=int(os.getenv('EMAIL_BULK_SIZE', '500') or 500),
+        )
+        _CLIENTS['default'] = client
+        return client
+
+
+def http_email_metrics():
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get('default')
+    return client.metrics() if client else None
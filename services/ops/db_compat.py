@@ -180,6 +180,21 @@ class CompatCursor:
     def rowcount(self):
         return self._cursor.rowcount
 
+    @property
+    def itersize(self):
+        return self._cursor.itersize
+
+    @itersize.setter
+    def itersize(self, value):
+        self._cursor.itersize = value
+
+    def __iter__(self):
+        # Named cursors only report a description once the first batch is fetched.
+        for row in self._cursor:
+            if not self._keys:
+                self._keys = [d[0] for d in self._cursor.description]
+            yield CompatRow(self._keys, row)
+
     def close(self):
         self._cursor.close()
 
@@ -200,8 +215,9 @@ class CompatConnection:
         finally:
             self._conn.close()
 
-    def cursor(self):
-        return CompatCursor(self._conn.cursor())
+    def cursor(self, name=None):
+        # A name makes it a server-side cursor: iterate it to fetch `itersize` rows at a time.
+        return CompatCursor(self._conn.cursor(name) if name else self._conn.cursor())
 
     def execute(self, sql, params=None):
         cur = self.cursor()
@@ -0,0 +1,24 @@
+"""
+Dedicated worker process for post-finalize jobs (student receipts and the
+teacher session summary).
+
+Run alongside the web process, e.g. ``worker: python post_finalize_worker.py``,
+and set POST_FINALIZE_IN_PROCESS=0 on the web service so email work stays off
+the request workers. Several worker processes can run at once; jobs are
+claimed with SKIP LOCKED.
+"""
+import os
+
+
+def main():
+    # This process only drains the queue: no automation scheduler, no in-process job thread.
+    os.environ.setdefault('DISABLE_AUTO_THREAD', '1')
+    os.environ['POST_FINALIZE_IN_PROCESS'] = '0'
+
+    import app as davs
+
+    davs.POST_FINALIZE_QUEUE.run_forever()
+
+
+if __name__ == '__main__':
+    main()
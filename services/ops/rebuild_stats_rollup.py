@@ -0,0 +1,29 @@
+"""
+Rebuild the dashboard stats rollup tables (stats_attendance_rollup,
+stats_session_rollup, stats_rollup_sources) from attendance_logs.
+
+The app keeps them current as logs are written and sessions finalize, and
+builds them on first start; run this after bulk imports, manual SQL edits to
+attendance_logs/sessions, or mass enrollment-status changes.
+
+Usage:
+    python rebuild_stats_rollup.py
+"""
+import os
+import time
+
+
+def main():
+    # One-shot maintenance: no automation scheduler, no post-finalize job thread.
+    os.environ.setdefault('DISABLE_AUTO_THREAD', '1')
+    os.environ['POST_FINALIZE_IN_PROCESS'] = '0'
+
+    import app as davs
+
+    started = time.monotonic()
+    n = davs.db_rebuild_stats_rollup()
+    print(f'[STATS] Rebuilt attendance stats rollup: {n} rows in {time.monotonic() - started:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+import json
+import os
+import socket
+import threading
+import traceback
+from collections import defaultdict
+from datetime import timedelta
+
+
+def default_worker_id():
+    return f'davs-jobs:{socket.gethostname()}:{os.getpid()}'
+
+
+class PostFinalizeQueue:
+    """
+    Durable queue for the work that follows session finalization (student
+    receipts, teacher summary), stored in the ``post_finalize_jobs`` table.
+
+    Jobs are unique per (sess_id, nfc_id, kind), so enqueueing the same
+    session twice is a no-op. Workers claim pending rows with
+    ``FOR UPDATE SKIP LOCKED``, which lets the in-process worker thread and
+    any number of dedicated ``post_finalize_worker.py`` processes share the
+    queue without double-sending. Claimed jobs are handed to
+    ``handler_fn(sess_id, jobs)`` grouped by session; it returns
+    ``{job_id: error_or_None}``. Failed jobs are retried with exponential
+    backoff up to ``max_attempts``; jobs left 'running' by a crashed worker
+    are released after ``stale_seconds``.
+    """
+
+    def __init__(self, *, get_db_fn, handler_fn, now_fn, context_fn=None, worker_id=None,
+                 batch_size=200, poll_seconds=5, max_attempts=5, stale_seconds=600):
+        self.get_db_fn = get_db_fn
+        self.handler_fn = handler_fn
+        self.now_fn = now_fn
+        self.context_fn = context_fn
+        self.worker_id = worker_id or default_worker_id()
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.stale_seconds = stale_seconds
+        self._wake = threading.Event()
+        self._thread = None
+        self._guard = threading.Lock()
+        self._processed = 0
+        self._failed = 0
+        self.last_run_at = None
+
+    def _ts(self, dt=None):
+        return (dt or self.now_fn()).strftime('%Y-%m-%d %H:%M:%S')
+
+    # ── Producer side ──────────────────────────────────────────────────────
+    def enqueue(self, jobs):
+        """Insert (sess_id, nfc_id, kind, payload) jobs; duplicates are ignored."""
+        now = self._ts()
+        rows = [
+            (sess_id, nfc_id or '', kind, json.dumps(payload or {}), now, now, now)
+            for sess_id, nfc_id, kind, payload in jobs
+        ]
+        if not rows:
+            return 0
+        with self.get_db_fn() as conn:
+            conn.executemany(
+                "INSERT INTO post_finalize_jobs "
+                "(sess_id,nfc_id,kind,payload_json,run_after,created_at,updated_at) "
+                "VALUES (?,?,?,?,?,?,?) "
+                "ON CONFLICT(sess_id,nfc_id,kind) DO NOTHING",
+                rows,
+            )
+        self._wake.set()
+        return len(rows)
+
+    # ── Consumer side ──────────────────────────────────────────────────────
+    def _release_stale(self, conn):
+        cutoff = self._ts(self.now_fn() - timedelta(seconds=self.stale_seconds))
+        conn.execute(
+            "UPDATE post_finalize_jobs SET status='pending', locked_by='', updated_at=? "
+            "WHERE status='running' AND locked_at < ?",
+            (self._ts(), cutoff),
+        )
+
+    def claim(self, sess_id=None):
+        now = self._ts()
+        where = "status='pending' AND run_after <= ?"
+        params = [now]
+        if sess_id:
+            where += " AND sess_id=?"
+            params.append(sess_id)
+        with self.get_db_fn() as conn:
+            self._release_stale(conn)
+            rows = conn.execute(
+                "UPDATE post_finalize_jobs SET status='running', locked_by=?, locked_at=?, "
+                "attempts=attempts+1, updated_at=? "
+                "WHERE id IN ("
+                f"  SELECT id FROM post_finalize_jobs WHERE {where} "
+                "  ORDER BY id LIMIT ? FOR UPDATE SKIP LOCKED"
+                ") RETURNING id, sess_id, nfc_id, kind, payload_json, attempts",
+                (self.worker_id, now, now, *params, self.batch_size),
+            ).fetchall()
+        jobs = []
+        for r in rows:
+            job = dict(r)
+            try:
+                job['payload'] = json.loads(job.pop('payload_json') or '{}')
+            except Exception:
+                job['payload'] = {}
+            jobs.append(job)
+        return jobs
+
+    def _finish(self, results, jobs_by_id):
+        now_dt = self.now_fn()
+        done, retry, dead = [], [], []
+        for job_id, error in results.items():
+            job = jobs_by_id.get(job_id)
+            if job is None:
+                continue
+            if not error:
+                done.append((self._ts(now_dt), job_id))
+            elif job['attempts'] >= self.max_attempts:
+                dead.append((str(error)[:500], self._ts(now_dt), job_id))
+            else:
+                backoff = min(30 * (2 ** (job['attempts'] - 1)), 3600)
+                retry.append((str(error)[:500], self._ts(now_dt + timedelta(seconds=backoff)),
+                              self._ts(now_dt), job_id))
+        with self.get_db_fn() as conn:
+            if done:
+                conn.executemany(
+                    "UPDATE post_finalize_jobs SET status='done', last_error='', locked_by='', updated_at=? "
+                    "WHERE id=?", done)
+            if retry:
+                conn.executemany(
+                    "UPDATE post_finalize_jobs SET status='pending', last_error=?, run_after=?, "
+                    "locked_by='', updated_at=? WHERE id=?", retry)
+            if dead:
+                conn.executemany(
+                    "UPDATE post_finalize_jobs SET status='failed', last_error=?, locked_by='', updated_at=? "
+                    "WHERE id=?", dead)
+        with self._guard:
+            self._processed += len(done)
+            self._failed += len(retry) + len(dead)
+        for error, _when, job_id in dead:
+            print(f'[JOBS] Job {job_id} gave up after {self.max_attempts} attempts: {error}')
+
+    def run_once(self, sess_id=None):
+        """Claim one batch and run it; returns the number of jobs handled."""
+        jobs = self.claim(sess_id)
+        self.last_run_at = self._ts()
+        if not jobs:
+            return 0
+        by_session = defaultdict(list)
+        for job in jobs:
+            by_session[job['sess_id']].append(job)
+        for sid, sess_jobs in by_session.items():
+            jobs_by_id = {j['id']: j for j in sess_jobs}
+            try:
+                if self.context_fn:
+                    with self.context_fn():
+                        results = self.handler_fn(sid, sess_jobs) or {}
+                else:
+                    results = self.handler_fn(sid, sess_jobs) or {}
+                for job_id in jobs_by_id:
+                    results.setdefault(job_id, None)
+            except Exception as e:
+                print(f'[JOBS] Post-finalize handler failed for session {sid}: {e}')
+                print(traceback.format_exc())
+                results = {job_id: str(e) or e.__class__.__name__ for job_id in jobs_by_id}
+            self._finish(results, jobs_by_id)
+        return len(jobs)
+
+    def run_forever(self):
+        print(f'[JOBS] Post-finalize worker {self.worker_id} started')
+        while True:
+            try:
+                handled = self.run_once()
+            except Exception as e:
+                print(f'[JOBS] Worker loop error: {e}')
+                handled = 0
+            if handled:
+                continue
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self._thread
+        self._thread = threading.Thread(target=self.run_forever, daemon=True, name='davs-post-finalize-jobs')
+        self._thread.start()
+        return self._thread
+
+    def metrics(self):
+        counts = {}
+        try:
+            with self.get_db_fn() as conn:
+                for r in conn.execute(
+                    "SELECT status, COUNT(*) AS cnt FROM post_finalize_jobs GROUP BY status"
+                ).fetchall():
+                    counts[r['status']] = r['cnt']
+        except Exception as e:
+            counts = {'error': str(e)}
+        with self._guard:
+            return {
+                'worker_id': self.worker_id,
+                'in_process_worker': bool(self._thread and self._thread.is_alive()),
+                'processed': self._processed,
+                'failed_attempts': self._failed,
+                'last_run_at': self.last_run_at,
+                'jobs_by_status': counts,
+            }
@@ -0,0 +1,179 @@
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3.providers.base import JSONBaseProvider
+
+
+# HTTP statuses that mean "this endpoint is unhealthy right now", not "the
+# request is bad" — the call is retried on the next endpoint.
+_FAILOVER_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+def rpc_urls_from_env(default_url='http://127.0.0.1:8545'):
+    """Collect RPC endpoints from the environment, primary first, de-duplicated."""
+    urls = []
+    for key in ('SEPOLIA_RPC_URL', 'BLOCKCHAIN_RPC_URL', 'WEB3_PROVIDER_URI'):
+        val = os.getenv(key, '').strip()
+        if val:
+            urls.append(val)
+    extra = os.getenv('BLOCKCHAIN_RPC_FALLBACK_URLS', '')
+    urls.extend(u.strip() for u in extra.split(',') if u.strip())
+    if not urls:
+        urls.append(default_url)
+    seen = set()
+    return [u for u in urls if not (u in seen or seen.add(u))]
+
+
+class _Endpoint:
+    def __init__(self, url):
+        self.url = url
+        self.latency_ms = None      # EWMA of successful round trips
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.last_error = ''
+        self.cooldown_until = 0.0
+
+    def record_ok(self, elapsed_ms):
+        self.requests += 1
+        self.consecutive_errors = 0
+        self.cooldown_until = 0.0
+        if self.latency_ms is None:
+            self.latency_ms = elapsed_ms
+        else:
+            self.latency_ms = 0.8 * self.latency_ms + 0.2 * elapsed_ms
+
+    def record_error(self, err, cooldown_base):
+        self.requests += 1
+        self.errors += 1
+        self.consecutive_errors += 1
+        self.last_error = str(err)[:200]
+        # Exponential cooldown capped at 5 minutes so a dead endpoint is
+        # skipped but still re-probed eventually.
+        backoff = min(cooldown_base * (2 ** (self.consecutive_errors - 1)), 300.0)
+        self.cooldown_until = time.monotonic() + backoff
+
+    def snapshot(self):
+        return {
+            'url': self.url,
+            'latency_ms': round(self.latency_ms, 1) if self.latency_ms is not None else None,
+            'requests': self.requests,
+            'errors': self.errors,
+            'consecutive_errors': self.consecutive_errors,
+            'last_error': self.last_error,
+            'cooling_down': self.cooldown_until > time.monotonic(),
+        }
+
+
+class FailoverHTTPProvider(JSONBaseProvider):
+    """
+    JSON-RPC provider over a pooled keep-alive requests.Session that spreads
+    calls across several endpoints. Healthy endpoints are tried fastest-first;
+    transport errors and 429/5xx responses put an endpoint in cooldown and the
+    call falls through to the next one.
+    """
+
+    def __init__(self, urls, timeout=10, pool_size=10, cooldown_seconds=5.0):
+        super().__init__()
+        if not urls:
+            raise ValueError('FailoverHTTPProvider needs at least one RPC URL')
+        self.endpoints = [_Endpoint(u) for u in urls]
+        self.timeout = timeout
+        self.cooldown_seconds = cooldown_seconds
+        self._lock = threading.Lock()
+        self._monitor = None
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(urls), pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'Content-Type': 'application/json'})
+
+    def __str__(self):
+        return f"FailoverHTTPProvider({', '.join(e.url for e in self.endpoints)})"
+
+    @property
+    def endpoint_uri(self):
+        return self._ordered()[0].url
+
+    def _ordered(self):
+        now = time.monotonic()
+        with self._lock:
+            ready = [e for e in self.endpoints if e.cooldown_until <= now]
+            cooling = [e for e in self.endpoints if e.cooldown_until > now]
+        # Unmeasured endpoints sort first (in configured order) so each one
+        # gets a real latency sample before the ranking settles.
+        ready.sort(key=lambda e: e.latency_ms if e.latency_ms is not None else 0.0)
+        cooling.sort(key=lambda e: e.cooldown_until)
+        return ready + cooling
+
+    def _post(self, ep, payload, timeout):
+        started = time.perf_counter()
+        try:
+            resp = self.session.post(ep.url, data=payload, timeout=timeout)
+            if resp.status_code in _FAILOVER_STATUSES:
+                raise requests.HTTPError(f'HTTP {resp.status_code}', response=resp)
+            resp.raise_for_status()
+            raw = resp.content
+        except requests.RequestException as e:
+            with self._lock:
+                ep.record_error(e, self.cooldown_seconds)
+            raise
+        with self._lock:
+            ep.record_ok((time.perf_counter() - started) * 1000.0)
+        return raw
+
+    def make_request(self, method, params):
+        payload = self.encode_rpc_request(method, params)
+        last_exc = None
+        for ep in self._ordered():
+            try:
+                raw = self._post(ep, payload, self.timeout)
+            except requests.RequestException as e:
+                last_exc = e
+                print(f'[RPC] {method} failed on {ep.url}: {e} — trying next endpoint')
+                continue
+            return self.decode_rpc_response(raw)
+        raise ConnectionError(f'All RPC endpoints failed for {method}: {last_exc}')
+
+    def health_check(self):
+        """Probe every endpoint once; returns True if at least one answered."""
+        payload = self.encode_rpc_request('eth_blockNumber', [])
+        healthy = False
+        for ep in list(self.endpoints):
+            try:
+                self._post(ep, payload, min(self.timeout, 5))
+                healthy = True
+            except requests.RequestException:
+                pass
+        return healthy
+
+    def start_health_monitor(self, interval_seconds=30, on_result=None):
+        """Run health_check() in a daemon thread so latency ranking stays fresh."""
+        if self._monitor and self._monitor.is_alive():
+            return self._monitor
+
+        def _loop():
+            while True:
+                time.sleep(interval_seconds)
+                try:
+                    ok = self.health_check()
+                    if on_result:
+                        on_result(ok)
+                except Exception as e:
+                    print(f'[RPC] Health check error: {e}')
+
+        self._monitor = threading.Thread(target=_loop, daemon=True, name='rpc-health-monitor')
+        self._monitor.start()
+        return self._monitor
+
+    def stats(self):
+        with self._lock:
+            snaps = [e.snapshot() for e in self.endpoints]
+        active = self._ordered()[0].url
+        for s in snaps:
+            s['active'] = s['url'] == active
+        return snaps
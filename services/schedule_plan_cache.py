@@ -0,0 +1,76 @@
+import threading
+import time
+
+
+class TodayPlanCache:
+    """
+    Process-local cache of "today's plan" — the schedule rows, parsed slot
+    times, event windows and no-class rows the automation thread and the
+    schedule APIs need for the current day.
+
+    The plan is built once per local day and rebuilt only when ``invalidate()``
+    is called (schedule / event / no-class writes here, or a plan-changing
+    NOTIFY from another worker). ``max_age_seconds`` optionally caps its age
+    as well; by default it lives until the end of the day.
+    """
+
+    def __init__(self, *, build_fn, now_fn, max_age_seconds=None):
+        self.build_fn = build_fn
+        self.now_fn = now_fn
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.RLock()
+        self._plan = None
+        self._built_monotonic = 0.0
+        self._version = 0
+        self.builds = 0
+
+    def invalidate(self, reason=''):
+        with self._lock:
+            self._plan = None
+            self._version += 1
+
+    def get(self, now_dt=None):
+        now_dt = now_dt or self.now_fn()
+        today = now_dt.strftime('%Y-%m-%d')
+        with self._lock:
+            plan = self._plan
+            fresh = (
+                plan is not None
+                and plan.get('date') == today
+                and (
+                    not self.max_age_seconds
+                    or (time.monotonic() - self._built_monotonic) < self.max_age_seconds
+                )
+            )
+            if fresh:
+                return plan
+            plan = self.build_fn(now_dt)
+            plan.setdefault('date', today)
+            plan.setdefault('teacher_rows', {})
+            self._plan = plan
+            self._built_monotonic = time.monotonic()
+            self.builds += 1
+            return plan
+
+    def teacher_rows(self, username, load_fn, now_dt=None):
+        """Memoize a per-teacher view of today's rows inside the current plan."""
+        key = str(username or '').strip().lower()
+        plan = self.get(now_dt)
+        with self._lock:
+            rows = plan['teacher_rows'].get(key)
+            if rows is None:
+                rows = load_fn(username)
+                plan['teacher_rows'][key] = rows
+            return rows
+
+    def status(self):
+        with self._lock:
+            plan = self._plan
+            return {
+                'date': plan.get('date') if plan else None,
+                'built_at': plan.get('built_at') if plan else None,
+                'schedules': len(plan.get('slots', [])) if plan else 0,
+                'events': len(plan.get('events', [])) if plan else 0,
+                'builds': self.builds,
+                'version': self._version,
+            }
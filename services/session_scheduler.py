@@ -0,0 +1,194 @@
+import heapq
+import json
+import os
+import select
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+import psycopg2
+import psycopg2.extensions
+
+
+SCHEDULE_CHANNEL = 'davs_schedule_changed'
+
+
+class SessionScheduler:
+    """
+    Event-driven replacement for the fixed-interval automation poll.
+
+    Each wake-up runs ``tick_fn`` (start due sessions / end expired ones) and
+    then asks ``plan_fn(now)`` for today's upcoming start/end instants. Those
+    go into a min-heap and the thread sleeps until the earliest one. It is
+    woken early by ``notify_changed`` — called in-process when schedules,
+    event schedules, no-class days or skipped sessions change, or a session is
+    started/ended manually — and by Postgres NOTIFY on SCHEDULE_CHANNEL for
+    changes made in other worker processes. The NOTIFY payload carries the
+    sender's ``origin`` (so a process ignores its own broadcasts) and
+    ``plan_changed``; ``on_change_fn`` only runs for the latter, so session
+    start/end/skip events wake the scheduler without dropping cached plans.
+
+    ``should_run_fn`` gates the loop (leader election): while it returns False
+    the scheduler stays on standby and touches no tables, but keeps listening
+    so ``on_change_fn`` still drops this process's cached plan.
+    """
+
+    def __init__(self, *, tick_fn, plan_fn, now_fn, get_db_fn=None, dsn='', max_idle_seconds=300,
+                 on_change_fn=None, should_run_fn=None):
+        self.tick_fn = tick_fn
+        self.plan_fn = plan_fn
+        self.now_fn = now_fn
+        self.get_db_fn = get_db_fn
+        self.dsn = dsn
+        self.max_idle_seconds = max_idle_seconds
+        self.on_change_fn = on_change_fn
+        self.should_run_fn = should_run_fn
+        self._wake = threading.Event()
+        self._queue = []
+        self._listener = None
+        self.origin = f'{socket.gethostname()}:{os.getpid()}:{id(self):x}'
+        self.last_reason = 'startup'
+        self.last_tick_at = None
+        self.ticks = 0
+
+    # ── Change notification ────────────────────────────────────────────────
+    def request_replan(self, reason=''):
+        self.last_reason = reason or 'change'
+        self._wake.set()
+
+    def notify_changed(self, reason='', plan_changed=True):
+        """Wake the local scheduler and broadcast to other processes."""
+        self.request_replan(reason)
+        if not self.get_db_fn:
+            return
+        payload = json.dumps({
+            'origin': self.origin,
+            'reason': str(reason or '')[:200],
+            'plan_changed': bool(plan_changed),
+        })
+        try:
+            with self.get_db_fn() as conn:
+                conn.execute("SELECT pg_notify(?, ?)", (SCHEDULE_CHANNEL, payload))
+        except Exception as e:
+            print(f'[AUTO] Could not broadcast schedule change ({reason}): {e}')
+
+    def _handle_notifies(self, notifies):
+        reason = None
+        plan_changed = False
+        for n in notifies:
+            try:
+                msg = json.loads(n.payload)
+            except ValueError:
+                msg = None
+            if not isinstance(msg, dict):
+                # Bare-string payload from an older process: assume the plan moved.
+                msg = {'reason': n.payload, 'plan_changed': True}
+            if msg.get('origin') == self.origin:
+                continue
+            reason = msg.get('reason') or ''
+            plan_changed = plan_changed or bool(msg.get('plan_changed', True))
+        if reason is None:
+            return
+        if plan_changed and self.on_change_fn:
+            self.on_change_fn(reason)
+        self.request_replan(f'notify:{reason}')
+
+    def _listen_loop(self):
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                conn.cursor().execute(f'LISTEN {SCHEDULE_CHANNEL}')
+                while True:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    if conn.notifies:
+                        notifies = list(conn.notifies)
+                        conn.notifies.clear()
+                        self._handle_notifies(notifies)
+            except Exception as e:
+                print(f'[AUTO] Schedule change listener error: {e}; reconnecting in 10s')
+                time.sleep(10)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+    def _start_listener(self):
+        if not self.dsn or (self._listener and self._listener.is_alive()):
+            return
+        self._listener = threading.Thread(target=self._listen_loop, daemon=True, name='davs-schedule-listener')
+        self._listener.start()
+
+    # ── Planning ───────────────────────────────────────────────────────────
+    def _replan(self, now_dt):
+        queue = []
+        for instant, label in self.plan_fn(now_dt) or []:
+            if instant and instant > now_dt:
+                queue.append((instant, str(label)))
+        heapq.heapify(queue)
+        self._queue = queue
+
+    def _seconds_until_next(self, now_dt):
+        while self._queue and self._queue[0][0] <= now_dt:
+            heapq.heappop(self._queue)
+        midnight = (now_dt + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        timeout = min(float(self.max_idle_seconds), (midnight - now_dt).total_seconds() + 1)
+        if self._queue:
+            # Small margin so the tick sees now >= instant.
+            timeout = min(timeout, (self._queue[0][0] - now_dt).total_seconds() + 0.05)
+        return max(timeout, 0.05)
+
+    def status(self):
+        nxt = self._queue[0] if self._queue else None
+        return {
+            'next_trigger_at': nxt[0].strftime('%Y-%m-%d %H:%M:%S') if nxt else None,
+            'next_trigger': nxt[1] if nxt else None,
+            'pending_triggers': len(self._queue),
+            'standby': bool(self.should_run_fn and not self.should_run_fn()),
+            'ticks': self.ticks,
+            'last_tick_at': self.last_tick_at,
+            'last_wake_reason': self.last_reason,
+            'change_listener_alive': bool(self._listener and self._listener.is_alive()),
+        }
+
+    # ── Main loop ──────────────────────────────────────────────────────────
+    def run_once(self):
+        """Run one tick and re-plan; returns seconds until the next trigger."""
+        try:
+            self.tick_fn()
+        except Exception as e:
+            print(f'[AUTO ERROR] {e}')
+            print(f'[AUTO ERROR] Traceback: {traceback.format_exc()}')
+        self.ticks += 1
+        self.last_tick_at = self.now_fn().strftime('%Y-%m-%d %H:%M:%S')
+        try:
+            self._replan(self.now_fn())
+        except Exception as e:
+            print(f'[AUTO ERROR] Re-plan failed: {e}')
+            self._queue = []
+        return self._seconds_until_next(self.now_fn())
+
+    def run_forever(self):
+        while True:
+            self._start_listener()
+            if self.should_run_fn and not self.should_run_fn():
+                self._queue = []
+                self._wake.wait(self.max_idle_seconds)
+                self._wake.clear()
+                continue
+            timeout = self.run_once()
+            if self._queue:
+                at, label = self._queue[0]
+                print(f"[AUTO] Next trigger {at.strftime('%H:%M:%S')} ({label}); "
+                      f"{len(self._queue)} pending today; woke for: {self.last_reason}")
+            self._wake.wait(timeout)
+            if not self._wake.is_set():
+                self.last_reason = 'timer'
+            self._wake.clear()
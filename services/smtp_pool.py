@@ -0,0 +1,270 @@
+import os
+import queue
+import smtplib
+import socket
+import ssl
+import threading
+import time
+from collections import deque
+
+
+# Errors after which a pooled connection is thrown away and the send retried once.
+# (SMTPException subclasses OSError, so message rejections are caught before these.)
+_RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError,
+                     socket.timeout, OSError)
+
+
+def open_smtp_connection(host, port, user='', password='', timeout=5):
+    """Connect (SSL on 465, STARTTLS when offered otherwise) and log in."""
+    ctx = ssl.create_default_context()
+    try:
+        addr_info = socket.getaddrinfo(host, port, socket.AF_INET, socket.SOCK_STREAM)
+        target_ip = addr_info[0][4][0]
+    except Exception:
+        target_ip = host
+
+    if port == 465:
+        try:
+            srv = smtplib.SMTP_SSL(host, port, context=ctx, timeout=timeout)
+        except Exception:
+            srv = smtplib.SMTP_SSL(target_ip, port, context=ctx, timeout=timeout)
+    else:
+        try:
+            srv = smtplib.SMTP(host, port, timeout=timeout)
+        except Exception:
+            srv = smtplib.SMTP(target_ip, port, timeout=timeout)
+        srv.ehlo()
+        if srv.has_extn('STARTTLS'):
+            srv.starttls(context=ctx)
+            srv.ehlo()
+    if user:
+        srv.login(user, password)
+    return srv
+
+
+class _PooledConnection:
+    def __init__(self, srv):
+        self.srv = srv
+        self.opened_at = time.monotonic()
+        self.last_used = self.opened_at
+        self.sent = 0
+
+    def close(self):
+        try:
+            self.srv.quit()
+        except Exception:
+            try:
+                self.srv.close()
+            except Exception:
+                pass
+
+
+class SMTPPool:
+    """
+    Small pool of authenticated SMTP connections shared by all senders.
+
+    A message borrows a live connection instead of paying connect + STARTTLS
+    + login each time. Connections idle longer than ``keepalive_seconds`` are
+    checked with NOOP before reuse (and by the background keepalive thread);
+    a connection that errors is dropped and the send retried once on a fresh
+    one. ``max_messages_per_connection`` recycles long-lived connections,
+    since many providers cap messages per session. At most ``size``
+    connections exist at once; extra senders wait for one to free up.
+    """
+
+    def __init__(self, *, host, port, user='', password='', size=3, timeout=5,
+                 keepalive_seconds=30, max_idle_seconds=240, max_messages_per_connection=100,
+                 connect_fn=None):
+        self.host = host
+        self.port = int(port)
+        self.user = user
+        self.password = password
+        self.size = max(1, int(size))
+        self.timeout = timeout
+        self.keepalive_seconds = keepalive_seconds
+        self.max_idle_seconds = max_idle_seconds
+        self.max_messages_per_connection = max_messages_per_connection
+        self.connect_fn = connect_fn or open_smtp_connection
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._guard = threading.Lock()
+        self._keepalive_thread = None
+        self._closed = False
+        self._opened = 0
+        self._reconnects = 0
+        self._sent = 0
+        self._errors = 0
+        self._send_times = deque(maxlen=1000)
+
+    @property
+    def key(self):
+        return (self.host, self.port, self.user, self.password)
+
+    # ── Connection lifecycle ───────────────────────────────────────────────
+    def _connect(self):
+        srv = self.connect_fn(self.host, self.port, self.user, self.password, self.timeout)
+        with self._guard:
+            self._opened += 1
+        return _PooledConnection(srv)
+
+    def _healthy(self, pc):
+        if self.max_messages_per_connection and pc.sent >= self.max_messages_per_connection:
+            return False
+        idle = time.monotonic() - pc.last_used
+        if idle > self.max_idle_seconds:
+            return False
+        if idle > self.keepalive_seconds:
+            try:
+                code, _ = pc.srv.noop()
+                pc.last_used = time.monotonic()
+                return code == 250
+            except Exception:
+                return False
+        return True
+
+    def _acquire(self):
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    pc = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                if self._healthy(pc):
+                    return pc
+                pc.close()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, pc, broken=False):
+        try:
+            if broken or self._closed:
+                if pc is not None:
+                    pc.close()
+            else:
+                self._idle.put(pc)
+        finally:
+            self._slots.release()
+
+    # ── Sending ────────────────────────────────────────────────────────────
+    def send(self, from_addr, recipients, message):
+        """Send one message (str or bytes); retries once on a fresh connection."""
+        last_err = None
+        for attempt in range(2):
+            pc = self._acquire()
+            try:
+                pc.srv.sendmail(from_addr, recipients, message)
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError):
+                # Rejected message; the connection itself is still usable.
+                pc.last_used = time.monotonic()
+                self._release(pc)
+                with self._guard:
+                    self._errors += 1
+                raise
+            except _RECONNECT_ERRORS as e:
+                last_err = e
+                self._release(pc, broken=True)
+                with self._guard:
+                    self._reconnects += 1
+                continue
+            except Exception:
+                self._release(pc, broken=True)
+                with self._guard:
+                    self._errors += 1
+                raise
+            pc.sent += 1
+            pc.last_used = time.monotonic()
+            self._release(pc)
+            with self._guard:
+                self._sent += 1
+                self._send_times.append(time.monotonic())
+            return
+        with self._guard:
+            self._errors += 1
+        raise last_err
+
+    # ── Keepalive ──────────────────────────────────────────────────────────
+    def _keepalive_loop(self):
+        while not self._closed:
+            time.sleep(self.keepalive_seconds)
+            kept = []
+            while True:
+                try:
+                    pc = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                if self._healthy(pc):
+                    kept.append(pc)
+                else:
+                    pc.close()
+            # Put back oldest first so LIFO hands out the most recently used.
+            for pc in sorted(kept, key=lambda c: c.last_used):
+                self._idle.put(pc)
+
+    def start_keepalive(self):
+        if self._keepalive_thread and self._keepalive_thread.is_alive():
+            return self._keepalive_thread
+        self._keepalive_thread = threading.Thread(target=self._keepalive_loop, daemon=True,
+                                                  name='davs-smtp-keepalive')
+        self._keepalive_thread.start()
+        return self._keepalive_thread
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def metrics(self):
+        now = time.monotonic()
+        with self._guard:
+            recent = [t for t in self._send_times if now - t <= 60]
+            if len(recent) >= 2 and recent[-1] > recent[0]:
+                rate = (len(recent) - 1) / (recent[-1] - recent[0])
+            else:
+                rate = float(len(recent)) / 60 if recent else 0.0
+            return {
+                'host': self.host,
+                'port': self.port,
+                'pool_size': self.size,
+                'idle_connections': self._idle.qsize(),
+                'connections_opened': self._opened,
+                'reconnects': self._reconnects,
+                'sent': self._sent,
+                'errors': self._errors,
+                'messages_per_sec_1m': round(rate, 2),
+            }
+
+
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_smtp_pool(cfg, *, size=None, keepalive_seconds=None):
+    """Process-wide pool for the SMTP settings in ``cfg``; rebuilt when they change."""
+    if size is None:
+        size = int(os.getenv('SMTP_POOL_SIZE', '3') or 3)
+    if keepalive_seconds is None:
+        keepalive_seconds = float(os.getenv('SMTP_KEEPALIVE_SECONDS', '30') or 30)
+    pool_key = (cfg.get('smtp_host', '').strip(), int(cfg.get('smtp_port', 587) or 587),
+                cfg.get('smtp_user', ''), cfg.get('smtp_password', ''))
+    with _POOLS_LOCK:
+        pool = _POOLS.get('default')
+        if pool is not None and pool.key == pool_key:
+            return pool
+        if pool is not None:
+            pool.close()
+        pool = SMTPPool(host=pool_key[0], port=pool_key[1], user=pool_key[2], password=pool_key[3],
+                        size=size, keepalive_seconds=keepalive_seconds)
+        pool.start_keepalive()
+        _POOLS['default'] = pool
+        return pool
+
+
+def smtp_pool_metrics():
+    with _POOLS_LOCK:
+        pool = _POOLS.get('default')
+    return pool.metrics() if pool else None
@@ -0,0 +1,113 @@
+// Paginated view functions of the Attendance contract.
+//
+// Run against the in-process Hardhat network:
+//   npx hardhat test test/attendance-pagination.test.js
+// or against a running `npx hardhat node`:
+//   npx hardhat test test/attendance-pagination.test.js --network localhost
+//
+// PAGINATION_RECORDS controls how many per-student records are written
+// (default 20000). At that size the unbounded getAttendance() no longer
+// fits in a single eth_call, which is the reason the paged getters exist.
+
+const { expect } = require("chai");
+const { ethers } = require("hardhat");
+
+const RECORDS = parseInt(process.env.PAGINATION_RECORDS || "20000", 10);
+const SESSION_BATCHES = parseInt(process.env.PAGINATION_SESSION_BATCHES || "200", 10);
+const SESSION_BATCH_SIZE = 50;
+const PAGE = 500;
+
+async function readAllPages(fetchPage, pageSize) {
+  const out = [];
+  for (let offset = 0; ; offset += pageSize) {
+    const page = await fetchPage(offset, pageSize);
+    out.push(...page);
+    if (page.length < pageSize) return out;
+  }
+}
+
+describe("Attendance pagination", function () {
+  this.timeout(0);
+
+  let attendance;
+  const NFC = "04:AA:BB:CC";
+  const SESSION = "sess-paging";
+
+  before(async function () {
+    const Attendance = await ethers.getContractFactory("Attendance");
+    attendance = await Attendance.deploy();
+    await attendance.deployed();
+
+    for (let i = 0; i < RECORDS; i++) {
+      await attendance.markAttendanceWithStatus(NFC, i % 4);
+    }
+
+    // Re-recording the same session id appends to its attendanceRecords,
+    // which builds one very large session in block-sized batches.
+    for (let b = 0; b < SESSION_BATCHES; b++) {
+      const n = SESSION_BATCH_SIZE;
+      const idx = [...Array(n).keys()].map((k) => b * n + k);
+      await attendance.recordLectureSession(
+        SESSION, "LECTURE", "Paging", "PG101", "Instructor",
+        "BSIT", "1", "A", "1st Semester",
+        1700000000, "7:00 AM TO 9:00 AM", 1700000000, 1700007200,
+        idx.map((i) => `uid-${i}`),
+        idx.map((i) => `Student ${i}`),
+        idx.map((i) => `2024-${i}`),
+        idx.map(() => "REGULAR STUDENT"),
+        idx.map((i) => i % 4),
+        idx.map(() => "PRESENT"),
+        idx.map(() => "NONE"),
+        idx.map((i) => 1700000000 + i),
+        ""
+      );
+    }
+  });
+
+  it("pages through a student's full attendance history", async function () {
+    expect((await attendance.getAttendanceCount(NFC)).toNumber()).to.equal(RECORDS);
+
+    const statuses = await readAllPages(async (offset, limit) => {
+      const [, st] = await attendance.getAttendancePage(NFC, offset, limit);
+      return st;
+    }, PAGE);
+
+    expect(statuses.length).to.equal(RECORDS);
+    for (let i = 0; i < RECORDS; i += 997) {
+      expect(Number(statuses[i])).to.equal(i % 4);
+    }
+  });
+
+  it("pages through a large session's attendance records in order", async function () {
+    const total = SESSION_BATCHES * SESSION_BATCH_SIZE;
+    expect((await attendance.getSessionAttendanceCount(SESSION)).toNumber()).to.equal(total);
+
+    const records = await readAllPages(
+      (offset, limit) => attendance.getSessionAttendanceRecordsPage(SESSION, offset, limit),
+      PAGE
+    );
+
+    expect(records.length).to.equal(total);
+    expect(records[0].nfcUid).to.equal("uid-0");
+    expect(records[total - 1].nfcUid).to.equal(`uid-${total - 1}`);
+    expect(records[1234 % total].status).to.equal((1234 % total) % 4);
+  });
+
+  it("pages through session ids", async function () {
+    const count = (await attendance.getSessionCount()).toNumber();
+    const ids = await readAllPages((offset, limit) => attendance.getSessionIdsPage(offset, limit), 7);
+    expect(ids.length).to.equal(count);
+    expect(ids.every((id) => id === SESSION)).to.equal(true);
+  });
+
+  it("returns empty pages past the end and clamps short pages", async function () {
+    const [ts] = await attendance.getAttendancePage(NFC, RECORDS + 10, 100);
+    expect(ts.length).to.equal(0);
+
+    const [tail] = await attendance.getAttendancePage(NFC, RECORDS - 3, 100);
+    expect(tail.length).to.equal(3);
+
+    expect((await attendance.getAttendancePage("unknown", 0, 100))[0].length).to.equal(0);
+    expect((await attendance.getSessionAttendanceRecordsPage("unknown", 0, 100)).length).to.equal(0);
+  });
+});